@@ -67,8 +67,31 @@ class ReasoningKernel:
         weight_task: int = 1,
         weight_context: int = 1,
         weight_goal: int = 1,
+        parallel: bool = False,
+        max_workers: int | None = None,
     ) -> List[Any]:
-        """Ejecuta secuencialmente todos los pasos del plan."""
+        """Ejecuta todos los pasos del plan.
+
+        Por defecto los pasos se ejecutan secuencialmente. Con
+        ``parallel=True`` se envían juntos a
+        :meth:`meta_router.MetaRouter.route_many`, que los ejecuta de forma
+        concurrente; úsese solo cuando los pasos no dependen entre sí. Los
+        enrutadores sin ``route_many`` siguen la ruta secuencial.
+        """
+
+        if parallel and hasattr(self.router, "route_many"):
+            requests = []
+            for step in plan:
+                request = {"task": task, "context": context, "goals": goals}
+                request.update(step)
+                requests.append(request)
+            return self.router.route_many(
+                requests,
+                weight_task=weight_task,
+                weight_context=weight_context,
+                weight_goal=weight_goal,
+                max_workers=max_workers,
+            )
 
         return [
             self.execute_step(
@@ -0,0 +1,554 @@
+"""Memoria estratégica persistente en SQLite.
+
+:class:`SQLiteStrategicMemory` ofrece la misma interfaz que
+:class:`~gpt_oss.strategic_memory.StrategicMemory` (``add_episode``,
+``query``, ``summarize`` y el almacén clave-valor), pero guarda los episodios
+en un fichero SQLite para que lo aprendido por el enrutador y el planificador
+sobreviva a un reinicio. En memoria solo se conserva una ventana con los
+episodios más recientes; las escrituras se agrupan en lotes.
+
+Los valores se guardan como JSON: lo que no sea serializable se almacena con
+su ``repr`` y se recupera como cadena.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+import threading
+import weakref
+from collections import Counter, deque
+from dataclasses import fields
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from gpt_oss.strategic_memory import (
+    DEFAULT_INDEXED_FIELDS,
+    Episode,
+    StrategicMemory,
+    _summary_key,
+)
+
+if TYPE_CHECKING:
+    from gpt_oss.similarity_index import HashedFeatureIndex
+
+# día juliano de 1970-01-01T00:00:00Z, para comparar con ``julianday`` de SQLite
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+# Atributos de ``Episode``; el resto de claves se buscan en los metadatos.
+_ATTRIBUTES = frozenset(f.name for f in fields(Episode))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    input TEXT,
+    action TEXT,
+    outcome TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_episodes_julianday ON episodes(julianday(timestamp));
+CREATE INDEX IF NOT EXISTS ix_episodes_action ON episodes(action);
+CREATE INDEX IF NOT EXISTS ix_episodes_outcome ON episodes(outcome);
+CREATE TABLE IF NOT EXISTS storage (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _dumps(value: Any) -> str:
+    try:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=repr)
+    except (TypeError, ValueError):
+        return json.dumps(repr(value), ensure_ascii=False)
+
+
+def _metadata_path(key: str) -> str:
+    """Expresión SQL con el valor de ``key`` en los metadatos (``key`` es un identificador)."""
+    return f"json_extract(metadata, '$.{key}')"
+
+
+class _PendingWrites:
+    """Escrituras aún no volcadas y la conexión en la que se vuelcan.
+
+    Vive aparte de la memoria para que el finalizador que la vuelca al
+    recolectar la memoria (o al salir del intérprete) no la mantenga viva.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock) -> None:
+        self.conn = conn
+        self.lock = lock
+        self.episodes: Deque[Tuple[int, Episode]] = deque()
+        # los identificadores son consecutivos y se descarta siempre el más
+        # antiguo: basta con recordar por debajo de cuál hay que borrar
+        self.delete_below: Optional[int] = None
+        self.closed = False
+
+    def write(self) -> None:
+        with self.lock:
+            if self.closed or (not self.episodes and self.delete_below is None):
+                return
+            with self.conn:
+                if self.delete_below is not None:
+                    self.conn.execute("DELETE FROM episodes WHERE id < ?", (self.delete_below,))
+                    self.delete_below = None
+                self.conn.executemany(
+                    "INSERT INTO episodes (id, timestamp, input, action, outcome, metadata)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            episode_id,
+                            ep.timestamp.isoformat(),
+                            _dumps(ep.input),
+                            _dumps(ep.action),
+                            _dumps(ep.outcome),
+                            _dumps(ep.metadata),
+                        )
+                        for episode_id, ep in self.episodes
+                    ],
+                )
+            self.episodes.clear()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.write()
+            finally:
+                self.closed = True
+                self.conn.close()
+
+
+class SQLiteStrategicMemory(StrategicMemory):
+    """``StrategicMemory`` respaldada por un fichero SQLite.
+
+    Los episodios nuevos se acumulan y se escriben en una sola transacción
+    cada ``batch_size`` episodios, antes de consultar la base de datos y al
+    llamar a :meth:`flush` o :meth:`close`. Si la memoria se recolecta o el
+    intérprete termina sin llamar a :meth:`close`, un finalizador escribe lo
+    pendiente; solo un cierre abrupto del proceso (una señal que no se
+    atiende, un fallo del intérprete) pierde los hasta ``batch_size - 1``
+    episodios que aún no se habían escrito. Los ``hot_window`` más recientes
+    se mantienen además en memoria con los índices de la clase base: mientras
+    todos los episodios quepan en la ventana, :meth:`query` no toca el disco.
+
+    Las consultas por igualdad con valores de texto sobre ``action``,
+    ``outcome`` y las claves de metadatos se filtran en SQLite (con índices
+    sobre ``timestamp``, ``action``, ``outcome`` y los metadatos de
+    ``indexed_fields``); el resultado se comprueba después con la misma
+    comparación que la clase base.
+
+    ``max_episodes`` limita los episodios almacenados en disco; los oyentes
+    reciben ``on_remove`` solo cuando un episodio se descarta por ese límite,
+    no cuando sale de la ventana en memoria.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_episodes: int | None = None,
+        *,
+        hot_window: int = 1024,
+        batch_size: int = 64,
+        indexed_fields: Iterable[str] = DEFAULT_INDEXED_FIELDS,
+        similarity_index: Optional["HashedFeatureIndex"] = None,
+    ) -> None:
+        """Abre (o crea) la base de datos en ``path``.
+
+        Parámetros
+        ----------
+        path:
+            Ruta del fichero SQLite; ``":memory:"`` para una base temporal.
+        max_episodes:
+            Número máximo de episodios a conservar. Si es ``None``,
+            la cantidad de episodios es ilimitada.
+        hot_window:
+            Episodios recientes que se conservan también en memoria.
+        batch_size:
+            Episodios pendientes que provocan una escritura.
+        indexed_fields:
+            Campos indexados en la ventana en memoria y, si son claves de
+            metadatos, también en SQLite.
+        similarity_index:
+            Índice para :meth:`query_similar`; solo abarca la ventana en
+            memoria.
+        """
+        super().__init__(
+            max_episodes=max_episodes,
+            indexed_fields=indexed_fields,
+            similarity_index=similarity_index,
+        )
+        self._hot_window = hot_window
+        self._batch_size = max(1, batch_size)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # con WAL cada lote es una escritura secuencial sin reescribir la base
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        for field_name in self._indexed_fields:
+            if field_name not in _ATTRIBUTES and field_name.isidentifier():
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS ix_episodes_meta_{field_name} "
+                    f"ON episodes({_metadata_path(field_name)})"
+                )
+        self._conn.commit()
+
+        # identificadores de la ventana en memoria, en paralelo a ``_episodes``
+        self._hot_ids: Deque[int] = deque()
+        self._writes = _PendingWrites(self._conn, self._lock)
+        self._pending = self._writes.episodes
+        self._finalizer = weakref.finalize(self, self._writes.close)
+
+        count, last_id = self._conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM episodes"
+        ).fetchone()
+        self._count: int = count
+        self._next_id: int = (last_id or 0) + 1
+        # clave de tiempo más reciente fuera de la ventana en memoria (``None``
+        # mientras no se haya calculado)
+        self._cold_newest: Optional[float] = None if count > self._hot_window else -math.inf
+        for columna, contador in (
+            ("action", self._action_counts),
+            ("outcome", self._outcome_counts),
+        ):
+            # mismo orden que si se hubieran añadido ahora: por primera aparición
+            for valor, n in self._conn.execute(
+                f"SELECT {columna}, COUNT(*) FROM episodes GROUP BY {columna} ORDER BY MIN(id)"
+            ):
+                contador[_summary_key(json.loads(valor))] += n
+        for key, value in self._conn.execute("SELECT key, value FROM storage"):
+            self._storage[key] = json.loads(value)
+        if self._hot_window > 0:
+            rows = self._conn.execute(
+                "SELECT * FROM episodes ORDER BY id DESC LIMIT ?", (self._hot_window,)
+            ).fetchall()
+            for row in reversed(rows):
+                self._add_hot(row[0], self._decode(row))
+
+    # -- almacén clave-valor -------------------------------------------------
+
+    def save(self, key: str, value: Any) -> None:
+        super().save(key, value)
+        self._write_storage(key, value)
+
+    def update(self, key: str, value: Any) -> None:
+        super().update(key, value)
+        self._write_storage(key, value)
+
+    def _write_storage(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO storage (key, value) VALUES (?, ?)",
+                (key, _dumps(value)),
+            )
+            self._conn.commit()
+
+    # -- episodios -----------------------------------------------------------
+
+    @staticmethod
+    def _decode(row: Tuple[Any, ...]) -> Episode:
+        _, timestamp, input_, action, outcome, metadata = row
+        return Episode(
+            timestamp=datetime.fromisoformat(timestamp),
+            input=json.loads(input_),
+            action=json.loads(action),
+            outcome=json.loads(outcome),
+            metadata=json.loads(metadata),
+        )
+
+    def _add_hot(self, episode_id: int, episodio: Episode) -> None:
+        if self._hot_window <= 0:
+            return
+        if len(self._episodes) >= self._hot_window:
+            self._drop_hot()
+        self._episodes.append(episodio)
+        self._index_episode(episodio)
+        self._hot_ids.append(episode_id)
+        if self._similarity is not None:
+            self._similarity.add(episodio, self._features(episodio))
+
+    def _drop_hot(self) -> Episode:
+        self._hot_ids.popleft()
+        episodio = self._episodes.popleft()
+        if self._cold_newest is not None:
+            try:
+                self._cold_newest = max(self._cold_newest, self._time_key(episodio.timestamp))
+            except (AttributeError, TypeError, ValueError, OverflowError):
+                pass
+        self._unindex_oldest(episodio)
+        if self._similarity is not None:
+            self._similarity.remove_oldest()
+        return episodio
+
+    def _evict_oldest(self) -> Episode:
+        oldest_id = self._next_id - self._count
+        if self._hot_ids and self._hot_ids[0] == oldest_id:
+            episodio = self._drop_hot()
+        elif self._pending and self._pending[0][0] == oldest_id:
+            episodio = self._pending[0][1]
+        else:
+            row = self._conn.execute(
+                "SELECT * FROM episodes WHERE id = ?", (oldest_id,)
+            ).fetchone()
+            episodio = self._decode(row)
+        if self._pending and self._pending[0][0] == oldest_id:
+            # aún no se había escrito: basta con no escribirlo
+            self._pending.popleft()
+        else:
+            self._writes.delete_below = oldest_id + 1
+        self._count -= 1
+        self._count_episode(episodio.action, episodio.outcome, -1)
+        return episodio
+
+    def add_episode(self, data: Episode) -> None:
+        """Añade un nuevo episodio a la memoria.
+
+        Parámetros
+        ----------
+        data:
+            Instancia de :class:`Episode` que contiene la información
+            del episodio a almacenar.
+        """
+
+        with self._lock:
+            descartados = []
+            if self._max_episodes is not None:
+                while self._count and self._count >= self._max_episodes:
+                    descartados.append(self._evict_oldest())
+            episode_id = self._next_id
+            self._next_id += 1
+            self._count += 1
+            self._count_episode(data.action, data.outcome, 1)
+            self._pending.append((episode_id, data))
+            self._add_hot(episode_id, data)
+            if len(self._pending) >= self._batch_size:
+                self.flush()
+        for descartado in descartados:
+            for _, on_remove in self._listeners:
+                if on_remove is not None:
+                    on_remove(descartado)
+        for on_add, _ in self._listeners:
+            on_add(data)
+
+    def flush(self) -> None:
+        """Escribe en disco los episodios pendientes y aplica los descartes."""
+
+        self._writes.write()
+
+    def close(self) -> None:
+        """Escribe lo pendiente y cierra la base de datos."""
+
+        self._finalizer()
+
+    def __enter__(self) -> "SQLiteStrategicMemory":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _all_hot(self) -> bool:
+        return len(self._episodes) == self._count
+
+    def query(self, pattern: Dict[str, Any]) -> List[Episode]:
+        """Busca episodios que coincidan con los campos proporcionados.
+
+        Cada par clave-valor de ``pattern`` se compara con los atributos
+        del episodio y con su metadato homónimo si el atributo no existe.
+        Los episodios de la ventana en memoria se devuelven como los mismos
+        objetos que se añadieron; el resto se reconstruye desde el disco.
+
+        Parámetros
+        ----------
+        pattern:
+            Diccionario con los campos y valores a buscar.
+
+        Devuelve
+        -------
+        list[Episode]
+            Lista de episodios que cumplen con el patrón.
+        """
+
+        with self._lock:
+            if self._all_hot():
+                return super().query(pattern)
+            self.flush()
+            condiciones: List[str] = []
+            parametros: List[Any] = []
+            for clave, valor in pattern.items():
+                # solo el texto compara igual en JSON y en Python
+                if not isinstance(valor, str):
+                    continue
+                if clave in ("action", "outcome"):
+                    condiciones.append(f"{clave} = ?")
+                    parametros.append(_dumps(valor))
+                elif (
+                    clave not in _ATTRIBUTES
+                    and not hasattr(Episode, clave)
+                    and clave.isidentifier()
+                ):
+                    condiciones.append(f"{_metadata_path(clave)} = ?")
+                    parametros.append(valor)
+            sql = "SELECT * FROM episodes"
+            if condiciones:
+                sql += " WHERE " + " AND ".join(condiciones)
+            filas = self._conn.execute(sql + " ORDER BY id", parametros).fetchall()
+            calientes = dict(zip(self._hot_ids, self._episodes))
+        return self._matching(filas, calientes, pattern)
+
+    def _matching(
+        self,
+        filas: List[Tuple[Any, ...]],
+        calientes: Dict[int, Episode],
+        pattern: Optional[Dict[str, Any]],
+    ) -> List[Episode]:
+        """Episodios de ``filas`` que cumplen ``pattern``, reutilizando los de la ventana."""
+
+        resultados: List[Episode] = []
+        for fila in filas:
+            episodio = calientes.get(fila[0])
+            if episodio is None:
+                episodio = self._decode(fila)
+            if not pattern or all(
+                getattr(episodio, clave, episodio.metadata.get(clave)) == valor
+                for clave, valor in pattern.items()
+            ):
+                resultados.append(episodio)
+        return resultados
+
+    def query_range(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        pattern: Optional[Dict[str, Any]] = None,
+    ) -> List[Episode]:
+        """Busca los episodios con marca de tiempo en ``[start, end)``.
+
+        Si hay episodios fuera de la ventana en memoria, el intervalo se
+        resuelve con el índice de ``julianday(timestamp)`` de SQLite y se
+        comprueba con la misma clave de tiempo que la memoria base, así que
+        las marcas con distinta zona horaria se comparan por instante y no
+        como texto. Acepta los mismos parámetros que
+        :meth:`StrategicMemory.query_range`.
+        """
+
+        with self._lock:
+            if self._all_hot():
+                return super().query_range(start, end, pattern)
+            self.flush()
+            inicio = None if start is None else self._time_key(start)
+            fin = None if end is None else self._time_key(end)
+            # SQLite toma las fechas sin zona como UTC: se filtra con un día de
+            # margen y se comprueba después con la misma clave que la memoria base
+            condiciones: List[str] = []
+            parametros: List[Any] = []
+            if inicio is not None:
+                condiciones.append("julianday(timestamp) >= ?")
+                parametros.append((inicio - 86400) / 86400 + _UNIX_EPOCH_JULIAN_DAY)
+            if fin is not None:
+                condiciones.append("julianday(timestamp) < ?")
+                parametros.append((fin + 86400) / 86400 + _UNIX_EPOCH_JULIAN_DAY)
+            sql = "SELECT * FROM episodes"
+            if condiciones:
+                sql += " WHERE " + " AND ".join(condiciones)
+            ordenadas = []
+            for fila in self._conn.execute(sql, parametros):
+                clave = self._time_key(datetime.fromisoformat(fila[1]))
+                if (inicio is None or clave >= inicio) and (fin is None or clave < fin):
+                    ordenadas.append((clave, fila[0], fila))
+            ordenadas.sort(key=lambda item: item[:2])
+            calientes = dict(zip(self._hot_ids, self._episodes))
+        return self._matching([fila for _, _, fila in ordenadas], calientes, pattern)
+
+    def summarize(
+        self,
+        last: int | None = None,
+        seconds: float | None = None,
+        now: datetime | None = None,
+    ) -> Dict[str, Any]:
+        """Obtiene estadísticas generales de los episodios almacenados.
+
+        Los contadores globales se mantienen en memoria para todos los
+        episodios, también los que solo están en disco. Las ventanas que
+        caben en los episodios en memoria no consultan la base de datos.
+        Acepta los mismos parámetros que :meth:`StrategicMemory.summarize`.
+        """
+
+        with self._lock:
+            if last is None and seconds is None:
+                return self._summary(self._count, self._action_counts, self._outcome_counts)
+            if self._all_hot() or (last is not None and last <= len(self._episodes)):
+                return super().summarize(last, seconds, now)
+            if seconds is None:
+                self.flush()
+                filas = self._conn.execute(
+                    "SELECT action, outcome FROM episodes ORDER BY id DESC LIMIT ?", (last,)
+                ).fetchall()
+                filas.reverse()
+            else:
+                frias = self._cold_newest_key()
+                if now is not None:
+                    referencia = self._time_key(now)
+                else:
+                    calientes = self._newest_time_key()
+                    referencia = frias if calientes is None else max(calientes, frias)
+                if frias < referencia - seconds:
+                    # ningún episodio en disco entra en la ventana
+                    return self._summarize_records(self._time_window(seconds, referencia, last))
+                filas = self._cold_window(referencia - seconds, last)
+        acciones: Counter = Counter()
+        resultados: Counter = Counter()
+        for accion, resultado in filas:
+            acciones[_summary_key(json.loads(accion))] += 1
+            resultados[_summary_key(json.loads(resultado))] += 1
+        return self._summary(len(filas), acciones, resultados)
+
+    def _cold_newest_key(self) -> float:
+        """Clave de tiempo más reciente entre los episodios fuera de la ventana en memoria.
+
+        Se calcula una vez y después se mantiene al salir episodios de la
+        ventana; como los descartes no la rebajan, es una cota superior.
+        """
+
+        if self._cold_newest is None:
+            self.flush()
+            sql = "SELECT timestamp FROM episodes"
+            parametros: Tuple[Any, ...] = ()
+            if self._hot_ids:
+                sql += " WHERE id < ?"
+                parametros = (self._hot_ids[0],)
+            self._cold_newest = max(
+                (
+                    self._time_key(datetime.fromisoformat(timestamp))
+                    for (timestamp,) in self._conn.execute(sql, parametros)
+                ),
+                default=-math.inf,
+            )
+        return self._cold_newest
+
+    def _cold_window(self, limite: float, last: Optional[int]) -> List[Tuple[str, str]]:
+        """``(action, outcome)`` en disco con clave de tiempo desde ``limite``, por orden temporal."""
+
+        self.flush()
+        sql = "SELECT id, timestamp, action, outcome FROM episodes"
+        parametros: List[Any] = []
+        if last is not None:
+            sql = f"SELECT * FROM ({sql} ORDER BY id DESC LIMIT ?)"
+            parametros.append(last)
+        # SQLite toma las fechas sin zona como UTC: se filtra con un día de
+        # margen y se comprueba después con la misma clave que la memoria base
+        sql += " WHERE julianday(timestamp) >= ?"
+        parametros.append((limite - 86400) / 86400 + _UNIX_EPOCH_JULIAN_DAY)
+        filas = []
+        for episode_id, timestamp, accion, resultado in self._conn.execute(sql, parametros):
+            clave = self._time_key(datetime.fromisoformat(timestamp))
+            if clave >= limite:
+                filas.append((clave, episode_id, accion, resultado))
+        filas.sort()
+        return [(accion, resultado) for _, _, accion, resultado in filas]
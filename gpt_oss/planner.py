@@ -31,6 +31,9 @@ class Planner:
         Modo operativo actualmente activo (`creative`, `analytic` o `deductive`).
     mode_parameters:
         Conjunto de parámetros asociados al modo activo (temperatura, heurísticas, etc.).
+    temperature_half_life:
+        Segundos tras los que un episodio pesa la mitad al promediar la
+        temperatura de un modo. Si es ``None`` todos los episodios pesan igual.
     """
 
     global_intent: Optional[str] = None
@@ -38,6 +41,7 @@ class Planner:
     mode: Optional[str] = None
     mode_parameters: Dict[str, Any] = field(default_factory=dict)
     memory: Optional[StrategicMemory] = None
+    temperature_half_life: Optional[float] = None
 
     def set_intention(self, intent: str) -> None:
         """Define la intención global del agente.
@@ -115,7 +119,8 @@ class Planner:
 
         Si existe memoria estratégica, consulta episodios previos exitosos del
         mismo modo para ajustar parámetros como la temperatura en función de los
-        resultados observados.
+        resultados observados. Con ``temperature_half_life`` los episodios
+        recientes pesan más en el promedio.
 
         Parámetros
         ----------
@@ -142,15 +147,23 @@ class Planner:
         parametros = estrategias[tipo].copy()
         if self.memory is not None:
             episodios = self.memory.query({"mode": tipo, "outcome": "success"})
-            temps = []
+            suma = peso_total = 0.0
             for ep in episodios:
                 valor = ep.metadata.get("temperature")
                 if isinstance(valor, (int, float)):
-                    temps.append(valor)
-            if temps:
-                parametros["temperature"] = sum(temps) / len(temps)
+                    peso = self._recency_weight(ep.timestamp)
+                    suma += peso * valor
+                    peso_total += peso
+            if peso_total > 0:
+                parametros["temperature"] = suma / peso_total
         self.mode_parameters = parametros
 
+    def _recency_weight(self, timestamp: datetime) -> float:
+        if self.temperature_half_life is None:
+            return 1.0
+        edad = (datetime.now(timestamp.tzinfo) - timestamp).total_seconds()
+        return 0.5 ** (max(edad, 0.0) / self.temperature_half_life)
+
     def attach_memory(self, memory: StrategicMemory) -> None:
         """Asocia una memoria estratégica al planificador."""
 
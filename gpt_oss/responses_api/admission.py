@@ -0,0 +1,212 @@
+"""Control de admisión y cola justa para las generaciones de la API de respuestas.
+
+Sin límite, cada solicitud empieza a generar en cuanto llega y, bajo carga, la
+latencia se degrada para todos a la vez. El controlador limita las
+generaciones activas (en número y en tokens), encola el exceso repartiendo los
+turnos entre clientes por rondas y rechaza con un tiempo de reintento estimado
+cuando la cola está llena.
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+class AdmissionRejected(Exception):
+    """La solicitud no puede admitirse; ``retry_after`` está en segundos."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"admission rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    client_id: str
+    cost: int
+    enqueued_at: float
+    admitted_at: Optional[float] = None
+    state: str = "queued"  # queued | active | released | dropped
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+class AdmissionController:
+    """Limita las generaciones concurrentes y reparte la cola entre clientes.
+
+    Parámetros (``None`` desactiva el límite correspondiente):
+
+    - ``max_active``: generaciones simultáneas.
+    - ``max_queued``: solicitudes en espera; por encima se rechaza.
+    - ``max_per_client``: solicitudes en curso (activas + en cola) por cliente.
+    - ``token_budget``: suma máxima del coste en tokens de las generaciones
+      activas. Una solicitud que por sí sola excede el presupuesto solo se
+      admite cuando no hay nada más activo.
+    - ``queue_timeout_s``: espera máxima en cola antes de rechazar.
+    """
+
+    def __init__(
+        self,
+        max_active: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_per_client: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        queue_timeout_s: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_per_client = max_per_client
+        self.token_budget = token_budget
+        self.queue_timeout_s = queue_timeout_s
+        self._clock = clock
+
+        # una cola FIFO por cliente; el orden del diccionario es el turno
+        self._queues: OrderedDict[str, deque[AdmissionTicket]] = OrderedDict()
+        self._inflight_by_client: Counter[str] = Counter()
+        self.active = 0
+        self.active_tokens = 0
+        self.queued = 0
+
+        self.admitted_total = 0
+        self.rejected_total: Counter[str] = Counter()
+        self.wait_time_total_s = 0.0
+        self.wait_time_max_s = 0.0
+        # media móvil del tiempo de servicio, para estimar Retry-After
+        self._service_time_s: Optional[float] = None
+
+    def _fits(self, cost: int) -> bool:
+        if self.max_active is not None and self.active >= self.max_active:
+            return False
+        if (
+            self.token_budget is not None
+            and self.active > 0
+            and self.active_tokens + cost > self.token_budget
+        ):
+            return False
+        return True
+
+    def retry_after(self) -> int:
+        """Estimación (en segundos, al menos 1) de cuándo habrá hueco."""
+        service_time = self._service_time_s or 1.0
+        slots = max(self.max_active or 1, 1)
+        return max(1, math.ceil(service_time * (self.queued + 1) / slots))
+
+    def _reject(self, reason: str):
+        self.rejected_total[reason] += 1
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _admit(self, ticket: AdmissionTicket):
+        ticket.state = "active"
+        ticket.admitted_at = self._clock()
+        wait = ticket.admitted_at - ticket.enqueued_at
+        self.wait_time_total_s += wait
+        self.wait_time_max_s = max(self.wait_time_max_s, wait)
+        self.admitted_total += 1
+        self.active += 1
+        self.active_tokens += ticket.cost
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.set_result(None)
+
+    def _drop_queued(self, ticket: AdmissionTicket):
+        ticket.state = "dropped"
+        self.queued -= 1
+        self._inflight_by_client[ticket.client_id] -= 1
+        if not self._inflight_by_client[ticket.client_id]:
+            del self._inflight_by_client[ticket.client_id]
+
+    def _dispatch(self):
+        while True:
+            # las esperas canceladas se descartan sin consumir turno
+            for client_id in list(self._queues):
+                queue = self._queues[client_id]
+                while queue and queue[0].future.done():
+                    self._drop_queued(queue.popleft())
+                if not queue:
+                    del self._queues[client_id]
+            for client_id, queue in self._queues.items():
+                if self._fits(queue[0].cost):
+                    break
+            else:
+                return
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            self.queued -= 1
+            self._admit(ticket)
+
+    async def acquire(self, client_id: str, cost: int = 0) -> AdmissionTicket:
+        """Espera turno para ``client_id``; lanza ``AdmissionRejected`` si no lo hay."""
+        if (
+            self.max_per_client is not None
+            and self._inflight_by_client[client_id] >= self.max_per_client
+        ):
+            self._reject("client_limit")
+
+        ticket = AdmissionTicket(client_id=client_id, cost=cost, enqueued_at=self._clock())
+        if not self._queues and self._fits(cost):
+            self._inflight_by_client[client_id] += 1
+            self._admit(ticket)
+            return ticket
+
+        if self.max_queued is not None and self.queued >= self.max_queued:
+            self._reject("queue_full")
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client_id, deque()).append(ticket)
+        self._inflight_by_client[client_id] += 1
+        self.queued += 1
+        try:
+            if self.queue_timeout_s is None:
+                await ticket.future
+            else:
+                await asyncio.wait_for(ticket.future, self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if ticket.state == "active":
+                # admitida justo cuando se cancelaba la espera
+                self.release(ticket)
+            elif ticket.state == "queued":
+                self._queues[client_id].remove(ticket)
+                if not self._queues[client_id]:
+                    del self._queues[client_id]
+                self._drop_queued(ticket)
+            if isinstance(exc, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        """Libera el hueco de ``ticket``; es idempotente."""
+        if ticket.state != "active":
+            return
+        ticket.state = "released"
+        self.active -= 1
+        self.active_tokens -= ticket.cost
+        self._inflight_by_client[ticket.client_id] -= 1
+        if not self._inflight_by_client[ticket.client_id]:
+            del self._inflight_by_client[ticket.client_id]
+        service_time = self._clock() - ticket.admitted_at
+        if self._service_time_s is None:
+            self._service_time_s = service_time
+        else:
+            self._service_time_s = 0.8 * self._service_time_s + 0.2 * service_time
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "active_tokens": self.active_tokens,
+            "queued": self.queued,
+            "admitted_total": self.admitted_total,
+            "rejected_total": dict(self.rejected_total),
+            "wait_time_total_s": self.wait_time_total_s,
+            "wait_time_max_s": self.wait_time_max_s,
+            "wait_time_avg_s": (
+                self.wait_time_total_s / self.admitted_total if self.admitted_total else 0.0
+            ),
+        }
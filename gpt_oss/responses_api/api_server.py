@@ -1,11 +1,14 @@
 import asyncio
 import datetime
+import logging
+import time
 import uuid
 from typing import Callable, Literal, Optional
 import json
 
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from openai_harmony import (
     Author,
     Conversation,
@@ -21,10 +24,14 @@ from openai_harmony import (
 )
 
 from gpt_oss.tools.simple_browser import SimpleBrowserTool
-from gpt_oss.tools.simple_browser.backend import ExaBackend
+from gpt_oss.tools.simple_browser.backend import Backend, ExaBackend
 
 SAFE_DOMAINS = {"openai.com"}
 
+from .admission import AdmissionController, AdmissionRejected
+from .detokenizer import IncrementalDetokenizer
+from .metrics import Counter, Gauge, GenerationTimer, ServerMetrics
+from .prefix_cache import PrefixRenderCache
 from .events import (
     ResponseCompletedEvent,
     ResponseCreatedEvent,
@@ -43,6 +50,9 @@ from .events import (
     ResponseWebSearchCallCompleted,
     ResponseOutputTextAnnotationAdded
 )
+from .sse import DeltaCoalescer, format_delta_event, format_event, format_response_event
+from .store import ResponseStore
+from .tool_executor import ToolExecutor
 from .types import (
     UrlCitation,
     Error,
@@ -62,6 +72,8 @@ from .types import (
 
 DEFAULT_TEMPERATURE = 0.0
 
+logger = logging.getLogger(__name__)
+
 
 def get_reasoning_effort(effort: Literal["low", "medium", "high"]) -> ReasoningEffort:
     if effort == "low":
@@ -76,10 +88,73 @@ def is_not_builtin_tool(recipient: str) -> bool:
     return not recipient.startswith("browser.") and not recipient == "python" and not recipient == "assistant"
 
 def create_api_server(
-    infer_next_token: Callable[[list[int], float], int], encoding: HarmonyEncoding
+    infer_next_token: Callable[[list[int], float], int],
+    encoding: HarmonyEncoding,
+    sse_coalesce_ms: float = 0.0,
+    prefix_cache_size: int = 128,
+    admission: Optional[AdmissionController] = None,
+    enable_metrics: bool = True,
+    responses_store: Optional[ResponseStore] = None,
+    browser_backend: Optional[Backend] = None,
+    tool_executor: Optional[ToolExecutor] = None,
 ) -> FastAPI:
     app = FastAPI()
-    responses_store: dict[str, tuple[ResponsesRequest, ResponseObject]] = {}
+    app.state.admission = admission
+    if responses_store is None:
+        responses_store = {}
+    if tool_executor is None:
+        tool_executor = ToolExecutor()
+    end_token = encoding.encode("<|end|>", allowed_special="all")[0]
+    # el backend del navegador no guarda estado de la conversación: se comparte entre solicitudes
+    shared_browser_backend = browser_backend
+    prefix_cache = PrefixRenderCache(encoding, maxsize=prefix_cache_size)
+    metrics = ServerMetrics() if enable_metrics else None
+    app.state.metrics = metrics
+
+    if metrics is not None:
+
+        def collect_prefix_cache():
+            hits = Counter("gpt_oss_prefix_cache_hits_total", "Aciertos de la caché de prefijos")
+            hits.inc(prefix_cache.hits)
+            misses = Counter("gpt_oss_prefix_cache_misses_total", "Fallos de la caché de prefijos")
+            misses.inc(prefix_cache.misses)
+            ratio = Gauge("gpt_oss_prefix_cache_hit_ratio", "Proporción de aciertos de la caché de prefijos")
+            lookups = prefix_cache.hits + prefix_cache.misses
+            ratio.set(prefix_cache.hits / lookups if lookups else 0.0)
+            return [hits, misses, ratio]
+
+        metrics.add_collector(collect_prefix_cache)
+
+        if admission is not None:
+
+            def collect_admission():
+                stats = admission.stats()
+                active = Gauge("gpt_oss_admission_active", "Generaciones admitidas en curso")
+                active.set(stats["active"])
+                queued = Gauge("gpt_oss_admission_queued", "Solicitudes esperando turno")
+                queued.set(stats["queued"])
+                admitted = Counter("gpt_oss_admission_admitted_total", "Solicitudes admitidas")
+                admitted.inc(stats["admitted_total"])
+                rejected = Counter(
+                    "gpt_oss_admission_rejected_total", "Solicitudes rechazadas", ("reason",)
+                )
+                for reason, count in stats["rejected_total"].items():
+                    rejected.inc(count, reason)
+                wait_sum = Counter(
+                    "gpt_oss_admission_wait_seconds_total", "Tiempo total de espera en cola"
+                )
+                wait_sum.inc(stats["wait_time_total_s"])
+                wait_max = Gauge("gpt_oss_admission_wait_seconds_max", "Mayor espera en cola")
+                wait_max.set(stats["wait_time_max_s"])
+                return [active, queued, admitted, rejected, wait_sum, wait_max]
+
+            metrics.add_collector(collect_admission)
+
+        @app.get("/metrics")
+        async def get_metrics():
+            return PlainTextResponse(
+                metrics.render(), media_type="text/plain; version=0.0.4"
+            )
 
     def generate_response(
         input_tokens: list[int],
@@ -91,11 +166,15 @@ def create_api_server(
         previous_response_id: Optional[str] = None,
         browser_tool: Optional[SimpleBrowserTool] = None,
         browser_call_ids: Optional[list[str]] = None,
+        messages: Optional[list[Message]] = None,
     ) -> ResponseObject:
         output = []
         error = None
         if len(output_tokens) > 0:
-            if debug_mode:
+            if messages is not None:
+                # mensajes ya analizados por el parser de streaming
+                entries = messages
+            elif debug_mode:
                 try:
                     entries = encoding.parse_messages_from_completion_tokens(
                         output_tokens, Role.ASSISTANT
@@ -245,28 +324,26 @@ def create_api_server(
             else None
         )
 
-        try:
-            debug_str = encoding.decode_utf8(input_tokens + output_tokens)
-        except Exception:
-            debug_str = input_tokens + output_tokens
-        try:
-            debug_input_str = encoding.decode_utf8(input_tokens)
-        except Exception:
-            debug_input_str = input_tokens
-        try:
-            debug_output_str = encoding.decode_utf8(output_tokens)
-        except Exception:
-            debug_output_str = output_tokens
-
-        metadata = (
-            {
+        metadata = {}
+        if debug_mode:
+            # las cadenas de depuración solo se decodifican cuando se solicitan
+            try:
+                debug_input_str = encoding.decode_utf8(input_tokens)
+            except Exception:
+                debug_input_str = input_tokens
+            try:
+                debug_output_str = encoding.decode_utf8(output_tokens)
+            except Exception:
+                debug_output_str = output_tokens
+            if isinstance(debug_input_str, str) and isinstance(debug_output_str, str):
+                debug_str = debug_input_str + debug_output_str
+            else:
+                debug_str = input_tokens + output_tokens
+            metadata = {
                 "__debug": debug_str,
                 "__debug_input": debug_input_str,
                 "__debug_output": debug_output_str,
             }
-            if debug_mode
-            else {}
-        )
 
         return ResponseObject(
             created_at=int(datetime.datetime.now().timestamp()),
@@ -302,6 +379,7 @@ def create_api_server(
                 Callable[[str, ResponsesRequest, ResponseObject], None]
             ] = None,
             browser_tool: Optional[SimpleBrowserTool] = None,
+            timer: Optional[GenerationTimer] = None,
         ):
             self.initial_tokens = initial_tokens
             self.tokens = initial_tokens.copy()
@@ -328,14 +406,71 @@ def create_api_server(
             self.browser_tool = browser_tool
             self.use_browser_tool = browser_tool is not None
             self.browser_call_ids: list[str] = []
+            # el texto decodificado de la salida solo se mantiene en modo depuración
+            self.detokenizer = (
+                IncrementalDetokenizer(encoding) if self.debug_mode else None
+            )
+            # agrupación opcional de deltas en un mismo frame SSE
+            self.coalescer = DeltaCoalescer(sse_coalesce_ms / 1000 if as_sse else 0.0)
+            self.timer = timer
+            self.parser_failed = False
 
-        def _send_event(self, event: ResponseEvent):
-            event.sequence_number = self.sequence_number
+        def _next_sequence_number(self) -> int:
+            sequence_number = self.sequence_number
             self.sequence_number += 1
+            return sequence_number
+
+        def _flush_deltas(self) -> str:
+            frames = ""
+            for (event_cls, output_index, content_index), delta in self.coalescer.flush():
+                frames += format_delta_event(
+                    event_cls,
+                    self._next_sequence_number(),
+                    delta,
+                    output_index=output_index,
+                    content_index=content_index,
+                )
+            return frames
+
+        def _send_event(self, event: ResponseEvent):
             if self.as_sse:
-                return f"event: {event.type}\ndata: {event.model_dump_json(indent=None)}\n\n"
-            else:
-                return event
+                # los deltas retenidos deben salir antes que cualquier otro evento
+                pending = self._flush_deltas()
+                event.sequence_number = self._next_sequence_number()
+                return pending + format_event(event)
+            event.sequence_number = self._next_sequence_number()
+            return event
+
+        def _send_delta(self, event_cls, delta: str, output_index: int, content_index: int):
+            """Ruta rápida para los deltas de texto; devuelve ``None`` si el delta queda retenido."""
+            if not self.as_sse:
+                return self._send_event(
+                    event_cls(
+                        output_index=output_index,
+                        content_index=content_index,
+                        delta=delta,
+                    )
+                )
+            frames = ""
+            for (batch_cls, batch_output_index, batch_content_index), text in self.coalescer.add(
+                (event_cls, output_index, content_index), delta
+            ):
+                frames += format_delta_event(
+                    batch_cls,
+                    self._next_sequence_number(),
+                    text,
+                    output_index=batch_output_index,
+                    content_index=batch_content_index,
+                )
+            return frames or None
+
+        def _ingest_tokens(self, tokens: list[int]):
+            """Alimenta el parser con ``tokens`` y los añade de una vez a la salida y al contexto."""
+            process = self.parser.process
+            for token in tokens:
+                process(token)
+            self.output_tokens.extend(tokens)
+            self.tokens.extend(tokens)
 
         async def run(self):
             browser_tool = self.browser_tool
@@ -349,18 +484,28 @@ def create_api_server(
                 previous_response_id=self.request_body.previous_response_id,
             )
             initial_response.status = "in_progress"
-            yield self._send_event(
-                ResponseCreatedEvent(
-                    type="response.created",
-                    response=initial_response,
+            if self.as_sse:
+                # ambos eventos comparten el mismo objeto: se serializa una sola vez
+                initial_response_json = initial_response.model_dump_json(indent=None)
+                yield format_response_event(
+                    "response.created", self._next_sequence_number(), initial_response_json
                 )
-            )
-            yield self._send_event(
-                ResponseInProgressEvent(
-                    type="response.in_progress",
-                    response=initial_response,
+                yield format_response_event(
+                    "response.in_progress", self._next_sequence_number(), initial_response_json
+                )
+            else:
+                yield self._send_event(
+                    ResponseCreatedEvent(
+                        type="response.created",
+                        response=initial_response,
+                    )
+                )
+                yield self._send_event(
+                    ResponseInProgressEvent(
+                        type="response.in_progress",
+                        response=initial_response,
+                    )
                 )
-            )
 
             current_content_index = (
                 0  # en esta implementación siempre tendremos solo un elemento de contenido
@@ -379,17 +524,21 @@ def create_api_server(
                 if self.request is not None and await self.request.is_disconnected():
                     print("Client disconnected, stopping token generation.")
                     break
+                if self.timer is not None:
+                    call_started = time.perf_counter()
                 next_tok = infer_next_token(
                     self.tokens,
                     temperature=self.temperature,
                     new_request=self.new_request,
                 )
+                if self.timer is not None:
+                    self.timer.token(call_started, time.perf_counter(), self.new_request)
                 self.new_request = False
                 self.tokens.append(next_tok)
                 try:
                     self.parser.process(next_tok)
                 except Exception as e:
-                    pass
+                    self.parser_failed = True
 
                 if self.parser.state == StreamState.EXPECT_START:
                     current_output_index += 1
@@ -531,10 +680,19 @@ def create_api_server(
                     output_delta_buffer += self.parser.last_content_delta
                     should_send_output_text_delta = True
                     if browser_tool:
-                        # normalizamos sobre todo el texto actual para obtener los índices correctos en las citas
-                        updated_output_text, annotations, has_partial_citations = browser_tool.normalize_citations(current_output_text_content + output_delta_buffer)
-                        # eliminar el texto actual para recuperar el delta pero ya normalizado
-                        output_delta_buffer = updated_output_text[len(current_output_text_content):]
+                        # el texto ya enviado está normalizado y ninguna cita puede empezar en él
+                        # (las citas parciales se retienen en el búfer), así que basta con
+                        # normalizar el búfer y desplazar los índices de las anotaciones
+                        output_delta_buffer, buffer_annotations, has_partial_citations = browser_tool.normalize_citations(output_delta_buffer)
+                        offset = len(current_output_text_content)
+                        annotations = [
+                            {
+                                **a,
+                                "start_index": a["start_index"] + offset,
+                                "end_index": a["end_index"] + offset,
+                            }
+                            for a in buffer_annotations
+                        ]
 
                         # Filtrar anotaciones para incluir solo aquellas cuyo start_index no esté ya presente en current_annotations
                         # esto evita enviar anotaciones duplicadas ya que múltiples anotaciones no pueden estar en el mismo lugar
@@ -558,14 +716,14 @@ def create_api_server(
 
 
                     if should_send_output_text_delta:
-                        yield self._send_event(
-                            ResponseOutputTextDelta(
-                                type="response.output_text.delta",
-                                output_index=current_output_index,
-                                content_index=current_content_index,
-                                delta=output_delta_buffer,
-                            )
+                        frame = self._send_delta(
+                            ResponseOutputTextDelta,
+                            output_delta_buffer,
+                            current_output_index,
+                            current_content_index,
                         )
+                        if frame is not None:
+                            yield frame
                         current_output_text_content += output_delta_buffer
                         output_delta_buffer = ""
 
@@ -593,24 +751,21 @@ def create_api_server(
                                 part=ReasoningTextContentItem(type="reasoning_text", text=""),
                             )
                         )
-                    yield self._send_event(
-                        ResponseReasoningTextDelta(
-                            type="response.reasoning_text.delta",
-                            output_index=current_output_index,
-                            content_index=current_content_index,
-                            delta=self.parser.last_content_delta,
-                        )
+                    frame = self._send_delta(
+                        ResponseReasoningTextDelta,
+                        self.parser.last_content_delta,
+                        current_output_index,
+                        current_content_index,
                     )
+                    if frame is not None:
+                        yield frame
 
-                try:
-                    # solo con fines de depuración
-                    output_token_text = encoding.decode_utf8([next_tok])
+                if self.detokenizer is not None:
+                    # solo con fines de depuración; conserva los bytes UTF-8 partidos entre tokens
+                    output_token_text = self.detokenizer.push(next_tok)
                     self.output_text += output_token_text
                     print(output_token_text, end="", flush=True)
 
-                except RuntimeError:
-                    pass
-
                 if next_tok in encoding.stop_tokens_for_assistant_actions():
                     if len(self.parser.messages) > 0:
                         last_message = self.parser.messages[-1]
@@ -665,6 +820,23 @@ def create_api_server(
                                     results.append(msg)
                                 return results
 
+                            async def run_tool_with_timeout():
+                                try:
+                                    return await tool_executor.run(run_tool())
+                                except asyncio.TimeoutError:
+                                    return [
+                                        Message.from_author_and_content(
+                                            Author.new(Role.TOOL, last_message.recipient),
+                                            json.dumps(
+                                                {
+                                                    "error": f"Tool call timed out after {tool_executor.timeout_s}s"
+                                                }
+                                            ),
+                                        )
+                                        .with_recipient("assistant")
+                                        .with_channel(last_message.channel)
+                                    ]
+
                             yield self._send_event(
                                 ResponseWebSearchCallSearching(
                                     type="response.web_search_call.searching",
@@ -672,20 +844,22 @@ def create_api_server(
                                     id=web_search_call_id,
                                 )
                             )
-                            result = await run_tool()
+                            tool_started = time.perf_counter()
+                            result = await run_tool_with_timeout()
+                            if metrics is not None:
+                                metrics.tool_call_duration.observe(
+                                    time.perf_counter() - tool_started,
+                                    last_message.recipient,
+                                )
 
                             new_tokens = encoding.render_conversation_for_completion(
                                 Conversation.from_messages(result), Role.ASSISTANT
                             )
-                            
-                            print(encoding.decode_utf8(new_tokens))
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("tool output: %s", encoding.decode_utf8(new_tokens))
                             self.output_tokens.append(next_tok)
-                            self.tokens.append(encoding.encode('<|end|>', allowed_special="all")[0])
-
-                            for token in new_tokens:
-                                self.parser.process(token)
-                                self.output_tokens.append(token)
-                                self.tokens.append(token)
+                            self.tokens.append(end_token)
+                            self._ingest_tokens(new_tokens)
 
                             yield self._send_event(
                                 ResponseWebSearchCallCompleted(
@@ -720,6 +894,16 @@ def create_api_server(
                 self.output_tokens.append(next_tok)
 
             if self.request is None or not await self.request.is_disconnected():
+                # Si el parser terminó en un límite de mensaje se reutilizan sus mensajes;
+                # con un mensaje a medias, errores de análisis o __debug se vuelve a
+                # analizar toda la salida.
+                streamed_messages = None
+                if (
+                    not self.debug_mode
+                    and not self.parser_failed
+                    and self.parser.state == StreamState.EXPECT_START
+                ):
+                    streamed_messages = self.parser.messages
                 response = generate_response(
                     self.initial_tokens,
                     self.output_tokens,
@@ -730,6 +914,7 @@ def create_api_server(
                     previous_response_id=self.request_body.previous_response_id,
                     browser_tool=self.browser_tool,
                     browser_call_ids=self.browser_call_ids,
+                    messages=streamed_messages,
                 )
                 if self.store_callback and self.request_body.store:
                     self.store_callback(self.response_id, self.request_body, response)
@@ -742,7 +927,11 @@ def create_api_server(
 
     @app.post("/v1/responses", response_model=ResponseObject)
     async def generate(body: ResponsesRequest, request: Request):
-        print("request received")
+        nonlocal shared_browser_backend
+        request_started = time.perf_counter()
+        logger.info("request received")
+        if metrics is not None:
+            metrics.requests.inc(1, "true" if body.stream else "false")
 
         use_browser_tool = any(
             getattr(tool, "type", None) == "browser_search"
@@ -750,11 +939,12 @@ def create_api_server(
         )
 
         if use_browser_tool:
-            backend = ExaBackend(
-                source="web",
-                allowed_domains=SAFE_DOMAINS,
-            )
-            browser_tool = SimpleBrowserTool(backend=backend)
+            if shared_browser_backend is None:
+                shared_browser_backend = ExaBackend(
+                    source="web",
+                    allowed_domains=SAFE_DOMAINS,
+                )
+            browser_tool = SimpleBrowserTool(backend=shared_browser_backend)
         else:
             browser_tool = None
 
@@ -782,48 +972,63 @@ def create_api_server(
                 body.input = merged_input
 
 
-        system_message_content = SystemContent.new().with_conversation_start_date(
-            datetime.datetime.now().strftime("%Y-%m-%d")
-        )
-        
-        if body.reasoning is not None:
-            reasoning_effort = get_reasoning_effort(body.reasoning.effort)
-            system_message_content = system_message_content.with_reasoning_effort(reasoning_effort)
+        conversation_start_date = datetime.datetime.now().strftime("%Y-%m-%d")
+        function_tools = [tool for tool in (body.tools or []) if tool.type == "function"]
 
-        if use_browser_tool:
-            system_message_content = system_message_content.with_tools(browser_tool.tool_config)
+        def build_prefix_messages() -> list[Message]:
+            system_message_content = SystemContent.new().with_conversation_start_date(
+                conversation_start_date
+            )
 
-        system_message = Message.from_role_and_content(
-            Role.SYSTEM, system_message_content
-        )
+            if body.reasoning is not None:
+                reasoning_effort = get_reasoning_effort(body.reasoning.effort)
+                system_message_content = system_message_content.with_reasoning_effort(reasoning_effort)
 
-        developer_message_content = DeveloperContent.new().with_instructions(
-            body.instructions
-        )
+            if use_browser_tool:
+                system_message_content = system_message_content.with_tools(browser_tool.tool_config)
 
-        tools = []
-        if body.tools:
-            for tool in body.tools:
-                if tool.type == "function":
-                    has_functions = True
-                    tools.append(
-                        ToolDescription.new(
-                            tool.name,
-                            tool.description,
-                            tool.parameters,
-                        )
-                    )
-        
-        if len(tools) > 0:
-            developer_message_content = developer_message_content.with_function_tools(
-                tools
+            system_message = Message.from_role_and_content(
+                Role.SYSTEM, system_message_content
+            )
+
+            developer_message_content = DeveloperContent.new().with_instructions(
+                body.instructions
             )
 
-        developer_message = Message.from_role_and_content(
-            Role.DEVELOPER, developer_message_content
+            tools = [
+                ToolDescription.new(
+                    tool.name,
+                    tool.description,
+                    tool.parameters,
+                )
+                for tool in function_tools
+            ]
+
+            if len(tools) > 0:
+                developer_message_content = developer_message_content.with_function_tools(
+                    tools
+                )
+
+            developer_message = Message.from_role_and_content(
+                Role.DEVELOPER, developer_message_content
+            )
+            return [system_message, developer_message]
+
+        # clave del prefijo: todo lo que determina los mensajes de sistema y desarrollador
+        prefix_key = (
+            body.instructions,
+            tuple(
+                (tool.name, tool.description, json.dumps(tool.parameters, sort_keys=True))
+                for tool in function_tools
+            ),
+            body.reasoning.effort if body.reasoning is not None else None,
+            conversation_start_date,
+            use_browser_tool,
         )
 
-        messages = [system_message, developer_message]
+        # mensajes de sistema incluidos en la entrada; se colocan antes del prefijo
+        input_system_messages = []
+        messages = []
 
         if isinstance(body.input, str):
             user_message = Message.from_role_and_content(Role.USER, body.input)
@@ -843,13 +1048,13 @@ def create_api_server(
                 if item.type == "message":
                     if item.role == Role.SYSTEM:
                         if isinstance(item.content, str):
-                            messages.insert(
+                            input_system_messages.insert(
                                 0,
                                 Message.from_role_and_content(Role.SYSTEM, item.content),
                             )
                         else:
                             for content_item in item.content:
-                                messages.insert(
+                                input_system_messages.insert(
                                     0,
                                     Message.from_role_and_content(
                                         Role.SYSTEM, content_item.text
@@ -866,7 +1071,7 @@ def create_api_server(
                                 Message.from_role_and_content(item.role, content_item.text)
                             )
                     # agregar el canal final al último mensaje si proviene del asistente
-                    if item.role == Role.ASSISTANT:
+                    if item.role == Role.ASSISTANT and messages:
                         messages[-1] = messages[-1].with_channel("final")
                 elif item.type == "reasoning":
                     # Incluir razonamiento solo si ocurre después del último mensaje del asistente y estamos manejando una llamada a función en ese momento
@@ -899,17 +1104,47 @@ def create_api_server(
                         ).with_recipient("assistant").with_channel("commentary")
                     )
 
-        conversation = Conversation.from_messages(messages)
-
-        initial_tokens = encoding.render_conversation_for_completion(
-            conversation, Role.ASSISTANT
-        )
-        print(encoding.decode_utf8(initial_tokens))
+        if input_system_messages:
+            conversation = Conversation.from_messages(
+                input_system_messages + build_prefix_messages() + messages
+            )
+            initial_tokens = encoding.render_conversation_for_completion(
+                conversation, Role.ASSISTANT
+            )
+        else:
+            initial_tokens = prefix_cache.render_for_completion(
+                prefix_key, build_prefix_messages, messages
+            )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("prompt: %s", encoding.decode_utf8(initial_tokens))
         response_id = f"resp_{uuid.uuid4().hex}"
 
         def store_callback(rid: str, req: ResponsesRequest, resp: ResponseObject):
             responses_store[rid] = (req, resp)
 
+        ticket = None
+        if admission is not None:
+            client_id = request.headers.get("x-client-id") or (
+                request.client.host if request.client else "anonymous"
+            )
+            try:
+                ticket = await admission.acquire(
+                    client_id, len(initial_tokens) + (body.max_output_tokens or 0)
+                )
+            except AdmissionRejected as exc:
+                return JSONResponse(
+                    status_code=429,
+                    content={
+                        "error": {
+                            "message": "Server is saturated, retry later",
+                            "type": "rate_limit_exceeded",
+                            "code": exc.reason,
+                        }
+                    },
+                    headers={"Retry-After": str(exc.retry_after)},
+                )
+
+        timer = metrics.start_generation(request_started) if metrics is not None else None
         event_stream = StreamResponsesEvents(
             initial_tokens,
             body,
@@ -918,14 +1153,40 @@ def create_api_server(
             response_id=response_id,
             store_callback=store_callback,
             browser_tool=browser_tool,
+            timer=timer,
         )
 
+        def finish():
+            # idempotente: puede llamarse desde el generador y desde la tarea de fondo
+            if ticket is not None:
+                admission.release(ticket)
+            if timer is not None:
+                timer.finish()
+
         if body.stream:
-            return StreamingResponse(event_stream.run(), media_type="text/event-stream")
+            if ticket is None and timer is None:
+                return StreamingResponse(event_stream.run(), media_type="text/event-stream")
+
+            async def run_tracked():
+                try:
+                    async for event in event_stream.run():
+                        yield event
+                finally:
+                    finish()
+
+            # la tarea de fondo cubre el caso en que el generador nunca llega a iniciarse
+            return StreamingResponse(
+                run_tracked(),
+                media_type="text/event-stream",
+                background=BackgroundTask(finish),
+            )
         else:
             last_event = None
-            async for event in event_stream.run():
-                last_event = event
+            try:
+                async for event in event_stream.run():
+                    last_event = event
+            finally:
+                finish()
 
             return last_event.response
 
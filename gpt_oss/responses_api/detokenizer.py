@@ -0,0 +1,42 @@
+"""Decodificación incremental de tokens para el streaming de la API de respuestas."""
+
+import codecs
+from typing import Iterable
+
+from openai_harmony import HarmonyEncoding
+
+
+class IncrementalDetokenizer:
+    """Convierte tokens en texto a medida que llegan.
+
+    Mantiene el estado a nivel de bytes para las secuencias UTF-8 que quedan
+    partidas entre tokens, de modo que cada llamada a :meth:`push` cuesta
+    O(delta) en lugar de volver a decodificar toda la salida acumulada. Los
+    bytes de cada token se memorizan porque el vocabulario se repite mucho a lo
+    largo de una respuesta.
+    """
+
+    def __init__(self, encoding: HarmonyEncoding):
+        self._encoding = encoding
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._token_bytes: dict[int, bytes] = {}
+
+    def _bytes_for(self, token: int) -> bytes:
+        data = self._token_bytes.get(token)
+        if data is None:
+            data = self._encoding.decode_bytes([token])
+            self._token_bytes[token] = data
+        return data
+
+    def push(self, token: int) -> str:
+        """Añade ``token`` y devuelve el texto que ya puede emitirse."""
+        return self._decoder.decode(self._bytes_for(token))
+
+    def extend(self, tokens: Iterable[int]) -> str:
+        """Añade varios tokens de una vez y devuelve el delta resultante."""
+        data = b"".join(self._bytes_for(token) for token in tokens)
+        return self._decoder.decode(data)
+
+    def flush(self) -> str:
+        """Vacía los bytes pendientes (los incompletos se sustituyen por U+FFFD)."""
+        return self._decoder.decode(b"", final=True)
@@ -0,0 +1,160 @@
+"""Proceso de motor que posee el modelo y lo sirve por un socket local.
+
+Con varios procesos de front-end (uno por núcleo) el modelo sigue cargado una
+sola vez: cada worker usa ``EngineClient`` como su ``infer_next_token`` y el
+motor atiende las llamadas de todos los workers de una en una.
+
+Para no reenviar el contexto completo en cada token, el cliente recuerda lo
+que ya envió para cada stream (en una ranura numerada de su conexión) y, si
+la nueva lista de tokens extiende alguno, solo manda los tokens nuevos. El
+motor reconstruye la lista completa de esa ranura y se la pasa al backend,
+que conserva su semántica habitual.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Optional
+
+InferFn = Callable[..., int]
+
+DEFAULT_CLIENT_STREAMS = 16
+
+
+def _serve_connection(conn: Connection, infer_next_token: InferFn, lock: threading.Lock):
+    # ranura -> tokens recibidos para ese stream
+    streams: dict[int, list[int]] = {}
+    with conn:
+        while True:
+            try:
+                op, slot, payload, temperature, new_request = conn.recv()
+            except (EOFError, OSError):
+                return
+            if op == "reset":
+                tokens = streams[slot] = list(payload)
+            else:
+                tokens = streams[slot]
+                tokens.extend(payload)
+            try:
+                with lock:
+                    next_tok = infer_next_token(
+                        tokens, temperature=temperature, new_request=new_request
+                    )
+            except Exception as e:
+                conn.send(("error", repr(e)))
+            else:
+                conn.send(("ok", next_tok))
+
+
+def serve_engine(
+    infer_next_token: InferFn,
+    address: str,
+    authkey: bytes,
+    ready: Optional[Callable[[], None]] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """Acepta conexiones en ``address`` (socket Unix) hasta que se active ``stop``."""
+    lock = threading.Lock()
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        if ready is not None:
+            ready()
+        while stop is None or not stop.is_set():
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                # un cliente con otra clave no debe tumbar el motor
+                continue
+            except OSError:
+                if stop is not None and stop.is_set():
+                    return
+                raise
+            threading.Thread(
+                target=_serve_connection,
+                args=(conn, infer_next_token, lock),
+                daemon=True,
+            ).start()
+
+
+def run_engine_process(
+    load_infer_next_token: Callable[[], InferFn],
+    address: str,
+    authkey: bytes,
+    ready_event=None,
+):
+    """Punto de entrada del proceso de motor: carga el modelo y sirve peticiones."""
+    infer_next_token = load_infer_next_token()
+    serve_engine(
+        infer_next_token,
+        address,
+        authkey,
+        ready=ready_event.set if ready_event is not None else None,
+    )
+
+
+class EngineClient:
+    """``infer_next_token`` remoto con la misma firma que los backends locales.
+
+    Recuerda lo enviado para hasta ``max_streams`` streams, de modo que varios
+    streams intercalados sobre el mismo cliente siguen mandando solo sus
+    tokens nuevos; la ranura menos usada recientemente se reutiliza para un
+    historial que no extiende ninguna.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        authkey: bytes,
+        connect_timeout_s: float = 30.0,
+        max_streams: int = DEFAULT_CLIENT_STREAMS,
+    ):
+        deadline = time.monotonic() + connect_timeout_s
+        while True:
+            try:
+                self._conn = Client(address, family="AF_UNIX", authkey=authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+        self._lock = threading.Lock()
+        self.max_streams = max_streams
+        # ranura -> tokens que el motor ya tiene, de la menos a la más reciente
+        self._sent: OrderedDict[int, list[int]] = OrderedDict()
+
+    def _slot_for(self, tokens: list[int]) -> tuple[int, int]:
+        """Ranura con el historial más largo que ``tokens`` extiende y su longitud (0 si ninguna)."""
+        best_slot, best_len = None, 0
+        for slot, sent in self._sent.items():
+            n = len(sent)
+            if best_len < n <= len(tokens) and tokens[n - 1] == sent[-1] and tokens[:n] == sent:
+                best_slot, best_len = slot, n
+        if best_slot is not None:
+            return best_slot, best_len
+        if len(self._sent) < self.max_streams:
+            return len(self._sent), 0
+        return next(iter(self._sent)), 0
+
+    def __call__(
+        self,
+        tokens: list[int],
+        temperature: float = 0.0,
+        new_request: bool = False,
+    ) -> int:
+        with self._lock:
+            slot, n = self._slot_for(tokens)
+            if n:
+                self._conn.send(("extend", slot, tokens[n:], temperature, new_request))
+                self._sent[slot].extend(tokens[n:])
+            else:
+                self._sent[slot] = list(tokens)
+                self._conn.send(("reset", slot, self._sent[slot], temperature, new_request))
+            self._sent.move_to_end(slot)
+            status, value = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"engine error: {value}")
+        return value
+
+    def close(self):
+        self._conn.close()
@@ -1,15 +1,19 @@
 """
 NOTA: esta es una implementación improvisada que usa Ollama para la inferencia. Se utiliza
-principalmente para pruebas y desarrollo. No aprovecha ningún almacenamiento en caché de
-prompts ni otras optimizaciones y, por lo tanto, puede ser lenta entre turnos.
+principalmente para pruebas y desarrollo. Solo reutiliza el ``context`` que devuelve Ollama
+cuando el nuevo prompt extiende una conversación anterior; fuera de ese caso no hay
+almacenamiento en caché de prompts y puede ser lenta entre turnos.
 """
 
 import json
 import os
 import threading
 import time
+from collections import OrderedDict, deque
 from typing import Callable, Optional
+import regex
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 
 from openai_harmony import load_harmony_encoding, HarmonyEncodingName
@@ -21,12 +25,28 @@ EOS_TOKEN = 200002  # emitido en un tiempo de espera forzado
 PAD_TOKEN = 0
 
 # Parámetros ajustables
-POLL_INTERVAL_S = 0.01           # 10ms entre comprobaciones del búfer
 CALL_MAX_WAIT_S = 0.250          # tiempo máximo de bloqueo en una sola llamada de inferencia
 NO_TOKEN_TIMEOUT_S = 15.0        # tiempo de inactividad total antes de emitir EOS
 FIRST_BYTE_TIMEOUT_S = 30.0      # tiempo de espera para el primer token antes de EOS
+REQUEST_TIMEOUT_S = 60.0         # tiempo de espera de conexión/lectura de la petición HTTP
+TAIL_SEGMENTS = 2                # segmentos finales que se retienen hasta que su tokenización es estable
+DEFAULT_MAX_CONVERSATIONS = 8    # conversaciones con estado propio antes de expulsar la menos reciente
 DEFAULT_ENDPOINT_URL = "http://localhost:11434/api/generate"
 
+# Pre-tokenización de o200k, la que usa el encoding harmony de gpt-oss; se usa
+# cuando el encoding no expone su ``pat_str``.
+O200K_PAT_STR = "|".join(
+    [
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]
+)
+
 
 def _now() -> float:
     return time.monotonic()
@@ -40,10 +60,119 @@ def lcp(cache: list[int], inp: list[int]) -> list[int]:
     return cache[:i]
 
 
-class OllamaStreamer:
-    """Gestiona el estado de streaming para una única instancia de modelo Ollama."""
+class IncrementalEncoder:
+    """Tokeniza texto que llega por fragmentos sin volver a codificarlo entero.
+
+    El BPE se aplica por separado a cada segmento de la pre-tokenización
+    (``pat_str`` del encoding), así que solo es seguro cortar en el inicio de
+    un segmento que ya no puede cambiar. Se retienen los últimos
+    ``tail_segments`` segmentos, que un fragmento posterior aún puede alargar
+    o reagrupar (un número de tres cifras, una palabra, un bloque de
+    espacios), y se codifica y emite el resto. Un ``<|`` sin cerrar (un token
+    especial a medio llegar) no se corta, y si lo pendiente contiene ``<|`` el
+    corte se comprueba contra su codificación completa. ``flush()`` emite lo que quede al final del
+    stream. La secuencia resultante coincide con la de codificar el texto
+    completo de una vez.
+    """
+
+    def __init__(self, encoding, tail_segments: int = TAIL_SEGMENTS):
+        self.encoding = encoding
+        self.tail_segments = max(1, tail_segments)
+        pat_str = getattr(encoding, "_pat_str", None) or O200K_PAT_STR
+        self._pattern = regex.compile(pat_str)
+        self._pending = ""
+
+    def _segment_ends(self, text: str) -> list[int]:
+        return [m.end() for m in self._pattern.finditer(text)]
+
+    def _stable_cut(self, pending: str) -> int:
+        """Longitud del prefijo de ``pending`` cuya tokenización ya no puede cambiar."""
+        ends = self._segment_ends(pending)
+        # un token especial a medio llegar (``<|`` sin su ``|>``) no se corta
+        limit = len(pending)
+        opening = pending.rfind("<|")
+        if opening >= 0 and "|>" not in pending[opening + 2:]:
+            limit = opening
+        # el prefijo se codifica por separado: el corte solo vale si, aislado,
+        # se segmenta igual que dentro de ``pending`` (un bloque de espacios al
+        # final del prefijo, por ejemplo, se agruparía de otra forma)
+        for i in range(len(ends) - self.tail_segments, 0, -1):
+            cut = ends[i - 1]
+            if cut <= limit and self._segment_ends(pending[:cut]) == ends[:i]:
+                return cut
+        return 0
+
+    def feed(self, text: str) -> list[int]:
+        """Añade ``text`` y devuelve los tokens que ya no pueden cambiar."""
+        pending = self._pending + text
+        self._pending = pending
+        cut = self._stable_cut(pending)
+        if cut <= 0:
+            return []
+        toks = self.encoding.encode(pending[:cut], allowed_special="all")
+        if "<|" in pending:
+            # un token especial se separa antes de la pre-tokenización: solo se
+            # acepta el corte si coincide con la codificación de todo lo pendiente
+            full = self.encoding.encode(pending, allowed_special="all")
+            if full[: len(toks)] != toks or len(full) == len(toks):
+                return []
+        self._pending = pending[cut:]
+        return toks
+
+    def flush(self) -> list[int]:
+        """Codifica y devuelve el texto retenido."""
+        pending, self._pending = self._pending, ""
+        if not pending:
+            return []
+        return self.encoding.encode(pending, allowed_special="all")
+
+
+class _Conversation:
+    """Estado de streaming y contexto de Ollama de una conversación."""
+
+    def __init__(self, context: Optional[list[int]] = None, context_tokens: list[int] = ()):
+        self.token_buffer: deque[int] = deque()
+        self.lock = threading.Lock()
+        self.tokens_available = threading.Condition(self.lock)
+        # identifica el stream vigente; los hilos de streams anteriores dejan de escribir
+        self.generation = 0
+        self.stream_thread: Optional[threading.Thread] = None
+        self.stream_done = threading.Event()
+        self.stream_error: Optional[Exception] = None
+        self.last_progress_ts = _now()
+        # contexto devuelto por Ollama y tokens de la conversación que representa
+        # (sin el EOS final, que el servidor sustituye al renderizar el turno siguiente)
+        self.context = context
+        self.context_tokens = list(context_tokens)
+        # lista que enviará el servidor en la próxima llamada de este stream
+        self.history: list[int] = []
+
+    @property
+    def busy(self) -> bool:
+        return self.stream_thread is not None and not self.stream_done.is_set()
+
 
-    def __init__(self, model_name: str, endpoint_url: Optional[str] = None):
+class OllamaStreamer:
+    """Gestiona el estado de streaming para una única instancia de modelo Ollama.
+
+    Las peticiones comparten una ``requests.Session`` con conexiones keep-alive
+    y los tokens pasan del hilo lector al consumidor mediante una variable de
+    condición, de modo que la latencia por token la marca la red y no un
+    intervalo de sondeo.
+
+    Cada conversación tiene su propio stream y su propio ``context`` de Ollama,
+    de modo que varias solicitudes pueden generar en paralelo. Cada llamada se
+    asocia al stream cuyo historial coincide exactamente con ``tokens``. Un
+    prompt nuevo continúa la conversación cuyo contexto es prefijo suyo y solo
+    envía el sufijo; las conversaciones se expulsan por LRU.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        endpoint_url: Optional[str] = None,
+        max_conversations: int = DEFAULT_MAX_CONVERSATIONS,
+    ):
         self.encoding = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
         self.model_name = model_name
         url = endpoint_url or os.environ.get("OLLAMA_ENDPOINT", DEFAULT_ENDPOINT_URL)
@@ -53,44 +182,113 @@ class OllamaStreamer:
                 f"Ollama endpoint must use HTTP or HTTPS, got: {url}"
             )
         self.endpoint_url = url
+        self.max_conversations = max_conversations
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, max_conversations))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
-        # Estado por instancia
-        self._token_buffer: list[int] = []
-        self._buffer_lock = threading.Lock()
-        self._stream_thread: Optional[threading.Thread] = None
-        self._stream_done = threading.Event()
-        self._stream_error: Optional[Exception] = None
+        # conversaciones de la menos a la más recientemente usada
+        self._conversations: OrderedDict[int, _Conversation] = OrderedDict()
+        self._conversations_lock = threading.Lock()
+        self._next_conversation_id = 0
         self._last_progress_ts: float = 0.0
-        self._previous_request_tokens: list[int] = []
+        # último stream iniciado, para llamadas sin historial (``tokens`` vacío)
+        self._last_started: Optional[_Conversation] = None
 
     # ------------------------------------------------------------------
     # Funciones internas
-    def _touch_progress(self) -> None:
-        self._last_progress_ts = _now()
-
-    def _reset_stream_state(self) -> None:
-        with self._buffer_lock:
-            self._token_buffer = []
-        self._stream_done.clear()
-        self._stream_thread = None
-        self._stream_error = None
-        self._touch_progress()
-
-    def _start_stream(self, token_ids: list[int], temperature: float):
-        prompt_text = self.encoding.decode(token_ids)
+    def _add_conversation(self, conversation: _Conversation) -> _Conversation:
+        self._conversations[self._next_conversation_id] = conversation
+        self._next_conversation_id += 1
+        while len(self._conversations) > self.max_conversations:
+            # se expulsa la menos reciente que no esté generando; si todas lo están, la más antigua
+            victim = next(
+                (key for key, c in self._conversations.items() if not c.busy),
+                next(iter(self._conversations)),
+            )
+            evicted = self._conversations.pop(victim)
+            with evicted.lock:
+                evicted.generation += 1
+        return conversation
+
+    def _conversation_for_prompt(self, prompt: list[int]) -> tuple[_Conversation, int]:
+        """Elige la conversación para un prompt nuevo y la longitud del prefijo ya en Ollama."""
+        with self._conversations_lock:
+            best_key, best_len = None, 0
+            for key, conversation in self._conversations.items():
+                n = len(conversation.context_tokens)
+                if (
+                    conversation.context is not None
+                    and best_len < n <= len(prompt)
+                    and prompt[:n] == conversation.context_tokens
+                ):
+                    best_key, best_len = key, n
+            if best_key is None:
+                return self._add_conversation(_Conversation()), 0
+            best = self._conversations[best_key]
+            if best.busy:
+                # la conversación sigue generando para otra solicitud: se bifurca su contexto
+                return self._add_conversation(_Conversation(best.context, best.context_tokens)), best_len
+            self._conversations.move_to_end(best_key)
+            return best, best_len
+
+    def _conversation_for_call(self, tokens: list[int]) -> Optional[_Conversation]:
+        """Localiza la conversación cuyo historial es ``tokens``; ``None`` si ninguna encaja."""
+        with self._conversations_lock:
+            for key in reversed(self._conversations):
+                history = self._conversations[key].history
+                if len(history) == len(tokens) and history[-1:] == tokens[-1:] and history == tokens:
+                    self._conversations.move_to_end(key)
+                    return self._conversations[key]
+        return None
+
+    def _reset_stream_state(self, conversation: _Conversation) -> None:
+        with conversation.lock:
+            conversation.generation += 1
+            conversation.token_buffer = deque()
+            conversation.stream_done = threading.Event()
+            conversation.stream_error = None
+            conversation.last_progress_ts = _now()
+        conversation.stream_thread = None
+
+    def _start_stream(
+        self,
+        conversation: _Conversation,
+        prompt: list[int],
+        prefix_len: int,
+        temperature: float,
+    ):
+        prompt_text = self.encoding.decode(prompt[prefix_len:])
+        context = conversation.context if prefix_len else None
+        generation = conversation.generation
+        stream_done = conversation.stream_done
+        tokens_available = conversation.tokens_available
+        generated: list[int] = []
+
+        def publish(tokens: list[int]) -> bool:
+            """Entrega ``tokens`` al consumidor; devuelve False si el stream ya no es el vigente."""
+            with tokens_available:
+                if generation != conversation.generation:
+                    return False
+                conversation.token_buffer.extend(tokens)
+                generated.extend(tokens)
+                conversation.last_progress_ts = self._last_progress_ts = _now()
+                tokens_available.notify_all()
+            return True
+
+        def finish(error: Optional[Exception] = None):
+            with tokens_available:
+                if generation == conversation.generation:
+                    conversation.stream_error = error
+                stream_done.set()
+                tokens_available.notify_all()
 
         def run():
-            nonlocal prompt_text, temperature
-
-            accum_text = ""
-            last_len = 0  # número de tokens ya emitidos
+            encoder = IncrementalEncoder(self.encoding)
 
             try:
-                url = self.endpoint_url
-                context = None
-                if len(self._previous_request_tokens) > 0:
-                    context = self._previous_request_tokens
-
                 payload = {
                     "model": self.model_name,
                     "prompt": prompt_text,
@@ -99,44 +297,86 @@ class OllamaStreamer:
                     "options": {"temperature": temperature},
                 }
 
-                with requests.post(url, json=payload, stream=True, timeout=60) as resp:
+                with self._session.post(
+                    self.endpoint_url, json=payload, stream=True, timeout=REQUEST_TIMEOUT_S
+                ) as resp:
                     resp.raise_for_status()
-                    for line in resp.iter_lines(decode_unicode=True):
-                        if not line:
+                    done = False
+                    # chunk_size=None entrega cada línea en cuanto llega por la red
+                    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                        # tras "done" se sigue leyendo hasta el final del cuerpo para que
+                        # la conexión vuelva al pool
+                        if not line or done:
                             continue
                         obj = json.loads(line)
 
                         if isinstance(obj.get("response"), str):
-                            accum_text += obj["response"]
-                            toks = self.encoding.encode(accum_text, allowed_special="all")
-                            if len(toks) > last_len:
-                                new_toks = toks[last_len:]
-                                with self._buffer_lock:
-                                    self._token_buffer.extend(new_toks)
-                                last_len = len(toks)
-                                self._touch_progress()
+                            toks = encoder.feed(obj["response"])
+                            if toks and not publish(toks):
+                                return
 
                         if obj.get("done", False):
-                            with self._buffer_lock:
-                                self._token_buffer.append(EOS_TOKEN)
-                            last_len = len(toks)
-                            self._touch_progress()
-                            context = obj.get("context")
-                            if context and len(context) > 0:
-                                with self._buffer_lock:
-                                    self._previous_request_tokens = context
-                            break
-
-                self._stream_done.set()
+                            done = True
+                            if not publish(encoder.flush() + [EOS_TOKEN]):
+                                return
+                            new_context = obj.get("context")
+                            if new_context and len(new_context) > 0:
+                                with conversation.lock:
+                                    if generation == conversation.generation:
+                                        conversation.context = new_context
+                                        # sin el EOS: el siguiente turno cierra el
+                                        # mensaje con <|end|>, no con el token de parada
+                                        conversation.context_tokens = prompt + [
+                                            t for t in generated if t != EOS_TOKEN
+                                        ]
+
+                if not done:
+                    # el cuerpo terminó sin "done": entregar lo retenido igualmente
+                    if not publish(encoder.flush()):
+                        return
+                finish()
 
             except Exception as e:
-                self._stream_error = e
-                self._stream_done.set()
+                finish(e)
 
         t = threading.Thread(target=run, name="ollama-stream", daemon=True)
         t.start()
         return t
 
+    def _wait_for_token(self, conversation: _Conversation, timeout_s: float) -> Optional[int]:
+        """Espera hasta ``timeout_s`` a que haya un token; ``None`` si no llega ninguno."""
+        with conversation.tokens_available:
+            conversation.tokens_available.wait_for(
+                lambda: conversation.token_buffer
+                or conversation.stream_error is not None
+                or conversation.stream_done.is_set(),
+                timeout=timeout_s,
+            )
+            if conversation.token_buffer:
+                conversation.last_progress_ts = _now()
+                return conversation.token_buffer.popleft()
+        if conversation.stream_error is not None:
+            raise RuntimeError(f"Ollama stream error: {conversation.stream_error!r}")
+        return None
+
+    def _next_token(self, conversation: _Conversation) -> int:
+        # Ruta normal: esperar hasta CALL_MAX_WAIT_S a que llegue un token
+        tok = self._wait_for_token(conversation, CALL_MAX_WAIT_S)
+        if tok is not None:
+            return tok
+
+        # El stream terminó sin más tokens: no llegará nada más
+        if conversation.stream_done.is_set():
+            return EOS_TOKEN
+
+        # Aún no hay token en esta fracción de llamada. NO enviar EOS a menos que se haya agotado el tiempo.
+        if _now() - conversation.last_progress_ts > NO_TOKEN_TIMEOUT_S:
+            return EOS_TOKEN
+
+        # Indicamos "aún no hay token" devolviendo PAD_TOKEN; se espera que el servidor descarte
+        # este valor y continúe consultando hasta que se produzca un token real o EOS.
+        return PAD_TOKEN
+
     # ------------------------------------------------------------------
     # API pública
     def infer_next_token(
@@ -144,66 +384,55 @@ class OllamaStreamer:
     ) -> int:
         """Inferir el siguiente token usando el backend de Ollama."""
 
+        conversation = None
+        if not new_request:
+            if tokens:
+                conversation = self._conversation_for_call(tokens)
+                # historial desconocido: se abre un stream nuevo en lugar de tomar otro
+                new_request = conversation is None
+            else:
+                # llamadas sin historial: solo pueden seguir el último stream iniciado
+                conversation = self._last_started
+
         if new_request:
-            self._reset_stream_state()
-            self._stream_thread = self._start_stream(token_ids=tokens, temperature=temperature)
+            # PAD_TOKEN es un centinela del servidor, no forma parte de la conversación
+            prompt = [t for t in tokens if t != PAD_TOKEN]
+            conversation, prefix_len = self._conversation_for_prompt(prompt)
+            self._reset_stream_state(conversation)
+            conversation.history = list(tokens)
+            self._last_started = conversation
+            conversation.stream_thread = self._start_stream(
+                conversation, prompt, prefix_len, temperature
+            )
             # Esperar el primer byte dentro de FIRST_BYTE_TIMEOUT_S (sin emitir EOS antes de tiempo)
-            start = _now()
-            while _now() - start < FIRST_BYTE_TIMEOUT_S:
-                with self._buffer_lock:
-                    if self._token_buffer:
-                        tok = self._token_buffer.pop(0)
-                        self._touch_progress()
-                        return tok
-                if self._stream_error is not None:
-                    raise RuntimeError(f"Ollama stream error: {self._stream_error!r}")
-                # Si Ollama termina al instante sin salida, continuar el bucle hasta que expire el tiempo
-                time.sleep(POLL_INTERVAL_S)
-            # Tiempo de espera estricto del primer byte -> emitir EOS para que el servidor pueda detener la solicitud
-            return EOS_TOKEN
-
-        if self._stream_error is not None:
-            raise RuntimeError(f"Ollama stream error: {self._stream_error!r}")
-
-        # Ruta normal: esperar hasta CALL_MAX_WAIT_S a que llegue un token
-        wait_start = _now()
-        while _now() - wait_start < CALL_MAX_WAIT_S:
-            with self._buffer_lock:
-                if self._token_buffer:
-                    tok = self._token_buffer.pop(0)
-                    self._touch_progress()
-                    return tok
-            # Aún no hay token; si hemos estado inactivos demasiado tiempo, finalizar con EOS
+            tok = self._wait_for_token(conversation, FIRST_BYTE_TIMEOUT_S)
+            # Sin salida (o tiempo de espera del primer byte agotado) -> EOS para que
+            # el servidor pueda detener la solicitud
+            if tok is None:
+                tok = EOS_TOKEN
+        elif conversation is None:
+            # Ningún stream iniciado todavía
             if _now() - self._last_progress_ts > NO_TOKEN_TIMEOUT_S:
                 return EOS_TOKEN
-            time.sleep(POLL_INTERVAL_S)
-
-        # Aún no hay token en esta fracción de llamada. NO enviar EOS a menos que se haya agotado el tiempo.
-        if _now() - self._last_progress_ts > NO_TOKEN_TIMEOUT_S:
-            return EOS_TOKEN
+            return PAD_TOKEN
+        else:
+            tok = self._next_token(conversation)
 
-        # Indicar al llamador que nos invoque de nuevo; bloquear lo mínimo devolviendo *nada nuevo*.
-        # Debemos devolver un entero; lo más seguro es esperar un poco más por un token.
-        # Si aún no hay, seguir devolviendo solo tras breves esperas. Evitar EOS aquí.
-        # Una espera corta más para reducir el bucle caliente:
-        time.sleep(POLL_INTERVAL_S)
-        with self._buffer_lock:
-            if self._token_buffer:
-                tok = self._token_buffer.pop(0)
-                self._touch_progress()
-                return tok
-
-        # Como último recurso para esta fracción de llamada, devolver EOS solo en un verdadero tiempo de inactividad.
-        if _now() - self._last_progress_ts > NO_TOKEN_TIMEOUT_S:
-            return EOS_TOKEN
+        conversation.history.append(tok)
+        return tok
 
-        # Si llegamos aquí, aún no hemos obtenido un token; pedir al llamador que vuelva a invocar pronto.
-        # Indicamos "aún no hay token" devolviendo PAD_TOKEN; se espera que el servidor descarte
-        # este valor y continúe consultando hasta que se produzca un token real o EOS.
-        return PAD_TOKEN
+    def close(self) -> None:
+        """Cierra las conexiones del pool."""
+        self._session.close()
 
 
-def setup_model(checkpoint: str, endpoint_url: Optional[str] = None) -> Callable[[list[int], float, bool], int]:
+def setup_model(
+    checkpoint: str,
+    endpoint_url: Optional[str] = None,
+    max_conversations: int = DEFAULT_MAX_CONVERSATIONS,
+) -> Callable[[list[int], float, bool], int]:
     """Crear un modelo de streaming invocable para el checkpoint dado."""
-    streamer = OllamaStreamer(checkpoint, endpoint_url=endpoint_url)
+    streamer = OllamaStreamer(
+        checkpoint, endpoint_url=endpoint_url, max_conversations=max_conversations
+    )
     return streamer.infer_next_token
@@ -1,5 +1,23 @@
+"""
+Backend sintético para pruebas de carga y planificación de capacidad.
+
+No carga ningún modelo: cada stream reproduce un guion de tokens y simula el
+coste de inferencia con un ``StubProfile`` (coste de prefill por token,
+distribución de la latencia de decodificación y su escalado con el número de
+streams que comparten cada paso de decodificación). Con el perfil por defecto
+se comporta como el stub original: reproduce ``fake_tokens`` con 0,1 s por
+token.
+"""
+
+import json
+import math
+import os
+import random
+import threading
 import time
-from typing import Callable
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
 
 fake_tokens = [
     200005,
@@ -124,19 +142,161 @@ fake_tokens = [
 #     198,
 # ]
 
-token_queue = fake_tokens.copy()
 
+@dataclass
+class StubProfile:
+    """Modelo de coste del backend sintético.
+
+    ``batch_curve`` son puntos ``(streams activos, multiplicador de latencia)``
+    que se interpolan linealmente; fuera de sus extremos se usa el más cercano.
+    El multiplicador escala la duración de un paso de decodificación, que
+    produce un token para cada stream activo.
+    ``scripts`` son guiones de tokens que se asignan por turnos a cada stream.
+    """
+
+    prefill_s_per_token: float = 0.0
+    decode_latency_s: float = 0.1
+    # desviación típica del logaritmo de la latencia (0: latencia constante)
+    decode_latency_sigma: float = 0.0
+    batch_curve: list[tuple[int, float]] = field(default_factory=lambda: [(1, 1.0)])
+    scripts: list[list[int]] = field(default_factory=lambda: [list(fake_tokens)])
+    seed: Optional[int] = None
+    # un stream sin llamadas durante este tiempo deja de contar como activo
+    idle_timeout_s: float = 30.0
+
+    @classmethod
+    def from_json(cls, path: str) -> "StubProfile":
+        with open(path) as f:
+            data = json.load(f)
+        if "batch_curve" in data:
+            data["batch_curve"] = [tuple(point) for point in data["batch_curve"]]
+        return cls(**data)
+
+
+class _StubStream:
+    def __init__(self, stream_id: int, script: list[int], now: float):
+        self.stream_id = stream_id
+        self.script = script
+        self.position = 0
+        # lista que enviará el servidor en la próxima llamada de este stream
+        self.history: list[int] = []
+        self.last_call = now
+
+
+class SyntheticBackend:
+    """``infer_next_token`` con un guion por stream y latencias configurables.
+
+    Las llamadas se asocian al stream cuyo historial coincide exactamente con
+    ``tokens``, que el servidor pasa siempre completo; si ninguno encaja se
+    abre un stream nuevo. Solo las llamadas sin historial (``tokens`` vacío)
+    continúan el stream más reciente.
+
+    La decodificación avanza por pasos compartidos, como en un motor con
+    batching: un paso se abre con los streams activos en ese momento y cuesta
+    ``decode_latency_s`` escalado por ``batch_multiplier`` una sola vez. Cada
+    stream del paso recibe de él un token y solo espera a que termine; la
+    siguiente llamada de un stream ya servido abre el paso siguiente. Así da
+    igual que el servidor haga las llamadas en serie o en paralelo. El
+    prefill de una petición nueva se cobra aparte, a esa llamada.
+    """
+
+    def __init__(
+        self,
+        profile: Optional[StubProfile] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.profile = profile or StubProfile()
+        if not self.profile.scripts or not all(self.profile.scripts):
+            raise ValueError("profile needs at least one non-empty token script")
+        self._sleep = sleep
+        self._clock = clock
+        self._rng = random.Random(self.profile.seed)
+        self._curve = sorted(self.profile.batch_curve)
+        self._streams: OrderedDict[int, _StubStream] = OrderedDict()
+        self._next_stream_id = 0
+        # paso de decodificación en curso: streams que lo comparten, los que ya
+        # han recibido su token y el instante en que termina
+        self._step_members: set[int] = set()
+        self._step_served: set[int] = set()
+        self._step_ready = 0.0
+        self._lock = threading.Lock()
+
+    def batch_multiplier(self, active: int) -> float:
+        curve = self._curve
+        if active <= curve[0][0]:
+            return curve[0][1]
+        for (x0, y0), (x1, y1) in zip(curve, curve[1:]):
+            if active <= x1:
+                return y0 + (y1 - y0) * (active - x0) / (x1 - x0)
+        return curve[-1][1]
+
+    def _decode_latency(self) -> float:
+        mean = self.profile.decode_latency_s
+        sigma = self.profile.decode_latency_sigma
+        if sigma <= 0 or mean <= 0:
+            return mean
+        # lognormal con la media configurada
+        return self._rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    def _find(self, tokens: list[int]) -> Optional[_StubStream]:
+        if not tokens:
+            return self._streams[next(reversed(self._streams))] if self._streams else None
+        for stream_id in reversed(self._streams):
+            history = self._streams[stream_id].history
+            if len(history) == len(tokens) and history[-1:] == tokens[-1:] and history == tokens:
+                self._streams.move_to_end(stream_id)
+                return self._streams[stream_id]
+        return None
+
+    def infer_next_token(
+        self, tokens: list[int], temperature: float = 0.0, new_request: bool = False
+    ) -> int:
+        profile = self.profile
+        with self._lock:
+            now = self._clock()
+            for stream_id in [
+                key
+                for key, s in self._streams.items()
+                if now - s.last_call > profile.idle_timeout_s
+            ]:
+                del self._streams[stream_id]
+
+            stream = None if new_request else self._find(tokens)
+            prefill = 0.0
+            if stream is None:
+                script = profile.scripts[self._next_stream_id % len(profile.scripts)]
+                stream = _StubStream(self._next_stream_id, script, now)
+                stream.history = list(tokens)
+                self._streams[stream.stream_id] = stream
+                self._next_stream_id += 1
+                if new_request:
+                    prefill = profile.prefill_s_per_token * len(tokens)
+            sid = stream.stream_id
+            if sid not in self._step_members or sid in self._step_served:
+                self._step_members = set(self._streams)
+                self._step_served = set()
+                step = self._decode_latency() * self.batch_multiplier(len(self._streams))
+                self._step_ready = max(now, self._step_ready) + step
+            self._step_served.add(sid)
+            cost = max(0.0, self._step_ready - now) + prefill
+
+            next_tok = stream.script[stream.position % len(stream.script)]
+            stream.position += 1
+            stream.history.append(next_tok)
+            if stream.position % len(stream.script) == 0:
+                # guion completo: el stream deja de estar activo
+                del self._streams[stream.stream_id]
 
-def stub_infer_next_token(
-    tokens: list[int], temperature: float = 0.0, new_request: bool = False
-) -> int:
-    global token_queue
-    next_tok = token_queue.pop(0)
-    if len(token_queue) == 0:
-        token_queue = fake_tokens.copy()
-    time.sleep(0.1)
-    return next_tok
+        if cost > 0:
+            self._sleep(cost)
+        with self._lock:
+            stream.last_call = self._clock()
+        return next_tok
 
 
-def setup_model(_checkpoint: str) -> Callable[[list[int], float], int]:
-    return stub_infer_next_token
+def setup_model(checkpoint: str) -> Callable[[list[int], float, bool], int]:
+    """``checkpoint`` puede ser un JSON con un ``StubProfile``; si no, se usa el perfil por defecto."""
+    path = os.path.expanduser(checkpoint)
+    profile = StubProfile.from_json(path) if path.endswith(".json") and os.path.isfile(path) else None
+    return SyntheticBackend(profile).infer_next_token
@@ -1,17 +1,21 @@
 """
-NOTA: esta no es la forma más eficiente de usar transformers. Es una implementación sencilla que infiere
-un token a la vez para imitar el comportamiento de la implementación de Triton.
+NOTA: esta no es la forma más eficiente de usar transformers. Infiere un token a la vez para
+imitar el comportamiento de la implementación de Triton, pero conserva ``past_key_values``
+entre llamadas para que cada token solo procese la parte nueva del historial.
 """
 
+import copy
 import os
-from typing import Callable, List
+from collections import OrderedDict
+from typing import Callable, List, Optional
 
 # Importaciones de Transformers
-from transformers import AutoModelForCausalLM, PreTrainedModel
+from transformers import AutoModelForCausalLM, DynamicCache, PreTrainedModel
 import torch
 
 
 DEFAULT_TEMPERATURE = 0.0
+DEFAULT_MAX_SESSIONS = 4
 TP = os.environ.get("TP", 2)
 
 def load_model(checkpoint: str):
@@ -50,7 +54,117 @@ def get_infer_next_token(model: PreTrainedModel):
     return infer_next_token
 
 
+def _common_prefix_len(a: List[int], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class _CachedSession:
+    """Caché KV de un historial: ``tokens`` son las posiciones que contiene ``cache``."""
+
+    def __init__(self, cache: DynamicCache, tokens: Optional[List[int]] = None):
+        self.cache = cache
+        self.tokens = tokens if tokens is not None else []
+
+
+class CachedInference:
+    """``infer_next_token`` que reutiliza ``past_key_values`` entre llamadas.
+
+    Si ``tokens`` continúa el historial de una sesión solo se procesan los
+    tokens nuevos. Si diverge (p. ej. un turno nuevo que descarta el
+    razonamiento anterior) la caché se recorta al prefijo común con
+    ``DynamicCache.crop`` sobre una copia, de modo que la sesión original
+    sigue sirviendo a su stream. Las sesiones se expulsan por LRU al superar
+    ``max_sessions``.
+    """
+
+    def __init__(self, model: PreTrainedModel, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.model = model
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[int, _CachedSession] = OrderedDict()
+        self._next_session_id = 0
+
+    def _add_session(self, session: _CachedSession) -> _CachedSession:
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+        self._sessions[self._next_session_id] = session
+        self._next_session_id += 1
+        return session
+
+    def _continuation(self, tokens: List[int]) -> Optional[_CachedSession]:
+        """Sesión a la que solo le falta el último token de ``tokens`` (el caso de cada paso)."""
+        for key in reversed(self._sessions):
+            session = self._sessions[key]
+            n = len(session.tokens)
+            if (
+                n == len(tokens) - 1
+                and n > 0
+                and session.tokens[-1] == tokens[-2]
+                and session.tokens == tokens[:-1]
+            ):
+                self._sessions.move_to_end(key)
+                return session
+        return None
+
+    def _session_for(self, tokens: List[int], new_request: bool) -> tuple[_CachedSession, int]:
+        """Devuelve la sesión a usar y cuántas posiciones de su caché se conservan."""
+        if not new_request:
+            session = self._continuation(tokens)
+            if session is not None:
+                return session, len(session.tokens)
+
+        best_key, best_len = None, 0
+        for key, session in self._sessions.items():
+            n = _common_prefix_len(session.tokens, tokens)
+            if n > best_len:
+                best_key, best_len = key, n
+        # siempre queda al menos un token por procesar para obtener los logits
+        keep = min(best_len, len(tokens) - 1)
+        if best_key is None or keep == 0:
+            return self._add_session(_CachedSession(DynamicCache())), 0
+
+        session = self._sessions[best_key]
+        self._sessions.move_to_end(best_key)
+        if keep < len(session.tokens):
+            # la sesión puede seguir sirviendo a otro stream: se bifurca sin tocarla
+            session = self._add_session(
+                _CachedSession(copy.deepcopy(session.cache), session.tokens[:keep])
+            )
+            try:
+                session.cache.crop(keep)
+            except (AttributeError, NotImplementedError, ValueError):
+                # cachés que no admiten recorte (p. ej. ventana deslizante): se rehace el prefill
+                session.cache = DynamicCache()
+                keep = 0
+            del session.tokens[keep:]
+        return session, keep
+
+    @torch.inference_mode()
+    def infer_next_token(
+        self,
+        tokens: List[int],
+        temperature: float = DEFAULT_TEMPERATURE,
+        new_request: bool = False,
+    ) -> int:
+        if not tokens:
+            raise ValueError("tokens must contain at least one input token id")
+        session, keep = self._session_for(tokens, new_request)
+        new_tokens = tokens[keep:]
+        input_ids = torch.tensor([new_tokens], dtype=torch.int64, device=self.model.device)
+        output = self.model(input_ids=input_ids, past_key_values=session.cache, use_cache=True)
+        session.cache = output.past_key_values
+        session.tokens.extend(new_tokens)
+
+        logits = output.logits[0, -1].float()
+        if temperature == 0:
+            return int(torch.argmax(logits))
+        probs = torch.softmax(logits / temperature, dim=-1)
+        return int(torch.multinomial(probs, num_samples=1))
+
+
 def setup_model(checkpoint: str) -> Callable[[List[int], float, bool], int]:
     model = load_model(checkpoint)
-    infer_next_token = get_infer_next_token(model)
-    return infer_next_token
+    return CachedInference(model).infer_next_token
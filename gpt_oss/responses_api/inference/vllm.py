@@ -1,16 +1,32 @@
 """
-NOTA: esta no es la forma más eficiente de usar vLLM. Es una implementación sencilla
-que infiere un token a la vez para imitar el comportamiento de la implementación de Triton.
+Backend de vLLM.
+
+``setup_model`` mantiene una solicitud de vLLM abierta por stream (con
+``LLMEngine.add_request``/``step``) y entrega sus tokens de uno en uno a través
+de ``infer_next_token``. Solo se aborta y se vuelve a enviar la solicitud
+cuando el historial del llamador se aparta del que está generando, por
+ejemplo tras una llamada a herramienta, o cuando el llamador deja de leer
+(se aborta al acumular demasiados tokens sin pedir y, si vuelve, se reenvía
+apoyándose en el prefix caching).
+
+``get_infer_next_token`` conserva la implementación sencilla que genera un
+token por llamada con ``LLM.generate``.
 """
 
 import os
+from collections import deque, OrderedDict
 from typing import Callable, List, Optional
 
 # vLLM imports
-from vllm import LLM, SamplingParams
+from vllm import LLM, EngineArgs, LLMEngine, SamplingParams
 from vllm.inputs import TokensPrompt
 
 DEFAULT_TEMPERATURE = 0.0
+DEFAULT_MAX_STREAMS = 8
+# tokens que vLLM genera por solicitud antes de reenviarla (vía prefix caching)
+DEFAULT_MAX_STREAM_TOKENS = 1024
+# tokens sin leer que se toleran antes de dar el stream por abandonado
+DEFAULT_MAX_PENDING = 32
 TP = os.environ.get("TP", 2)
 
 def load_model(checkpoint: str):
@@ -79,7 +95,144 @@ def get_infer_next_token(llm: LLM):
     return infer_next_token
 
 
+class _Stream:
+    """Una solicitud de vLLM en curso y el historial que la produjo."""
+
+    def __init__(self, request_id: str, tokens: List[int], temperature: float):
+        self.request_id = request_id
+        # prompt más los tokens ya entregados al llamador
+        self.history = list(tokens)
+        self.temperature = temperature
+        # tokens generados por vLLM que el llamador aún no ha pedido
+        self.pending: deque[int] = deque()
+        self.received = 0
+        self.finished = False
+
+
+class StreamingSession:
+    """``infer_next_token`` sobre solicitudes de vLLM de larga duración.
+
+    Cada llamada se asocia al stream cuyo historial es exactamente ``tokens``;
+    si hay tokens ya generados se devuelven sin tocar el motor y, si no, se
+    avanza un ``step()``. Con ``new_request`` o un historial que no encaja con
+    ningún stream se abre una solicitud nueva; los streams que esta sustituye
+    se abortan y el resto se expulsa por LRU al superar ``max_streams``.
+
+    Cada solicitud genera como mucho ``max_stream_tokens`` tokens, y un stream
+    con ``max_pending`` tokens sin leer (su llamador se desconectó, alcanzó
+    ``max_output_tokens`` o se detuvo en una llamada a herramienta) se aborta
+    en el motor. Si el llamador vuelve a pedir tokens tras agotar los que
+    quedaban, la solicitud se reenvía con su historial.
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_streams: int = DEFAULT_MAX_STREAMS,
+        max_stream_tokens: int = DEFAULT_MAX_STREAM_TOKENS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.engine = engine
+        self.max_streams = max_streams
+        self.max_stream_tokens = max_stream_tokens
+        self.max_pending = max_pending
+        self._streams: OrderedDict[str, _Stream] = OrderedDict()
+        self._next_request_id = 0
+
+    def _remove(self, stream: _Stream):
+        self._streams.pop(stream.request_id, None)
+        if not stream.finished:
+            self.engine.abort_request(stream.request_id)
+
+    def _submit(self, tokens: List[int], temperature: float) -> _Stream:
+        # los streams cuyo historial es prefijo del nuevo prompt quedan obsoletos
+        for stream in list(self._streams.values()):
+            n = len(stream.history)
+            if n <= len(tokens) and tokens[n - 1] == stream.history[-1] and tokens[:n] == stream.history:
+                self._remove(stream)
+        while len(self._streams) >= self.max_streams:
+            self._remove(next(iter(self._streams.values())))
+
+        request_id = f"gpt-oss-{self._next_request_id}"
+        self._next_request_id += 1
+        sampling = SamplingParams(
+            temperature=float(temperature),
+            max_tokens=self.max_stream_tokens,
+            n=1,
+        )
+        self.engine.add_request(request_id, TokensPrompt(prompt_token_ids=list(tokens)), sampling)
+        stream = self._streams[request_id] = _Stream(request_id, tokens, temperature)
+        return stream
+
+    def _find(self, tokens: List[int], temperature: float) -> Optional[_Stream]:
+        for stream in reversed(self._streams.values()):
+            history = stream.history
+            if len(history) == len(tokens) and history[-1] == tokens[-1] and history == tokens:
+                if stream.temperature != temperature:
+                    self._remove(stream)
+                    return None
+                return stream
+        return None
+
+    def _step(self):
+        for output in self.engine.step():
+            stream = self._streams.get(output.request_id)
+            if stream is None:
+                continue
+            token_ids = output.outputs[0].token_ids if output.outputs else []
+            if len(token_ids) > stream.received:
+                stream.pending.extend(token_ids[stream.received:])
+                stream.received = len(token_ids)
+            if output.finished:
+                stream.finished = True
+            elif len(stream.pending) >= self.max_pending:
+                # nadie está leyendo este stream: se deja de generar para él
+                self.engine.abort_request(stream.request_id)
+                stream.finished = True
+
+    def infer_next_token(
+        self,
+        tokens: List[int],
+        temperature: float = DEFAULT_TEMPERATURE,
+        new_request: bool = False,
+    ) -> int:
+        if not tokens:
+            raise ValueError("tokens must contain at least one input token id")
+
+        stream = None if new_request else self._find(tokens, temperature)
+        if stream is None:
+            stream = self._submit(tokens, temperature)
+        else:
+            self._streams.move_to_end(stream.request_id)
+
+        resubmitted = False
+        while not stream.pending:
+            if stream.finished:
+                if resubmitted:
+                    raise RuntimeError("No next token was generated (possibly EOS).")
+                # vLLM dio la solicitud por terminada pero el llamador sigue pidiendo:
+                # se continúa desde su historial
+                self._remove(stream)
+                stream = self._submit(tokens, temperature)
+                resubmitted = True
+            self._step()
+
+        next_tok = int(stream.pending.popleft())
+        stream.history.append(next_tok)
+        return next_tok
+
+
+def load_engine(checkpoint: str):
+    """Crea un ``LLMEngine`` con prefix caching para los reenvíos tras divergencias."""
+    args = EngineArgs(
+        model=checkpoint,
+        tensor_parallel_size=TP,
+        enable_prefix_caching=True,
+        disable_log_stats=True,
+    )
+    return LLMEngine.from_engine_args(args)
+
+
 def setup_model(checkpoint: str) -> Callable[[List[int], float, bool], int]:
-    llm = load_model(checkpoint)
-    infer_next_token = get_infer_next_token(llm)
-    return infer_next_token
+    session = StreamingSession(load_engine(checkpoint))
+    return session.infer_next_token
@@ -0,0 +1,224 @@
+"""Generador de carga para la API de respuestas.
+
+Reproduce un fichero JSONL de solicitudes contra ``/v1/responses`` a un ritmo
+objetivo (llegadas de Poisson o uniformes) y resume el tiempo hasta el primer
+token (TTFT), la latencia entre tokens (ITL) y el rendimiento. Cada línea del
+fichero puede ser el cuerpo completo de una solicitud (con ``input``) o un
+objeto con ``body``/``prompt``, como los del backlog, cuyo texto se usa como
+entrada.
+
+Ejemplo:
+    python -m gpt_oss.responses_api.loadgen requests.jsonl --qps 4 --num-requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import aiohttp
+
+DEFAULT_URL = "http://localhost:8000/v1/responses"
+
+# recibe el cuerpo y produce (tipo de evento, datos) a medida que llegan los frames SSE
+SendFn = Callable[[dict], AsyncIterator[tuple[str, dict]]]
+
+
+@dataclass
+class RequestResult:
+    start: float
+    ttft: Optional[float] = None
+    inter_token_latencies: list[float] = field(default_factory=list)
+    output_tokens: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+def load_requests(path: str) -> list[dict]:
+    bodies = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if "input" in obj:
+                body = dict(obj)
+            else:
+                text = obj.get("body") or obj.get("prompt") or obj.get("title") or ""
+                body = {"input": text}
+            body["stream"] = True
+            bodies.append(body)
+    if not bodies:
+        raise ValueError(f"no requests found in {path}")
+    return bodies
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Percentil ``q`` (0-100) con interpolación lineal; ``None`` si no hay valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(results: list[RequestResult], wall_time_s: float) -> dict:
+    ok = [r for r in results if r.error is None]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    itls = [latency for r in ok for latency in r.inter_token_latencies]
+    output_tokens = sum(r.output_tokens for r in ok)
+
+    def stats(values: list[float]) -> dict:
+        return {f"p{q}": percentile(values, q) for q in (50, 90, 99)}
+
+    errors: dict[str, int] = {}
+    for r in results:
+        if r.error is not None:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    return {
+        "requests": len(results),
+        "completed": len(ok),
+        "errors": errors,
+        "wall_time_s": wall_time_s,
+        "requests_per_s": len(ok) / wall_time_s if wall_time_s > 0 else None,
+        "output_tokens_per_s": output_tokens / wall_time_s if wall_time_s > 0 else None,
+        "ttft_s": stats(ttfts),
+        "itl_s": stats(itls),
+        "request_duration_s": stats([r.duration for r in ok]),
+    }
+
+
+async def run_request(
+    send: SendFn, body: dict, clock: Callable[[], float] = time.perf_counter
+) -> RequestResult:
+    result = RequestResult(start=clock())
+    last_delta = None
+    try:
+        async for event_type, data in send(body):
+            now = clock()
+            if event_type.endswith(".delta"):
+                if last_delta is None:
+                    result.ttft = now - result.start
+                else:
+                    result.inter_token_latencies.append(now - last_delta)
+                last_delta = now
+            elif event_type == "response.completed":
+                usage = data.get("response", {}).get("usage") or {}
+                result.output_tokens = usage.get("output_tokens", 0)
+            elif event_type == "error":
+                result.error = data.get("error", {}).get("code") or "error"
+    except Exception as e:
+        result.error = type(e).__name__
+    result.duration = clock() - result.start
+    return result
+
+
+async def replay(
+    send: SendFn,
+    bodies: list[dict],
+    qps: float,
+    num_requests: Optional[int] = None,
+    arrival: str = "poisson",
+    seed: Optional[int] = None,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    clock: Callable[[], float] = time.perf_counter,
+) -> dict:
+    """Lanza ``num_requests`` solicitudes (por defecto una por cuerpo) a ``qps`` y resume los resultados."""
+    if qps <= 0:
+        raise ValueError("qps must be positive")
+    if arrival not in ("poisson", "uniform"):
+        raise ValueError(f"unknown arrival process: {arrival}")
+    rng = random.Random(seed)
+    total = num_requests if num_requests is not None else len(bodies)
+
+    started = clock()
+    tasks = []
+    next_arrival = 0.0
+    for i in range(total):
+        delay = next_arrival - (clock() - started)
+        if delay > 0:
+            await sleep(delay)
+        tasks.append(asyncio.create_task(run_request(send, bodies[i % len(bodies)], clock)))
+        next_arrival += rng.expovariate(qps) if arrival == "poisson" else 1.0 / qps
+    results = await asyncio.gather(*tasks)
+    return summarize(list(results), clock() - started)
+
+
+def http_sender(session: aiohttp.ClientSession, url: str) -> SendFn:
+    async def send(body: dict) -> AsyncIterator[tuple[str, dict]]:
+        async with session.post(url, json=body) as resp:
+            if resp.status != 200:
+                yield "error", {"error": {"code": f"http_{resp.status}"}}
+                return
+            event_type = None
+            buffer = b""
+            # se parte a mano: la respuesta final puede superar el límite de línea de aiohttp
+            async for chunk in resp.content.iter_any():
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for raw in lines:
+                    line = raw.decode("utf-8").rstrip("\r")
+                    if line.startswith("event: "):
+                        event_type = line[len("event: "):]
+                    elif line.startswith("data: ") and event_type is not None:
+                        data = line[len("data: "):]
+                        # los deltas solo importan por su hora de llegada: no se decodifican
+                        yield event_type, {} if event_type.endswith(".delta") else json.loads(data)
+                        event_type = None
+
+    return send
+
+
+async def _main(args):
+    bodies = load_requests(args.requests)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=args.timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        return await replay(
+            http_sender(session, args.url),
+            bodies,
+            qps=args.qps,
+            num_requests=args.num_requests,
+            arrival=args.arrival,
+            seed=args.seed,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga para la API de respuestas")
+    parser.add_argument("requests", metavar="ARCHIVO", help="Fichero JSONL con las solicitudes")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Endpoint de la API de respuestas")
+    parser.add_argument("--qps", type=float, default=1.0, help="Solicitudes por segundo objetivo")
+    parser.add_argument(
+        "--num-requests",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Solicitudes a enviar; el fichero se recorre en bucle (por defecto, una por línea)",
+    )
+    parser.add_argument(
+        "--arrival",
+        choices=("poisson", "uniform"),
+        default="poisson",
+        help="Proceso de llegadas",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Semilla de las llegadas de Poisson")
+    parser.add_argument(
+        "--timeout",
+        metavar="SEGUNDOS",
+        type=float,
+        default=300.0,
+        help="Espera máxima entre frames de una respuesta",
+    )
+    args = parser.parse_args(argv)
+    summary = asyncio.run(_main(args))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
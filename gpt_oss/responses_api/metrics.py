@@ -0,0 +1,226 @@
+"""Métricas del servidor en formato de texto de Prometheus.
+
+La recogida se limita a sumar contadores y a una búsqueda binaria por
+observación en los histogramas; el texto solo se genera cuando alguien
+consulta ``/metrics``. Los valores que ya mantienen otros componentes (caché
+de prefijos, control de admisión) se leen en el momento de la consulta.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+# límites en segundos: cubren desde deltas de submilisegundo hasta prefill largos
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    pairs = [
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        for name, value in labels
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        self.values[labelvalues] = self.values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labelvalues, value in self.values.items():
+            labels = _format_labels(zip(self.labelnames, labelvalues))
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues: str):
+        self.values[labelvalues] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # por etiquetas: [conteos por cubeta (sin acumular) + desbordamiento, suma]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        series = self.series.get(labelvalues)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labelvalues, (counts, total) in self.series.items():
+            labels = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            suffix = _format_labels(labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class ServerMetrics:
+    """Conjunto de métricas de la API de respuestas."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.requests = Counter("gpt_oss_requests_total", "Solicitudes recibidas", ("stream",))
+        self.active_generations = Gauge(
+            "gpt_oss_active_generations", "Generaciones en curso en este proceso"
+        )
+        self.active_generations.set(0)
+        self.ttft = Histogram(
+            "gpt_oss_time_to_first_token_seconds",
+            "Tiempo desde que se recibe la solicitud hasta el primer token",
+        )
+        self.inter_token_latency = Histogram(
+            "gpt_oss_inter_token_latency_seconds",
+            "Tiempo entre tokens consecutivos de una misma generación",
+        )
+        self.prefill = Histogram(
+            "gpt_oss_prefill_seconds",
+            "Duración de las llamadas de inferencia que procesan un prompt nuevo",
+        )
+        self.decode = Histogram(
+            "gpt_oss_decode_seconds",
+            "Tiempo de inferencia de decodificación por solicitud",
+        )
+        self.tokens_per_second = Histogram(
+            "gpt_oss_decode_tokens_per_second",
+            "Tokens por segundo de decodificación por solicitud",
+            buckets=THROUGHPUT_BUCKETS,
+        )
+        self.generated_tokens = Counter(
+            "gpt_oss_generated_tokens_total", "Tokens muestreados del modelo"
+        )
+        self.request_duration = Histogram(
+            "gpt_oss_request_duration_seconds", "Duración total de la generación"
+        )
+        self.tool_call_duration = Histogram(
+            "gpt_oss_tool_call_duration_seconds",
+            "Duración de las llamadas a herramientas integradas",
+            ("tool",),
+        )
+        self._collectors: list[Callable[[], list[_Metric]]] = []
+
+    def add_collector(self, collector: Callable[[], list[_Metric]]):
+        """Registra una función que construye métricas en el momento de la consulta."""
+        self._collectors.append(collector)
+
+    def start_generation(self, started_at: Optional[float] = None) -> "GenerationTimer":
+        return GenerationTimer(self, self.clock() if started_at is None else started_at)
+
+    def render(self) -> str:
+        metrics: list[_Metric] = [
+            self.requests,
+            self.active_generations,
+            self.ttft,
+            self.inter_token_latency,
+            self.prefill,
+            self.decode,
+            self.tokens_per_second,
+            self.generated_tokens,
+            self.request_duration,
+            self.tool_call_duration,
+        ]
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class GenerationTimer:
+    """Acumula los tiempos de una generación y los vuelca en ``ServerMetrics``."""
+
+    def __init__(self, metrics: ServerMetrics, started_at: float):
+        self.metrics = metrics
+        self.started_at = started_at
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.decode_s = 0.0
+        self.decode_tokens = 0
+        self.tokens = 0
+        self.finished = False
+        metrics.active_generations.inc()
+
+    def token(self, call_started: float, call_finished: float, prefill: bool):
+        """Registra una llamada a ``infer_next_token``; ``prefill`` si procesó un prompt nuevo."""
+        metrics = self.metrics
+        duration = call_finished - call_started
+        if prefill:
+            metrics.prefill.observe(duration)
+        else:
+            self.decode_s += duration
+            self.decode_tokens += 1
+        if self.first_token_at is None:
+            self.first_token_at = call_finished
+            metrics.ttft.observe(call_finished - self.started_at)
+        elif not prefill:
+            # tras una herramienta el intervalo incluye su ejecución: no es latencia entre tokens
+            metrics.inter_token_latency.observe(call_finished - self.last_token_at)
+        self.last_token_at = call_finished
+        self.tokens += 1
+
+    def finish(self):
+        """Cierra la generación; es idempotente."""
+        if self.finished:
+            return
+        self.finished = True
+        metrics = self.metrics
+        metrics.active_generations.inc(-1)
+        metrics.request_duration.observe(metrics.clock() - self.started_at)
+        metrics.generated_tokens.inc(self.tokens)
+        if self.decode_tokens:
+            metrics.decode.observe(self.decode_s)
+            if self.decode_s > 0:
+                metrics.tokens_per_second.observe(self.decode_tokens / self.decode_s)
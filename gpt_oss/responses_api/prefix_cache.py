@@ -0,0 +1,73 @@
+"""Caché de prefijos renderizados (mensajes de sistema y desarrollador).
+
+Miles de solicitudes suelen compartir las mismas instrucciones y esquemas de
+herramientas. En lugar de reconstruir ``SystemContent``/``DeveloperContent`` y
+renderizar toda la conversación en cada petición, se memoriza el prefijo ya
+tokenizado y solo se renderizan los mensajes propios de la solicitud.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from openai_harmony import Conversation, HarmonyEncoding, Message, Role
+
+
+class PrefixRenderCache:
+    """LRU de prefijos tokenizados indexado por una clave arbitraria.
+
+    La primera vez que se ve una clave se comprueba que renderizar el prefijo y
+    el resto por separado produce exactamente los mismos tokens que renderizar
+    la conversación completa; si no es así la clave se marca como no cacheable
+    y se sigue usando el renderizado completo.
+    """
+
+    def __init__(self, encoding: HarmonyEncoding, maxsize: int = 128):
+        self.encoding = encoding
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Optional[list[int]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _render_full(self, messages: list[Message]) -> list[int]:
+        return self.encoding.render_conversation_for_completion(
+            Conversation.from_messages(messages), Role.ASSISTANT
+        )
+
+    def render_for_completion(
+        self,
+        key: Hashable,
+        build_prefix: Callable[[], list[Message]],
+        messages: list[Message],
+    ) -> list[int]:
+        """Renderiza ``build_prefix() + messages`` reutilizando el prefijo si es posible.
+
+        ``build_prefix`` solo se invoca cuando la clave no está en la caché.
+        """
+        if self.maxsize <= 0:
+            return self._render_full(build_prefix() + messages)
+
+        if key in self._entries:
+            prefix_tokens = self._entries[key]
+            self._entries.move_to_end(key)
+            if prefix_tokens is None:
+                self.misses += 1
+                return self._render_full(build_prefix() + messages)
+            self.hits += 1
+            return prefix_tokens + self._render_full(messages)
+
+        self.misses += 1
+        prefix_messages = build_prefix()
+        full_tokens = self._render_full(prefix_messages + messages)
+        prefix_tokens = self.encoding.render_conversation(
+            Conversation.from_messages(prefix_messages)
+        )
+        split = len(prefix_tokens)
+        if full_tokens[:split] != prefix_tokens or full_tokens[split:] != self._render_full(messages):
+            prefix_tokens = None
+        self._entries[key] = prefix_tokens
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return full_tokens
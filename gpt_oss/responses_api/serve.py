@@ -1,6 +1,12 @@
 # Ejemplo: torchrun --nproc-per-node=4 serve.py
 
 import argparse
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
 
 import uvicorn
 from openai_harmony import (
@@ -8,7 +14,123 @@ from openai_harmony import (
     load_harmony_encoding,
 )
 
+from .admission import AdmissionController
 from .api_server import create_api_server
+from .engine import EngineClient, run_engine_process
+from .store import SQLiteResponseStore
+from .tool_executor import ToolExecutor
+
+# configuración que el proceso principal pasa a los workers de uvicorn
+WORKER_CONFIG_ENV = "GPT_OSS_WORKER_CONFIG"
+
+
+def load_infer_next_token(inference_backend: str, checkpoint: str, ollama_url=None):
+    if inference_backend == "triton":
+        from .inference.triton import setup_model
+        return setup_model(checkpoint)
+    elif inference_backend == "stub":
+        from .inference.stub import setup_model
+        return setup_model(checkpoint)
+    elif inference_backend == "metal":
+        from .inference.metal import setup_model
+        return setup_model(checkpoint)
+    elif inference_backend == "ollama":
+        from .inference.ollama import setup_model
+        return setup_model(checkpoint, endpoint_url=ollama_url)
+    elif inference_backend == "vllm":
+        from .inference.vllm import setup_model
+        return setup_model(checkpoint)
+    elif inference_backend == "transformers":
+        from .inference.transformers import setup_model
+        return setup_model(checkpoint)
+    else:
+        raise ValueError(f"Invalid inference backend: {inference_backend}")
+
+
+def build_app(infer_next_token, options: dict, responses_store=None):
+    admission = None
+    if any(
+        options[name] is not None
+        for name in ("max_active", "max_queued", "max_per_client", "token_budget", "queue_timeout")
+    ):
+        admission = AdmissionController(
+            max_active=options["max_active"],
+            max_queued=options["max_queued"],
+            max_per_client=options["max_per_client"],
+            token_budget=options["token_budget"],
+            queue_timeout_s=options["queue_timeout"],
+        )
+
+    encoding = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
+    return create_api_server(
+        infer_next_token,
+        encoding,
+        sse_coalesce_ms=options["sse_coalesce_ms"],
+        admission=admission,
+        enable_metrics=not options["disable_metrics"],
+        responses_store=responses_store,
+        tool_executor=ToolExecutor(
+            max_workers=options["tool_workers"], timeout_s=options["tool_timeout"]
+        ),
+    )
+
+
+def create_worker_app():
+    """Fábrica de la aplicación para cada worker de uvicorn en modo multiproceso."""
+    options = json.loads(os.environ[WORKER_CONFIG_ENV])
+    logging.basicConfig(level=options["log_level"].upper())
+    infer_next_token = EngineClient(
+        options["engine_address"], bytes.fromhex(options["engine_authkey"])
+    )
+    return build_app(
+        infer_next_token, options, SQLiteResponseStore(options["store_path"])
+    )
+
+
+def serve_workers(options: dict):
+    """Arranca el proceso de motor y ``options["workers"]`` front-ends de uvicorn."""
+    runtime_dir = tempfile.mkdtemp(prefix="gpt_oss_serve_")
+    address = os.path.join(runtime_dir, "engine.sock")
+    authkey = os.urandom(16)
+
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    engine = ctx.Process(
+        target=run_engine_process,
+        args=(
+            functools.partial(
+                load_infer_next_token,
+                options["inference_backend"],
+                options["checkpoint"],
+                options["ollama_url"],
+            ),
+            address,
+            authkey,
+            ready,
+        ),
+        daemon=True,
+    )
+    engine.start()
+    # la carga del modelo puede tardar; se espera mientras el motor siga vivo
+    while not ready.wait(timeout=1.0):
+        if not engine.is_alive():
+            raise RuntimeError("engine process exited before becoming ready")
+
+    os.environ[WORKER_CONFIG_ENV] = json.dumps(
+        {
+            **options,
+            "engine_address": address,
+            "engine_authkey": authkey.hex(),
+            "store_path": options["store_path"] or os.path.join(runtime_dir, "responses.sqlite3"),
+        }
+    )
+    uvicorn.run(
+        "gpt_oss.responses_api.serve:create_worker_app",
+        factory=True,
+        workers=options["workers"],
+        port=options["port"],
+    )
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Servidor de API de respuestas")
@@ -16,7 +138,7 @@ if __name__ == "__main__":
         "--checkpoint",
         metavar="ARCHIVO",
         type=str,
-        help="Ruta al checkpoint de SafeTensors",
+        help="Ruta al checkpoint de SafeTensors (con el backend 'stub', un perfil JSON opcional)",
         default="~/model",
         required=False,
     )
@@ -42,27 +164,96 @@ if __name__ == "__main__":
         default=None,
         help="URL del endpoint Ollama cuando se usa el backend 'ollama'",
     )
+    parser.add_argument(
+        "--sse-coalesce-ms",
+        metavar="MS",
+        type=float,
+        default=0.0,
+        help="Presupuesto de latencia para agrupar varios deltas en un mismo frame SSE (0 lo desactiva)",
+    )
+    parser.add_argument(
+        "--max-active",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Máximo de generaciones simultáneas (sin límite por defecto)",
+    )
+    parser.add_argument(
+        "--max-queued",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Máximo de solicitudes en espera; por encima se responde 429",
+    )
+    parser.add_argument(
+        "--max-per-client",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Máximo de solicitudes en curso por cliente (cabecera X-Client-Id o IP)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        metavar="TOKENS",
+        type=int,
+        default=None,
+        help="Suma máxima de tokens (prompt + max_output_tokens) de las generaciones activas",
+    )
+    parser.add_argument(
+        "--queue-timeout",
+        metavar="SEGUNDOS",
+        type=float,
+        default=None,
+        help="Espera máxima en cola antes de responder 429",
+    )
+    parser.add_argument(
+        "--disable-metrics",
+        action="store_true",
+        help="No recoger métricas ni exponer /metrics",
+    )
+    parser.add_argument(
+        "--log-level",
+        metavar="NIVEL",
+        type=str,
+        default="INFO",
+        help="Nivel de logging (DEBUG muestra los prompts renderizados)",
+    )
+    parser.add_argument(
+        "--tool-workers",
+        metavar="N",
+        type=int,
+        default=4,
+        help="Hilos dedicados a ejecutar las herramientas integradas",
+    )
+    parser.add_argument(
+        "--tool-timeout",
+        metavar="SEGUNDOS",
+        type=float,
+        default=60.0,
+        help="Tiempo máximo de cada llamada a una herramienta integrada",
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Procesos de front-end; con más de uno el modelo se carga en un proceso de motor aparte",
+    )
+    parser.add_argument(
+        "--store-path",
+        metavar="ARCHIVO",
+        type=str,
+        default=None,
+        help="Base de datos SQLite compartida para previous_response_id en modo multiproceso",
+    )
     args = parser.parse_args()
-    if args.inference_backend == "triton":
-        from .inference.triton import setup_model
-        infer_next_token = setup_model(args.checkpoint)
-    elif args.inference_backend == "stub":
-        from .inference.stub import setup_model
-        infer_next_token = setup_model(args.checkpoint)
-    elif args.inference_backend == "metal":
-        from .inference.metal import setup_model
-        infer_next_token = setup_model(args.checkpoint)
-    elif args.inference_backend == "ollama":
-        from .inference.ollama import setup_model
-        infer_next_token = setup_model(args.checkpoint, endpoint_url=args.ollama_url)
-    elif args.inference_backend == "vllm":
-        from .inference.vllm import setup_model
-        infer_next_token = setup_model(args.checkpoint)
-    elif args.inference_backend == "transformers":
-        from .inference.transformers import setup_model
-        infer_next_token = setup_model(args.checkpoint)
-    else:
-        raise ValueError(f"Invalid inference backend: {args.inference_backend}")
+    logging.basicConfig(level=args.log_level.upper())
+    options = vars(args)
 
-    encoding = load_harmony_encoding(HarmonyEncodingName.HARMONY_GPT_OSS)
-    uvicorn.run(create_api_server(infer_next_token, encoding), port=args.port)
+    if args.workers > 1:
+        serve_workers(options)
+    else:
+        infer_next_token = load_infer_next_token(
+            args.inference_backend, args.checkpoint, args.ollama_url
+        )
+        uvicorn.run(build_app(infer_next_token, options), port=args.port)
@@ -0,0 +1,127 @@
+"""Serialización de eventos Server-Sent Events para la API de respuestas.
+
+Los deltas de texto se emiten una vez por token, por lo que construir y volcar
+un modelo pydantic en cada uno domina el coste de CPU por token cuando hay
+muchos clientes en streaming. Aquí se cachean plantillas JSON por tipo de
+evento y solo se escapan el delta y el número de secuencia.
+"""
+
+import json
+import time
+from functools import lru_cache
+from typing import Callable, Hashable, Optional
+
+from .events import ResponseEvent
+
+_SEQUENCE_SENTINEL = 987654321987
+_DELTA_SENTINEL = "__gpt_oss_delta__"
+
+
+def format_event(event: ResponseEvent) -> str:
+    """Serializa ``event`` como un frame SSE completo."""
+    return f"event: {event.type}\ndata: {event.model_dump_json(indent=None)}\n\n"
+
+
+@lru_cache(maxsize=1024)
+def _delta_template(
+    event_cls: type[ResponseEvent],
+    item_id: str,
+    output_index: int,
+    content_index: int,
+) -> tuple[str, str, str]:
+    # Se serializa una instancia con valores centinela y se parte por ellos, de
+    # modo que el orden de los campos y el resto de valores son exactamente los
+    # que produciría pydantic.
+    sample = event_cls(
+        sequence_number=_SEQUENCE_SENTINEL,
+        item_id=item_id,
+        output_index=output_index,
+        content_index=content_index,
+        delta=_DELTA_SENTINEL,
+    )
+    data = sample.model_dump_json(indent=None)
+    head, rest = data.split(str(_SEQUENCE_SENTINEL), 1)
+    middle, tail = rest.split(json.dumps(_DELTA_SENTINEL), 1)
+    return f"event: {sample.type}\ndata: {head}", middle, f"{tail}\n\n"
+
+
+def format_delta_event(
+    event_cls: type[ResponseEvent],
+    sequence_number: int,
+    delta: str,
+    *,
+    output_index: int = 0,
+    content_index: int = 0,
+    item_id: str = "item_1234",
+) -> str:
+    """Equivalente a ``format_event(event_cls(...))`` para eventos de delta."""
+    head, middle, tail = _delta_template(event_cls, item_id, output_index, content_index)
+    return f"{head}{sequence_number}{middle}{json.dumps(delta, ensure_ascii=False)}{tail}"
+
+
+def format_response_event(event_type: str, sequence_number: int, response_json: str) -> str:
+    """Frame SSE para eventos que solo envuelven un ``ResponseObject`` ya serializado."""
+    return (
+        f"event: {event_type}\ndata: "
+        f'{{"sequence_number":{sequence_number},"type":"{event_type}","response":{response_json}}}\n\n'
+    )
+
+
+class DeltaCoalescer:
+    """Agrupa deltas consecutivos de un mismo contenido en un único frame.
+
+    Un delta que llega cuando ya han pasado ``budget_s`` segundos desde el
+    último envío (o el primero del stream) se entrega inmediatamente. Los
+    demás se retienen mientras se espera que el siguiente token llegue dentro
+    de ``budget_s`` segundos desde el primer delta retenido (se usa el último
+    intervalo entre tokens como estimación). Con ``budget_s <= 0`` cada delta
+    se entrega inmediatamente.
+    """
+
+    def __init__(self, budget_s: float = 0.0, clock: Callable[[], float] = time.monotonic):
+        self.budget_s = budget_s
+        self._clock = clock
+        self._key: Optional[Hashable] = None
+        self._parts: list[str] = []
+        self._first_ts = 0.0
+        self._last_ts: Optional[float] = None
+        self._gap = 0.0
+        self._last_flush_ts: Optional[float] = None
+
+    def add(self, key: Hashable, delta: str) -> list[tuple[Hashable, str]]:
+        """Añade ``delta`` y devuelve los lotes ``(key, texto)`` listos para enviar."""
+        if self.budget_s <= 0:
+            return [(key, delta)]
+
+        now = self._clock()
+        if self._last_ts is not None:
+            self._gap = now - self._last_ts
+        self._last_ts = now
+
+        ready = []
+        if self._key is not None and self._key != key:
+            ready.extend(self.flush())
+        elif self._key is None and (
+            self._last_flush_ts is None or now - self._last_flush_ts >= self.budget_s
+        ):
+            # nada que agrupar con lo ya enviado: retenerlo solo añadiría latencia
+            self._last_flush_ts = now
+            return [(key, delta)]
+        if self._key is None:
+            self._key = key
+            self._first_ts = now
+        self._parts.append(delta)
+
+        if now - self._first_ts + self._gap >= self.budget_s:
+            ready.extend(self.flush())
+        return ready
+
+    def flush(self) -> list[tuple[Hashable, str]]:
+        """Entrega el lote pendiente, si existe."""
+        if self._key is None:
+            return []
+        batch = (self._key, "".join(self._parts))
+        self._key = None
+        self._parts = []
+        self._last_flush_ts = self._clock()
+        return [batch]
@@ -0,0 +1,68 @@
+"""Almacenes de respuestas para ``previous_response_id``.
+
+``create_api_server`` solo necesita ``get(response_id)`` y asignación por
+clave, de modo que un ``dict`` sirve para un único proceso. Con varios
+workers se usa ``SQLiteResponseStore``, compartido a través de un fichero.
+"""
+
+import sqlite3
+import threading
+from typing import Optional, Protocol
+
+from .types import ResponseObject, ResponsesRequest
+
+
+class ResponseStore(Protocol):
+    def get(self, response_id: str, default=None) -> Optional[tuple[ResponsesRequest, ResponseObject]]:
+        ...
+
+    def __setitem__(self, response_id: str, value: tuple[ResponsesRequest, ResponseObject]):
+        ...
+
+
+class SQLiteResponseStore:
+    """Almacén de ``(ResponsesRequest, ResponseObject)`` respaldado por SQLite.
+
+    Cada proceso abre su propia conexión; el modo WAL permite que los
+    lectores de otros workers no bloqueen las escrituras.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "id TEXT PRIMARY KEY, request TEXT NOT NULL, response TEXT NOT NULL)"
+        )
+
+    def get(
+        self, response_id: str, default=None
+    ) -> Optional[tuple[ResponsesRequest, ResponseObject]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT request, response FROM responses WHERE id = ?", (response_id,)
+            ).fetchone()
+        if row is None:
+            return default
+        return (
+            ResponsesRequest.model_validate_json(row[0]),
+            ResponseObject.model_validate_json(row[1]),
+        )
+
+    def __setitem__(self, response_id: str, value: tuple[ResponsesRequest, ResponseObject]):
+        request, response = value
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (id, request, response) VALUES (?, ?, ?)",
+                (response_id, request.model_dump_json(), response.model_dump_json()),
+            )
+
+    def __contains__(self, response_id: str) -> bool:
+        return self.get(response_id) is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,75 @@
+"""Ejecución de herramientas fuera del bucle de eventos del servidor.
+
+Las herramientas integradas son corrutinas, pero parte de su trabajo es CPU
+síncrona (procesar HTML, tokenizar páginas) que, ejecutada en el bucle del
+servidor, detiene el streaming de todas las demás sesiones. ``ToolExecutor``
+las ejecuta en hilos con su propio bucle de eventos y aplica un tiempo límite
+a cada llamada.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+_DEFAULT = object()
+
+
+class ToolExecutor:
+    """Grupo de hilos, cada uno con un bucle de eventos, para corrutinas de herramientas.
+
+    Los hilos se crean con la primera llamada. Cada corrutina se asigna al
+    bucle con menos llamadas en curso; al vencer ``timeout_s`` (o si se cancela
+    quien espera) la tarea se cancela también en su bucle.
+    """
+
+    def __init__(self, max_workers: int = 4, timeout_s: Optional[float] = 60.0):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self._loops: list[asyncio.AbstractEventLoop] = []
+        self._threads: list[threading.Thread] = []
+        self._pending: list[int] = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loops:
+                return
+            for i in range(self.max_workers):
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name=f"tool-executor-{i}", daemon=True
+                )
+                thread.start()
+                self._loops.append(loop)
+                self._threads.append(thread)
+                self._pending.append(0)
+
+    async def run(self, coro: Awaitable[Any], timeout_s: Any = _DEFAULT) -> Any:
+        """Ejecuta ``coro`` en el grupo; lanza ``asyncio.TimeoutError`` si vence el plazo."""
+        if timeout_s is _DEFAULT:
+            timeout_s = self.timeout_s
+        self._ensure_started()
+        with self._lock:
+            index = min(range(len(self._loops)), key=self._pending.__getitem__)
+            self._pending[index] += 1
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, self._loops[index])
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout_s)
+        finally:
+            with self._lock:
+                if index < len(self._pending):
+                    self._pending[index] -= 1
+
+    def shutdown(self, timeout_s: float = 5.0):
+        """Detiene los bucles; las llamadas aún en curso se abandonan."""
+        with self._lock:
+            loops, threads = self._loops, self._threads
+            self._loops, self._threads, self._pending = [], [], []
+        for loop in loops:
+            loop.call_soon_threadsafe(loop.stop)
+        for loop, thread in zip(loops, threads):
+            thread.join(timeout_s)
+            if not thread.is_alive():
+                loop.close()
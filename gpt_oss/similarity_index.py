@@ -0,0 +1,137 @@
+"""Índice de similitud para recuperar episodios parecidos a un patrón.
+
+:meth:`StrategicMemory.query <gpt_oss.strategic_memory.StrategicMemory.query>`
+solo encuentra episodios con campos idénticos. :class:`HashedFeatureIndex`
+representa cada episodio como un vector (por defecto, una bolsa de rasgos
+``clave=valor`` proyectada con *feature hashing*) y devuelve los ``k`` más
+parecidos por similitud coseno, de modo que un estado con un campo distinto
+sigue encontrando los episodios relevantes.
+
+Requiere NumPy, que no es una dependencia obligatoria del paquete.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EmbedFn = Callable[[Dict[str, Any]], Sequence[float]]
+
+
+def _tokens(clave: str, valor: Any) -> List[str]:
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return [f"{clave}={elemento!r}" for elemento in valor]
+    if isinstance(valor, dict):
+        return [f"{clave}.{k}={v!r}" for k, v in valor.items()]
+    return [f"{clave}={valor!r}"]
+
+
+class HashedFeatureIndex:
+    """Vectores de episodios en una matriz NumPy con búsqueda de los ``k`` más similares.
+
+    Cada episodio se describe con un diccionario de rasgos (sus metadatos
+    más ``action`` y ``outcome``), igual que los patrones de búsqueda. Sin
+    ``embed`` cada par ``clave=valor`` (o cada elemento de una lista) se
+    proyecta con CRC32 sobre ``dim`` posiciones con signo; con ``embed`` se
+    usa el vector que devuelva esa función. Los vectores se normalizan, así
+    que el producto con la consulta es la similitud coseno.
+
+    Las filas forman un búfer circular en el orden en que se añaden los
+    episodios: descartar el más antiguo es O(1) y la matriz solo crece
+    (duplicándose) cuando se llena. La búsqueda es exhaustiva, un producto
+    matriz-vector y ``argpartition``, suficiente para decenas de miles de
+    episodios.
+    """
+
+    def __init__(
+        self,
+        dim: int = 256,
+        embed: Optional[EmbedFn] = None,
+        initial_capacity: int = 1024,
+    ) -> None:
+        if dim < 1:
+            raise ValueError("dim debe ser al menos 1")
+        self.dim = dim
+        self.embed = embed
+        capacity = max(1, initial_capacity)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._records: List[Any] = [None] * capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def vectorize(self, features: Dict[str, Any]) -> np.ndarray:
+        """Vector normalizado de ``features`` (todo ceros si no tiene rasgos)."""
+
+        if self.embed is not None:
+            vector = np.asarray(self.embed(features), dtype=np.float32)
+            if vector.shape != (self.dim,):
+                raise ValueError(
+                    f"embed debe devolver un vector de dimensión {self.dim}"
+                )
+        else:
+            posiciones: List[int] = []
+            signos: List[float] = []
+            for clave, valor in features.items():
+                for token in _tokens(clave, valor):
+                    h = zlib.crc32(token.encode("utf-8"))
+                    posiciones.append(h % self.dim)
+                    signos.append(1.0 if h & 0x80000000 else -1.0)
+            vector = np.bincount(posiciones, weights=signos, minlength=self.dim).astype(
+                np.float32
+            )
+        norma = float(np.linalg.norm(vector))
+        return vector / norma if norma > 0 else vector
+
+    def _grow(self) -> None:
+        capacity = len(self._records)
+        orden = [(self._start + i) % capacity for i in range(self._size)]
+        vectors = np.zeros((capacity * 2, self.dim), dtype=np.float32)
+        vectors[: self._size] = self._vectors[orden]
+        self._records = [self._records[i] for i in orden] + [None] * (capacity * 2 - self._size)
+        self._vectors = vectors
+        self._start = 0
+
+    def add(self, record: Any, features: Dict[str, Any]) -> None:
+        """Añade ``record`` como el más reciente, descrito por ``features``."""
+
+        if self._size == len(self._records):
+            self._grow()
+        slot = (self._start + self._size) % len(self._records)
+        self._vectors[slot] = self.vectorize(features)
+        self._records[slot] = record
+        self._size += 1
+
+    def remove_oldest(self) -> None:
+        if not self._size:
+            return
+        self._vectors[self._start] = 0.0
+        self._records[self._start] = None
+        self._start = (self._start + 1) % len(self._records)
+        self._size -= 1
+
+    def search(self, features: Dict[str, Any], k: int) -> List[Tuple[Any, float]]:
+        """Los ``k`` registros más similares a ``features``, del más al menos parecido.
+
+        A igual similitud se prefiere el más reciente.
+        """
+
+        if k <= 0 or not self._size:
+            return []
+        consulta = self.vectorize(features)
+        # las filas libres son ceros: se puntúa la matriz entera y se toman
+        # las ocupadas de la más reciente a la más antigua
+        recientes = (self._start + np.arange(self._size - 1, -1, -1)) % len(self._records)
+        puntos = (self._vectors @ consulta)[recientes]
+        if k < self._size:
+            umbral = puntos[np.argpartition(-puntos, k - 1)[k - 1]]
+            candidatos = np.flatnonzero(puntos >= umbral)
+        else:
+            candidatos = np.arange(self._size)
+        # por similitud y, a igualdad, por recencia (índice menor)
+        candidatos = candidatos[np.lexsort((candidatos, -puntos[candidatos]))][:k]
+        return [(self._records[recientes[i]], float(puntos[i])) for i in candidatos]
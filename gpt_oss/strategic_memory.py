@@ -1,9 +1,52 @@
 """Utilities for managing strategic memory and episodic data."""
 
-from collections import Counter
+import math
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Any, Dict, List
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from gpt_oss.similarity_index import HashedFeatureIndex
+
+# Campos que se consultan con más frecuencia (acción, resultado y los
+# metadatos que escriben ``MetaRouter``, ``Planner`` y ``ReasoningKernel``).
+DEFAULT_INDEXED_FIELDS: Tuple[str, ...] = (
+    "action",
+    "outcome",
+    "task",
+    "context",
+    "expert",
+    "mode",
+)
+
+# Marca el valor de un campo indexado que no se pudo usar como clave.
+_UNHASHABLE = object()
+
+
+def _summary_key(valor: Any) -> Any:
+    """Clave con la que se cuenta ``valor`` en los resúmenes (``repr`` si no es hashable)."""
+    try:
+        hash(valor)
+    except TypeError:
+        return repr(valor)
+    return valor
 
 
 @dataclass
@@ -37,9 +80,32 @@ class StrategicMemory:
     Proporciona operaciones para guardar, recuperar y actualizar
     entradas identificadas por una clave, así como registrar
     interacciones o episodios que se pueden consultar posteriormente.
+
+    Los episodios se guardan en una cola doble, de modo que descartar el más
+    antiguo es O(1). Para cada campo de ``indexed_fields`` se mantiene un
+    índice valor → episodios (en orden de inserción) que :meth:`query` usa
+    para no recorrer toda la memoria. Los episodios no deben modificarse
+    después de añadirlos.
+
+    Con un ``similarity_index`` (ver :mod:`gpt_oss.similarity_index`), además,
+    :meth:`query_similar` devuelve los episodios más parecidos a un patrón
+    aunque ninguno coincida exactamente.
+
+    Las marcas de tiempo se mantienen además en una lista ordenada, de modo
+    que :meth:`query_range` localiza un intervalo con ``bisect`` aunque los
+    episodios no lleguen en orden cronológico.
     """
 
-    def __init__(self, max_episodes: int | None = None) -> None:
+    # Si los registros internos no pueden cambiar, los valores indexados se
+    # recalculan al descartarlos en lugar de guardarlos aparte.
+    _immutable_records = False
+
+    def __init__(
+        self,
+        max_episodes: int | None = None,
+        indexed_fields: Iterable[str] = DEFAULT_INDEXED_FIELDS,
+        similarity_index: Optional["HashedFeatureIndex"] = None,
+    ) -> None:
         """Inicializa las estructuras de almacenamiento internas.
 
         Parámetros
@@ -47,10 +113,65 @@ class StrategicMemory:
         max_episodes:
             Número máximo de episodios a conservar. Si es ``None``,
             la cantidad de episodios es ilimitada.
+        indexed_fields:
+            Atributos o claves de metadatos por los que se indexan los
+            episodios para acelerar las consultas por igualdad.
+        similarity_index:
+            Índice vacío en el que se registran los episodios para
+            :meth:`query_similar`. Si es ``None`` no hay búsqueda por similitud.
         """
         self._storage: Dict[str, Any] = {}
-        self._episodes: List[Episode] = []
+        self._episodes: Deque[Episode] = deque()
         self._max_episodes = max_episodes
+        self._indexed_fields: Tuple[str, ...] = tuple(dict.fromkeys(indexed_fields))
+        # campo -> valor -> episodios con ese valor, del más antiguo al más reciente
+        self._index: Dict[str, Dict[Any, Deque[Episode]]] = {
+            campo: {} for campo in self._indexed_fields
+        }
+        # episodios con valores no hashables por campo: mientras haya alguno
+        # el índice de ese campo no basta para responder una consulta
+        self._unhashable: Dict[str, int] = dict.fromkeys(self._indexed_fields, 0)
+        # valores indexados de cada episodio, en paralelo a ``_episodes``
+        self._index_values: Deque[Tuple[Any, ...]] = deque()
+        # contadores de :meth:`summarize`, al día con cada alta y descarte
+        self._action_counts: Counter = Counter()
+        self._outcome_counts: Counter = Counter()
+        self._similarity = similarity_index
+        # índice temporal: claves de tiempo ordenadas y, en paralelo, el número
+        # de alta y el registro de cada episodio. Los descartados se quitan
+        # de forma perezosa: siguen en las listas con un número de alta menor
+        # que ``_first_seq`` hasta que se reconstruyen.
+        self._time_keys: List[float] = []
+        self._time_seqs = array("q")
+        self._time_records: List[Any] = []
+        self._first_seq = 0
+        self._next_seq = 0
+        self._listeners: List[
+            Tuple[Callable[[Episode], None], Optional[Callable[[Episode], None]]]
+        ] = []
+
+    def add_listener(
+        self,
+        on_add: Callable[[Episode], None],
+        on_remove: Optional[Callable[[Episode], None]] = None,
+    ) -> None:
+        """Registra funciones que se invocan al añadir y al descartar episodios.
+
+        Permite a otros componentes mantener agregados incrementales en
+        lugar de recorrer todos los episodios en cada consulta.
+
+        Parámetros
+        ----------
+        on_add:
+            Se llama con cada episodio añadido.
+        on_remove:
+            Se llama con cada episodio descartado por ``max_episodes``.
+        """
+        self._listeners.append((on_add, on_remove))
+
+    def remove_listener(self, on_add: Callable[[Episode], None]) -> None:
+        """Elimina los oyentes registrados con ``on_add``."""
+        self._listeners = [pair for pair in self._listeners if pair[0] != on_add]
 
     def save(self, key: str, value: Any) -> None:
         """Guarda una nueva entrada en la memoria.
@@ -119,14 +240,167 @@ class StrategicMemory:
 
         if self._max_episodes is not None:
             while len(self._episodes) >= self._max_episodes:
-                self._episodes.pop(0)
-        self._episodes.append(data)
+                descartado = self._episodes.popleft()
+                self._unindex_oldest(descartado)
+                self._count_episode(
+                    self._field_value(descartado, "action"),
+                    self._field_value(descartado, "outcome"),
+                    -1,
+                )
+                if self._similarity is not None:
+                    self._similarity.remove_oldest()
+                for _, on_remove in self._listeners:
+                    if on_remove is not None:
+                        on_remove(self._materialize(descartado))
+        registro = self._compact(data)
+        self._episodes.append(registro)
+        self._index_episode(registro)
+        self._count_episode(data.action, data.outcome, 1)
+        if self._similarity is not None:
+            self._similarity.add(registro, self._features(data))
+        for on_add, _ in self._listeners:
+            on_add(data)
+
+    @staticmethod
+    def _features(episodio: Episode) -> Dict[str, Any]:
+        """Rasgos con los que se indexa un episodio para :meth:`query_similar`."""
+        return {**episodio.metadata, "action": episodio.action, "outcome": episodio.outcome}
+
+    def _count_episode(self, action: Any, outcome: Any, sign: int) -> None:
+        for contador, valor in ((self._action_counts, action), (self._outcome_counts, outcome)):
+            clave = _summary_key(valor)
+            contador[clave] += sign
+            if contador[clave] <= 0:
+                del contador[clave]
+
+    # Representación interna de los episodios: esta clase guarda el propio
+    # ``Episode``; las subclases pueden usar una más compacta.
+
+    def _compact(self, episodio: Episode) -> Any:
+        return episodio
+
+    def _materialize(self, registro: Any) -> Episode:
+        return registro
+
+    def _timestamp(self, registro: Any) -> datetime:
+        return registro.timestamp
+
+    @staticmethod
+    def _field_value(episodio: Episode, clave: str) -> Any:
+        return getattr(episodio, clave, episodio.metadata.get(clave))
+
+    def _index_episode(self, episodio: Episode) -> None:
+        valores = []
+        for campo in self._indexed_fields:
+            valor = self._field_value(episodio, campo)
+            try:
+                cubeta = self._index[campo].get(valor)
+            except TypeError:
+                self._unhashable[campo] += 1
+                valores.append(_UNHASHABLE)
+                continue
+            if cubeta is None:
+                cubeta = self._index[campo][valor] = deque()
+            cubeta.append(episodio)
+            valores.append(valor)
+        if not self._immutable_records:
+            self._index_values.append(tuple(valores))
+
+        seq = self._next_seq
+        self._next_seq += 1
+        try:
+            clave = self._time_key(self._timestamp(episodio))
+        except (AttributeError, TypeError, ValueError, OverflowError):
+            # sin una marca de tiempo válida el episodio queda fuera de query_range
+            return
+        claves = self._time_keys
+        if not claves or clave >= claves[-1]:
+            claves.append(clave)
+            self._time_seqs.append(seq)
+            self._time_records.append(episodio)
+        else:
+            i = bisect_right(claves, clave)
+            claves.insert(i, clave)
+            self._time_seqs.insert(i, seq)
+            self._time_records.insert(i, episodio)
+
+    def _unindex_oldest(self, episodio: Episode) -> None:
+        """Quita del índice el episodio más antiguo, que encabeza sus cubetas."""
+        if self._immutable_records:
+            valores = [self._field_value(episodio, campo) for campo in self._indexed_fields]
+        else:
+            valores = self._index_values.popleft()
+        for campo, valor in zip(self._indexed_fields, valores):
+            try:
+                cubeta = self._index[campo][valor] if valor is not _UNHASHABLE else None
+            except TypeError:
+                cubeta = None
+            if cubeta is None:
+                self._unhashable[campo] -= 1
+                continue
+            cubeta.popleft()
+            if not cubeta:
+                del self._index[campo][valor]
+
+        self._first_seq += 1
+        muertos = len(self._time_seqs) - (self._next_seq - self._first_seq)
+        if muertos > 64 and muertos * 2 > len(self._time_seqs):
+            vivos = [i for i, seq in enumerate(self._time_seqs) if seq >= self._first_seq]
+            self._time_keys = [self._time_keys[i] for i in vivos]
+            self._time_seqs = array("q", [self._time_seqs[i] for i in vivos])
+            self._time_records = [self._time_records[i] for i in vivos]
+
+    @staticmethod
+    def _time_key(timestamp: datetime) -> float:
+        """Segundos desde la época: comparables entre fechas con y sin zona horaria."""
+        return timestamp.timestamp()
+
+    def query_range(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        pattern: Optional[Dict[str, Any]] = None,
+    ) -> List[Episode]:
+        """Busca los episodios con marca de tiempo en ``[start, end)``.
+
+        Parámetros
+        ----------
+        start, end:
+            Límites del intervalo; ``None`` lo deja abierto por ese lado.
+        pattern:
+            Si se indica, solo se devuelven los episodios que además cumplen
+            este patrón, como en :meth:`query`.
+
+        Devuelve
+        -------
+        list[Episode]
+            Episodios ordenados por marca de tiempo y, a igualdad, por orden
+            de inserción.
+        """
+
+        claves = self._time_keys
+        inicio = 0 if start is None else bisect_left(claves, self._time_key(start))
+        fin = len(claves) if end is None else bisect_left(claves, self._time_key(end))
+        campo = self._field_value
+        resultados: List[Episode] = []
+        for i in range(inicio, fin):
+            if self._time_seqs[i] < self._first_seq:
+                continue
+            registro = self._time_records[i]
+            if pattern and not all(
+                campo(registro, clave) == valor for clave, valor in pattern.items()
+            ):
+                continue
+            resultados.append(self._materialize(registro))
+        return resultados
 
     def query(self, pattern: Dict[str, Any]) -> List[Episode]:
         """Busca episodios que coincidan con los campos proporcionados.
 
         Cada par clave-valor de ``pattern`` se compara con los atributos
         del episodio y con su metadato homónimo si el atributo no existe.
+        Si alguna clave está indexada solo se revisan los episodios de la
+        cubeta más pequeña de entre las claves indexadas.
 
         Parámetros
         ----------
@@ -139,8 +413,11 @@ class StrategicMemory:
             Lista de episodios que cumplen con el patrón.
         """
 
+        if not pattern:
+            return list(self._episodes)
+        candidatos = self._candidates(pattern)
         resultados: List[Episode] = []
-        for episodio in self._episodes:
+        for episodio in candidatos:
             coincide = True
             for clave, valor in pattern.items():
                 attr = getattr(episodio, clave, episodio.metadata.get(clave))
@@ -151,9 +428,86 @@ class StrategicMemory:
                 resultados.append(episodio)
         return resultados
 
-    def summarize(self) -> Dict[str, Any]:
+    def query_similar(self, pattern: Dict[str, Any], k: int = 5) -> List[Tuple[Episode, float]]:
+        """Busca los ``k`` episodios más parecidos a ``pattern``.
+
+        ``pattern`` tiene la forma de los patrones de :meth:`query` (claves de
+        metadatos, ``action`` y ``outcome``), pero no hace falta que coincida
+        por completo: los episodios se ordenan por la similitud coseno que
+        calcula el índice de similitud.
+
+        Parámetros
+        ----------
+        pattern:
+            Diccionario con los campos y valores a buscar.
+        k:
+            Número máximo de episodios a devolver.
+
+        Devuelve
+        -------
+        list[tuple[Episode, float]]
+            Pares ``(episodio, similitud)`` del más al menos parecido.
+
+        Errores
+        ------
+        ValueError
+            Si la memoria se creó sin ``similarity_index``.
+        """
+
+        if self._similarity is None:
+            raise ValueError("La memoria no tiene índice de similitud.")
+        return [
+            (self._materialize(registro), similitud)
+            for registro, similitud in self._similarity.search(pattern, k)
+        ]
+
+    def _candidates(self, pattern: Dict[str, Any]) -> Iterable[Any]:
+        """Registros que pueden cumplir ``pattern``: la menor cubeta indexada o todos."""
+
+        candidatos: Iterable[Any] = self._episodes
+        menor: Optional[int] = None
+        for clave, valor in pattern.items():
+            indice = self._index.get(clave)
+            if indice is None or self._unhashable[clave]:
+                continue
+            try:
+                cubeta = indice.get(valor)
+            except TypeError:
+                continue
+            if cubeta is None:
+                return ()
+            if menor is None or len(cubeta) < menor:
+                candidatos, menor = cubeta, len(cubeta)
+        return candidatos
+
+    def summarize(
+        self,
+        last: int | None = None,
+        seconds: float | None = None,
+        now: datetime | None = None,
+    ) -> Dict[str, Any]:
         """Obtiene estadísticas generales de los episodios almacenados.
 
+        Sin argumentos se usan contadores que se mantienen al añadir y
+        descartar episodios, así que el coste no depende del número de
+        episodios. Con ``last`` o ``seconds`` solo se recorren los episodios
+        de la ventana; la ventana temporal se busca en el índice de
+        :meth:`query_range`, así que no depende del orden de llegada y admite
+        fechas con y sin zona horaria. Las acciones y resultados no hashables
+        se cuentan por su ``repr``.
+
+        Parámetros
+        ----------
+        last:
+            Si se indica, resume solo los ``last`` episodios más recientes.
+        seconds:
+            Si se indica, resume solo los episodios con marca de tiempo
+            igual o posterior a ``now`` menos ``seconds`` segundos (entre los
+            ``last`` últimos añadidos, si también se indica ``last``).
+        now:
+            Referencia para ``seconds``; por defecto, la marca de tiempo más
+            reciente.
+
         Devuelve
         -------
         dict
@@ -161,10 +515,240 @@ class StrategicMemory:
             resultados más frecuentes.
         """
 
-        acciones = Counter(ep.action for ep in self._episodes)
-        resultados = Counter(ep.outcome for ep in self._episodes)
+        if last is None and seconds is None:
+            return self._summary(len(self._episodes), self._action_counts, self._outcome_counts)
+        if seconds is None:
+            recientes = list(islice(reversed(self._episodes), last))
+            recientes.reverse()
+        else:
+            referencia = None if now is None else self._time_key(now)
+            recientes = self._time_window(seconds, referencia, last)
+        return self._summarize_records(recientes)
+
+    def _summarize_records(self, registros: List[Any]) -> Dict[str, Any]:
+        acciones: Counter = Counter()
+        resultados: Counter = Counter()
+        for registro in registros:
+            acciones[_summary_key(self._field_value(registro, "action"))] += 1
+            resultados[_summary_key(self._field_value(registro, "outcome"))] += 1
+        return self._summary(len(registros), acciones, resultados)
+
+    def _newest_time_key(self) -> Optional[float]:
+        """Clave de tiempo más reciente del índice temporal; ``None`` si está vacío."""
+
+        claves, seqs = self._time_keys, self._time_seqs
+        i = len(claves) - 1
+        while i >= 0 and seqs[i] < self._first_seq:
+            i -= 1
+        return claves[i] if i >= 0 else None
+
+    def _time_window(
+        self, seconds: float, referencia: Optional[float], last: Optional[int]
+    ) -> List[Any]:
+        """Registros con clave de tiempo desde ``referencia - seconds``, por orden temporal.
+
+        Sin ``referencia`` se usa la clave más reciente; con ``last`` solo se
+        consideran los ``last`` últimos registros añadidos.
+        """
+
+        if referencia is None:
+            referencia = self._newest_time_key()
+            if referencia is None:
+                return []
+        claves, seqs = self._time_keys, self._time_seqs
+        primero = self._first_seq if last is None else max(self._first_seq, self._next_seq - last)
+        inicio = bisect_left(claves, referencia - seconds)
+        registros = self._time_records
+        return [registros[i] for i in range(inicio, len(claves)) if seqs[i] >= primero]
+
+    @staticmethod
+    def _summary(total: int, acciones: Counter, resultados: Counter) -> Dict[str, Any]:
         return {
-            "total": len(self._episodes),
+            "total": total,
             "actions": acciones.most_common(),
             "outcomes": resultados.most_common(),
         }
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Posición de cada atributo de ``Episode`` en los registros compactos.
+_TIMESTAMP, _INPUT, _ACTION, _OUTCOME, _KEYS, _VALUES = range(6)
+_ATTRIBUTE_POSITIONS = {
+    "timestamp": _TIMESTAMP,
+    "input": _INPUT,
+    "action": _ACTION,
+    "outcome": _OUTCOME,
+}
+
+
+class CompactStrategicMemory(StrategicMemory):
+    """``StrategicMemory`` que guarda los episodios en registros compactos.
+
+    Cada episodio se almacena como una tupla con la marca de tiempo en
+    microsegundos (un entero en lugar de un ``datetime`` si no tiene zona
+    horaria), la entrada, la acción y el resultado, y los metadatos separados
+    en un esquema de claves compartido entre todos los episodios con las
+    mismas claves y una tupla de valores. Las cadenas de acción, resultado y
+    metadatos se internan para que los valores repetidos (``"success"``,
+    nombres de expertos, modos...) ocupen una sola copia.
+
+    :meth:`query` y los oyentes de descarte reciben objetos :class:`Episode`
+    nuevos, construidos al devolverlos; los oyentes de alta siguen recibiendo
+    el episodio original. Los metadatos devueltos son diccionarios nuevos,
+    así que modificarlos no altera la memoria.
+    """
+
+    _immutable_records = True
+
+    def __init__(
+        self,
+        max_episodes: int | None = None,
+        indexed_fields: Iterable[str] = DEFAULT_INDEXED_FIELDS,
+        similarity_index: Optional["HashedFeatureIndex"] = None,
+    ) -> None:
+        super().__init__(
+            max_episodes=max_episodes,
+            indexed_fields=indexed_fields,
+            similarity_index=similarity_index,
+        )
+        # claves de metadatos -> posición de cada una en la tupla de valores
+        self._schemas: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+    @staticmethod
+    def _intern(valor: Any) -> Any:
+        return sys.intern(valor) if type(valor) is str else valor
+
+    def _compact(self, episodio: Episode) -> Tuple[Any, ...]:
+        timestamp: Any = episodio.timestamp
+        if type(timestamp) is datetime and timestamp.tzinfo is None:
+            timestamp = (timestamp - _EPOCH) // _MICROSECOND
+        metadata = episodio.metadata
+        claves = tuple(metadata)
+        esquema = self._schemas.get(claves)
+        if esquema is None:
+            esquema = self._schemas[claves] = {
+                sys.intern(c) if type(c) is str else c: i for i, c in enumerate(claves)
+            }
+        intern = self._intern
+        return (
+            timestamp,
+            episodio.input,
+            intern(episodio.action),
+            intern(episodio.outcome),
+            esquema,
+            tuple([intern(v) for v in metadata.values()]),
+        )
+
+    def _materialize(self, registro: Tuple[Any, ...]) -> Episode:
+        valores = registro[_VALUES]
+        return Episode(
+            timestamp=self._timestamp(registro),
+            input=registro[_INPUT],
+            action=registro[_ACTION],
+            outcome=registro[_OUTCOME],
+            metadata={clave: valores[i] for clave, i in registro[_KEYS].items()},
+        )
+
+    def _timestamp(self, registro: Tuple[Any, ...]) -> datetime:
+        timestamp = registro[_TIMESTAMP]
+        if type(timestamp) is int:
+            return _EPOCH + timedelta(microseconds=timestamp)
+        return timestamp
+
+    def _field_value(self, registro: Tuple[Any, ...], clave: str) -> Any:
+        posicion = _ATTRIBUTE_POSITIONS.get(clave)
+        if posicion is not None:
+            if posicion == _TIMESTAMP:
+                return self._timestamp(registro)
+            return registro[posicion]
+        if clave == "metadata":
+            return self._materialize(registro).metadata
+        i = registro[_KEYS].get(clave)
+        return None if i is None else registro[_VALUES][i]
+
+    def query(self, pattern: Dict[str, Any]) -> List[Episode]:
+        """Busca episodios que coincidan con los campos proporcionados.
+
+        Acepta los mismos patrones que :meth:`StrategicMemory.query`.
+        """
+
+        materializar = self._materialize
+        if not pattern:
+            return [materializar(registro) for registro in self._episodes]
+        campo = self._field_value
+        return [
+            materializar(registro)
+            for registro in self._candidates(pattern)
+            if all(campo(registro, clave) == valor for clave, valor in pattern.items())
+        ]
+
+
+# Con exponentes mayores se reescalan las sumas para no desbordar el float.
+_MAX_EXPONENT = 50.0
+
+
+class DecayedAggregate:
+    """Sumas por clave con decaimiento exponencial respecto al tiempo.
+
+    Cada aportación pesa ``0.5 ** (edad / half_life)``. Las sumas se guardan
+    escaladas respecto a un instante de referencia, de modo que añadir y
+    retirar una aportación (por ejemplo, al descartar un episodio) es O(1) y
+    consultar una clave solo multiplica por el decaimiento acumulado desde la
+    referencia. Los tiempos son segundos (``datetime.timestamp()``).
+    """
+
+    def __init__(self, half_life: float) -> None:
+        if half_life <= 0:
+            raise ValueError("half_life debe ser positivo")
+        self.half_life = half_life
+        self._rate = math.log(2) / half_life
+        self._anchor: Optional[float] = None
+        self._sums: Dict[Hashable, List[float]] = {}
+        # aportaciones vivas por clave: al llegar a cero se borra la clave en
+        # lugar de arrastrar restos de redondeo
+        self._counts: Dict[Hashable, int] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sums
+
+    def add(
+        self, key: Hashable, values: Sequence[float], timestamp: float, sign: int = 1
+    ) -> None:
+        """Suma (o resta, con ``sign=-1``) ``values`` observados en ``timestamp``."""
+
+        if self._anchor is None:
+            self._anchor = timestamp
+        exponente = self._rate * (timestamp - self._anchor)
+        if exponente > _MAX_EXPONENT:
+            self._rebase(timestamp)
+            exponente = 0.0
+        peso = sign * math.exp(exponente)
+        sumas = self._sums.get(key)
+        if sumas is None:
+            sumas = self._sums[key] = [0.0] * len(values)
+        for i, valor in enumerate(values):
+            sumas[i] += peso * valor
+        cuenta = self._counts.get(key, 0) + sign
+        if cuenta <= 0:
+            del self._sums[key]
+            self._counts.pop(key, None)
+        else:
+            self._counts[key] = cuenta
+
+    def _rebase(self, timestamp: float) -> None:
+        factor = math.exp(-self._rate * (timestamp - self._anchor))
+        for sumas in self._sums.values():
+            for i in range(len(sumas)):
+                sumas[i] *= factor
+        self._anchor = timestamp
+
+    def get(self, key: Hashable, now: float) -> Optional[List[float]]:
+        """Valores de ``key`` decaídos hasta ``now``; ``None`` si no hay aportaciones."""
+
+        sumas = self._sums.get(key)
+        if sumas is None:
+            return None
+        factor = math.exp(-self._rate * (now - self._anchor))
+        return [suma * factor for suma in sumas]
@@ -8,12 +8,22 @@ solicitud.
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import inspect
+import json
+import threading
+from bisect import insort
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
-from time import perf_counter
-from typing import Any, Dict, List, Optional
+from time import monotonic, perf_counter, time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from gpt_oss.strategic_memory import Episode, StrategicMemory
+from gpt_oss.strategic_memory import DecayedAggregate, Episode, StrategicMemory
+
+OutcomeKey = Tuple[str, str, Tuple[str, ...]]
 
 
 @dataclass
@@ -25,6 +35,94 @@ class Expert:
     contexts: List[str] = field(default_factory=list)
     goals: List[str] = field(default_factory=list)
     priority: int = 0
+    cacheable: bool = False
+
+
+class ResultCache:
+    """LRU con caducidad opcional para resultados de expertos deterministas.
+
+    Las claves son el SHA-256 del JSON canónico (claves ordenadas) del nombre
+    del experto y la solicitud; las solicitudes que no se pueden serializar
+    no se cachean. Se guarda el objeto devuelto por el experto tal cual, de
+    modo que los aciertos comparten ese objeto.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # clave -> (instante de caducidad o ``None``, resultado)
+        self._entries: OrderedDict[str, Tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(name: str, request: Dict[str, Any]) -> Optional[str]:
+        """Clave estable de ``request`` para ``name``; ``None`` si no es serializable."""
+
+        try:
+            payload = json.dumps(
+                [name, request], sort_keys=True, separators=(",", ":"), allow_nan=False
+            )
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Devuelve ``(encontrado, resultado)`` y actualiza las estadísticas."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def count(self, hits: int = 0, misses: int = 0) -> None:
+        """Anota aciertos y fallos resueltos fuera de :meth:`get`."""
+
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def put(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
 
 
 class MetaRouter:
@@ -35,9 +133,32 @@ class MetaRouter:
     tareas, contextos y metas que soporta para que el enrutador seleccione el
     más adecuado. Opcionalmente, el enrutador puede trabajar con una memoria
     estratégica para aprender de resultados pasados.
+
+    Los metadatos se indexan en :meth:`register` (tarea, contexto y meta →
+    expertos, más una lista ordenada por prioridad), de modo que
+    :meth:`route` solo puntúa a los expertos que coinciden con la solicitud o
+    aparecen en la memoria; del resto basta con el de mayor prioridad.
+
+    Los resultados de la memoria se agregan por ``(task, context, goals)`` y
+    experto a medida que se añaden episodios, así que la puntuación no
+    recorre los episodios almacenados. Con ``outcome_half_life`` los éxitos,
+    fallos y latencias se ponderan además por su antigüedad, de modo que un
+    resultado reciente pesa más que uno de hace semanas.
+
+    Los expertos registrados con ``cacheable=True`` se consideran
+    deterministas: su resultado para una misma solicitud se memoriza en un
+    :class:`ResultCache` y los aciertos se registran como episodios con
+    ``"cached": True`` y latencia cero, sin llamar al experto.
     """
 
-    def __init__(self, memory: Optional[StrategicMemory] = None) -> None:
+    def __init__(
+        self,
+        memory: Optional[StrategicMemory] = None,
+        *,
+        cache_size: int = 256,
+        cache_ttl: Optional[float] = None,
+        outcome_half_life: Optional[float] = None,
+    ) -> None:
         """Inicializa el enrutador.
 
         Parameters
@@ -46,15 +167,99 @@ class MetaRouter:
             Instancia de :class:`~gpt_oss.strategic_memory.StrategicMemory` que
             almacenará los episodios generados. Si es ``None`` se omite el
             almacenamiento y la consulta de memoria.
+        cache_size:
+            Número máximo de resultados memorizados de expertos cacheables.
+        cache_ttl:
+            Segundos que un resultado memorizado sigue siendo válido; ``None``
+            para que no caduque.
+        outcome_half_life:
+            Segundos tras los que un episodio pesa la mitad en la puntuación
+            de la memoria. Si es ``None`` todos los episodios pesan igual.
         """
 
         self._experts: Dict[str, Expert] = {}
-        self._memory = memory
+        self._memory: Optional[StrategicMemory] = None
+        # (task, context, goals) -> experto -> [éxitos, fallos, latencia]
+        self._outcomes: Dict[OutcomeKey, Dict[str, List[int]]] = {}
+        self._task_index: Dict[str, Set[str]] = {}
+        self._context_index: Dict[str, Set[str]] = {}
+        self._goal_index: Dict[str, Set[str]] = {}
+        # ``(-priority, name)``: el primero es el de mayor prioridad y, a
+        # igualdad, el primero en orden alfabético
+        self._by_priority: List[Tuple[int, str]] = []
+        self._cache = ResultCache(cache_size, cache_ttl)
+        self._outcome_half_life = outcome_half_life
+        # ((task, context, goals), experto) -> [éxitos, fallos, latencia] con decaimiento
+        self._decayed: Optional[DecayedAggregate] = None
+        if memory is not None:
+            self.set_memory(memory)
 
     def set_memory(self, memory: StrategicMemory) -> None:
-        """Configura la memoria estratégica utilizada por el enrutador."""
+        """Configura la memoria estratégica utilizada por el enrutador.
 
+        Los agregados de resultados se reconstruyen a partir de los episodios
+        ya almacenados y se mantienen al día con los oyentes de la memoria.
+        """
+
+        if self._memory is not None:
+            self._memory.remove_listener(self._on_episode_added)
         self._memory = memory
+        self._outcomes = {}
+        if self._outcome_half_life is not None:
+            self._decayed = DecayedAggregate(self._outcome_half_life)
+        for episode in memory.query({}):
+            self._on_episode_added(episode)
+        memory.add_listener(self._on_episode_added, self._on_episode_removed)
+
+    @staticmethod
+    def _outcome_key(episode: Episode) -> Optional[OutcomeKey]:
+        """Clave con la que :meth:`StrategicMemory.query` encontraría el episodio."""
+
+        metadata = episode.metadata
+        task = metadata.get("task")
+        context = metadata.get("context")
+        goals = metadata.get("goals")
+        if not isinstance(goals, list) or not isinstance(metadata.get("expert"), str):
+            return None
+        key = (task, context, tuple(goals))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _update_outcomes(self, episode: Episode, sign: int) -> None:
+        key = self._outcome_key(episode)
+        if key is None:
+            return
+        metadata = episode.metadata
+        per_expert = self._outcomes.setdefault(key, {})
+        stats = per_expert.setdefault(metadata["expert"], [0, 0, 0])
+        status = metadata.get("status")
+        if status == "success":
+            stats[0] += sign
+        elif status == "failure":
+            stats[1] += sign
+        # misma transformación de la latencia con y sin decaimiento
+        latency = int(metadata.get("latency", 0))
+        stats[2] += sign * latency
+        if self._decayed is not None:
+            self._decayed.add(
+                (key, metadata["expert"]),
+                (status == "success", status == "failure", latency),
+                episode.timestamp.timestamp(),
+                sign,
+            )
+        if sign < 0 and stats == [0, 0, 0]:
+            del per_expert[metadata["expert"]]
+            if not per_expert:
+                del self._outcomes[key]
+
+    def _on_episode_added(self, episode: Episode) -> None:
+        self._update_outcomes(episode, 1)
+
+    def _on_episode_removed(self, episode: Episode) -> None:
+        self._update_outcomes(episode, -1)
 
     def register(
         self,
@@ -65,18 +270,98 @@ class MetaRouter:
         contexts: List[str] | None = None,
         goals: List[str] | None = None,
         priority: int = 0,
+        cacheable: bool = False,
     ) -> None:
-        """Registra un nuevo ``module`` bajo ``name`` con metadatos opcionales."""
+        """Registra un nuevo ``module`` bajo ``name`` con metadatos opcionales.
+
+        Con ``cacheable=True`` los resultados del experto se memorizan por
+        solicitud; solo debe usarse si ``handle`` es determinista y sin
+        efectos secundarios.
+        """
         if name in self._experts:
             raise ValueError(f"El nombre '{name}' ya está registrado")
 
-        self._experts[name] = Expert(
+        expert = Expert(
             module=module,
             tasks=tasks or [],
             contexts=contexts or [],
             goals=goals or [],
             priority=priority,
+            cacheable=cacheable,
         )
+        self._experts[name] = expert
+        for index, keys in (
+            (self._task_index, expert.tasks),
+            (self._context_index, expert.contexts),
+            (self._goal_index, expert.goals),
+        ):
+            for key in keys:
+                try:
+                    index.setdefault(key, set()).add(name)
+                except TypeError:
+                    # no hashable: solo coincide con solicitudes no hashables,
+                    # que se comparan recorriendo los expertos
+                    continue
+        insort(self._by_priority, (-priority, name))
+
+    def _lookup(
+        self, index: Dict[Any, Set[str]], attribute: str, value: Any
+    ) -> Iterable[str]:
+        """Expertos cuyo ``attribute`` contiene ``value``, por el índice si es posible."""
+
+        try:
+            return index.get(value, ())
+        except TypeError:
+            return [
+                name
+                for name, expert in self._experts.items()
+                if value in getattr(expert, attribute)
+            ]
+
+    def _match_scores(
+        self,
+        task: str,
+        context: str,
+        goals: List[str],
+        weight_task: int,
+        weight_context: int,
+        weight_goal: int,
+    ) -> Dict[str, float]:
+        """Puntos por coincidencias y memoria, sin la prioridad.
+
+        Solo incluye a los expertos que coinciden con algún elemento de la
+        solicitud o que aparecen en episodios relevantes; para los demás la
+        contribución es cero.
+        """
+
+        deltas: Dict[str, float] = {}
+        for name in self._lookup(self._task_index, "tasks", task):
+            deltas[name] = deltas.get(name, 0) + weight_task
+        for name in self._lookup(self._context_index, "contexts", context):
+            deltas[name] = deltas.get(name, 0) + weight_context
+        for goal in set(goals):
+            for name in self._lookup(self._goal_index, "goals", goal):
+                deltas[name] = deltas.get(name, 0) + weight_goal
+
+        if self._memory is not None:
+            key = (task, context, tuple(goals))
+            try:
+                outcomes = self._outcomes.get(key, {})
+            except TypeError:
+                # las agregaciones omiten los episodios con claves no hashables
+                outcomes = {}
+            if self._decayed is not None:
+                now = time()
+                for name in outcomes:
+                    decayed = self._decayed.get((key, name), now)
+                    if name in self._experts and decayed is not None:
+                        successes, failures, latency = decayed
+                        deltas[name] = deltas.get(name, 0) + successes - failures - latency
+            else:
+                for name, (successes, failures, latency) in outcomes.items():
+                    if name in self._experts:
+                        deltas[name] = deltas.get(name, 0) + successes - failures - latency
+        return deltas
 
     def select_expert(
         self,
@@ -87,17 +372,18 @@ class MetaRouter:
         weight_task: int = 1,
         weight_context: int = 1,
         weight_goal: int = 1,
-    ) -> Dict[str, int]:
+    ) -> Dict[str, float]:
         """Calcula un puntaje para cada experto registrado.
 
         Asume que ``goals`` es una lista de cadenas previamente validada
         por :meth:`route`.
 
-        Antes de evaluar a cada experto, se consultan los episodios
-        almacenados en memoria que coincidan con los parámetros recibidos.
-        Los resultados previos influyen en el puntaje final de cada experto
+        Antes de evaluar a cada experto, se consultan los resultados
+        agregados de los episodios en memoria que coincidan con los
+        parámetros recibidos. Los resultados previos influyen en el puntaje final de cada experto
         favoreciendo a quienes tuvieron éxito y penalizando a quienes
-        presentaron fallos o alta latencia.
+        presentaron fallos o alta latencia. Si el enrutador se creó con
+        ``outcome_half_life`` cada episodio pondera según su antigüedad.
 
         Parameters
         ----------
@@ -109,36 +395,124 @@ class MetaRouter:
             ``goals`` respectivamente.
         """
 
-        episodes = []
-        if self._memory is not None:
-            pattern = {"task": task, "context": context, "goals": goals}
-            episodes = self._memory.query(pattern)
-
-        scores: Dict[str, int] = {}
-        goals_set = set(goals)
-        for name, expert in self._experts.items():
-            score = expert.priority
-            if task in expert.tasks:
-                score += weight_task
-            if context in expert.contexts:
-                score += weight_context
-            score += weight_goal * len(goals_set.intersection(expert.goals))
-
-            if episodes:
-                relevant = [
-                    ep for ep in episodes if ep.metadata.get("expert") == name
-                ]
-                for ep in relevant:
-                    status = ep.metadata.get("status")
-                    latency = ep.metadata.get("latency", 0)
-                    if status == "success":
-                        score += 1
-                    elif status == "failure":
-                        score -= 1
-                    score -= int(latency)
-
-            scores[name] = score
-        return scores
+        deltas = self._match_scores(
+            task, context, goals, weight_task, weight_context, weight_goal
+        )
+        return {
+            name: expert.priority + deltas.get(name, 0)
+            for name, expert in self._experts.items()
+        }
+
+    def _best_expert(self, deltas: Dict[str, float]) -> Tuple[str, float]:
+        """Experto con mayor puntaje; los empates se resuelven alfabéticamente.
+
+        Fuera de ``deltas`` el puntaje es la prioridad, así que de esos basta
+        con considerar el primero de ``_by_priority``.
+        """
+
+        best: Optional[Tuple[int, str]] = None
+        for name, delta in deltas.items():
+            key = (-(self._experts[name].priority + delta), name)
+            if best is None or key < best:
+                best = key
+        for neg_priority, name in self._by_priority:
+            if name in deltas:
+                continue
+            if best is None or (neg_priority, name) < best:
+                best = (neg_priority, name)
+            break
+        if best is None:
+            raise ValueError("No hay expertos registrados")
+        return best[1], -best[0]
+
+    @staticmethod
+    def _validate(request: Dict[str, Any]) -> Tuple[Any, Any, List[str]]:
+        task = request.get("task")
+        context = request.get("context")
+        goals = request.get("goals")
+        if task is None or context is None or goals is None:
+            raise ValueError(
+                "La solicitud debe incluir 'task', 'context' y 'goals'",
+            )
+        if not isinstance(goals, list) or not all(isinstance(g, str) for g in goals):
+            raise ValueError("La clave 'goals' debe ser una lista de cadenas")
+        return task, context, goals
+
+    def _choose(
+        self,
+        task: Any,
+        context: Any,
+        goals: List[str],
+        weight_task: int,
+        weight_context: int,
+        weight_goal: int,
+    ) -> str:
+        deltas = self._match_scores(
+            task, context, goals, weight_task, weight_context, weight_goal
+        )
+        # Regla de desempate: orden alfabético del nombre del experto.
+        selected_name, max_score = self._best_expert(deltas)
+        if max_score <= 0:
+            raise ValueError("Ningún experto coincide con la solicitud")
+        if not hasattr(self._experts[selected_name].module, "handle"):
+            raise ValueError(f"Experto {selected_name} incompatible")
+        return selected_name
+
+    def _record(
+        self,
+        request: Dict[str, Any],
+        selected_name: str,
+        outcome: Any,
+        status: str,
+        latency: float,
+        cached: bool = False,
+    ) -> None:
+        """Guarda en memoria (si existe) el episodio de una llamada a un experto."""
+
+        if self._memory is None:
+            return
+        metadata = {
+            "task": request["task"],
+            "context": request["context"],
+            # copia: las agregaciones se indexan por estas metas al añadir y al descartar
+            "goals": list(request["goals"]),
+            "expert": selected_name,
+            "status": status,
+            "latency": latency,
+        }
+        if cached:
+            metadata["cached"] = True
+        episode = Episode(
+            timestamp=datetime.now(),
+            input=request,
+            action=selected_name,
+            outcome=outcome,
+            metadata=metadata,
+        )
+        self._memory.add_episode(episode)
+
+    def _cache_lookup(
+        self, name: str, request: Dict[str, Any]
+    ) -> Tuple[Optional[str], bool, Any]:
+        """``(clave, encontrado, resultado)``; la clave es ``None`` si no se cachea."""
+
+        if not self._experts[name].cacheable:
+            return None, False, None
+        key = ResultCache.key(name, request)
+        if key is None:
+            return None, False, None
+        found, value = self._cache.get(key)
+        return key, found, value
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de resultados (tamaño, aciertos, fallos...)."""
+
+        return self._cache.stats()
+
+    def clear_cache(self) -> None:
+        """Descarta los resultados memorizados; las estadísticas se conservan."""
+
+        self._cache.clear()
 
     def route(
         self,
@@ -165,75 +539,209 @@ class MetaRouter:
             coincidencia en la heurística de selección.
         """
 
-        task = request.get("task")
-        context = request.get("context")
-        goals = request.get("goals")
-        if task is None or context is None or goals is None:
-            raise ValueError(
-                "La solicitud debe incluir 'task', 'context' y 'goals'",
-            )
-        if not isinstance(goals, list) or not all(isinstance(g, str) for g in goals):
-            raise ValueError("La clave 'goals' debe ser una lista de cadenas")
-
-        scores = self.select_expert(
-            task,
-            context,
-            goals,
-            weight_task=weight_task,
-            weight_context=weight_context,
-            weight_goal=weight_goal,
+        task, context, goals = self._validate(request)
+        selected_name = self._choose(
+            task, context, goals, weight_task, weight_context, weight_goal
         )
-        if not scores:
-            raise ValueError("No hay expertos registrados")
-
-        max_score = max(scores.values())
-        if max_score <= 0:
-            raise ValueError("Ningún experto coincide con la solicitud")
-
-        candidates = [name for name, score in scores.items() if score == max_score]
-        # Regla de desempate: orden alfabético del nombre del experto.
-        selected_name = sorted(candidates)[0]
+        key, found, result = self._cache_lookup(selected_name, request)
+        if found:
+            self._record(request, selected_name, result, "success", 0.0, cached=True)
+            return result
         expert = self._experts[selected_name].module
-        if not hasattr(expert, "handle"):
-            raise ValueError(f"Experto {selected_name} incompatible")
 
         start = perf_counter()
         try:
             result = expert.handle(request)
         except Exception as exc:  # pragma: no cover - reemisión tras registro
-            if self._memory is not None:
-                episode = Episode(
-                    timestamp=datetime.now(),
-                    input=request,
-                    action=selected_name,
-                    outcome=str(exc),
-                    metadata={
-                        "task": task,
-                        "context": context,
-                        "goals": goals,
-                        "expert": selected_name,
-                        "status": "failure",
-                        "latency": perf_counter() - start,
-                    },
-                )
-                self._memory.add_episode(episode)
+            self._record(request, selected_name, str(exc), "failure", perf_counter() - start)
             raise
 
-        if self._memory is not None:
-            episode = Episode(
-                timestamp=datetime.now(),
-                input=request,
-                action=selected_name,
-                outcome=result,
-                metadata={
-                    "task": task,
-                    "context": context,
-                    "goals": goals,
-                    "expert": selected_name,
-                    "status": "success",
-                    "latency": perf_counter() - start,
-                },
-            )
-            self._memory.add_episode(episode)
+        self._record(request, selected_name, result, "success", perf_counter() - start)
+        if key is not None:
+            self._cache.put(key, result)
+        return result
 
+    async def aroute(
+        self,
+        request: Dict[str, Any],
+        *,
+        weight_task: int = 1,
+        weight_context: int = 1,
+        weight_goal: int = 1,
+    ) -> Any:
+        """Versión asíncrona de :meth:`route`.
+
+        Si el experto define ``async def handle`` se espera directamente; un
+        ``handle`` síncrono se ejecuta en un hilo para no bloquear el bucle de
+        eventos.
+        """
+
+        task, context, goals = self._validate(request)
+        selected_name = self._choose(
+            task, context, goals, weight_task, weight_context, weight_goal
+        )
+        key, found, result = self._cache_lookup(selected_name, request)
+        if found:
+            self._record(request, selected_name, result, "success", 0.0, cached=True)
+            return result
+        handle = self._experts[selected_name].module.handle
+
+        start = perf_counter()
+        try:
+            if inspect.iscoroutinefunction(handle):
+                result = await handle(request)
+            else:
+                result = await asyncio.to_thread(handle, request)
+        except Exception as exc:
+            self._record(request, selected_name, str(exc), "failure", perf_counter() - start)
+            raise
+
+        self._record(request, selected_name, result, "success", perf_counter() - start)
+        if key is not None:
+            self._cache.put(key, result)
         return result
+
+    def route_many(
+        self,
+        requests: List[Dict[str, Any]],
+        *,
+        weight_task: int = 1,
+        weight_context: int = 1,
+        weight_goal: int = 1,
+        max_workers: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """Enruta varias solicitudes y las ejecuta de forma concurrente.
+
+        Todas las solicitudes se validan y puntúan antes de ejecutar ninguna
+        (las que comparten ``task``, ``context`` y ``goals`` se puntúan una
+        sola vez), por lo que un error de selección no deja trabajo a medias.
+        Los episodios de esta tanda no influyen en la selección de las demás
+        solicitudes de la misma tanda.
+
+        Los expertos síncronos se ejecutan en un ``ThreadPoolExecutor`` de
+        ``max_workers`` hilos y los que definen ``async def handle`` se agrupan
+        con ``asyncio.gather`` en un bucle propio. Los episodios se guardan en
+        el orden de ``requests`` una vez terminadas todas las llamadas.
+
+        Para los expertos cacheables, las solicitudes ya memorizadas no se
+        ejecutan y las repetidas dentro de la tanda se ejecutan una sola vez;
+        en ambos casos el episodio se registra como acierto de caché. Si la
+        primera ejecución de una solicitud repetida falla, sus repeticiones
+        cuentan como fallos de caché y se registran como fallidas.
+
+        Parameters
+        ----------
+        requests:
+            Solicitudes con el mismo formato que en :meth:`route`.
+        weight_task, weight_context, weight_goal:
+            Pesos de la heurística de selección, comunes a toda la tanda.
+        max_workers:
+            Hilos para los expertos síncronos; por defecto uno por solicitud
+            (hasta 32).
+        return_exceptions:
+            Si es ``True`` las excepciones de los expertos se devuelven en su
+            posición; si no, se relanza la primera tras registrar la tanda.
+
+        Returns
+        -------
+        list
+            Resultados en el mismo orden que ``requests``.
+        """
+
+        selections: List[str] = []
+        chosen: Dict[Tuple[Any, Any, Tuple[str, ...]], str] = {}
+        for request in requests:
+            task, context, goals = self._validate(request)
+            key = (task, context, tuple(goals))
+            if key not in chosen:
+                chosen[key] = self._choose(
+                    task, context, goals, weight_task, weight_context, weight_goal
+                )
+            selections.append(chosen[key])
+
+        outcomes: List[Tuple[bool, Any, float]] = [(False, None, 0.0)] * len(requests)
+        cached = [False] * len(requests)
+        # clave de caché -> índice que la ejecuta; los repetidos reutilizan su resultado
+        leaders: Dict[str, int] = {}
+        followers: Dict[int, int] = {}
+        pending: List[int] = []
+        for i, (request, name) in enumerate(zip(requests, selections)):
+            key = ResultCache.key(name, request) if self._experts[name].cacheable else None
+            if key is None:
+                pending.append(i)
+            elif key in leaders:
+                followers[i] = leaders[key]
+            else:
+                found, value = self._cache.get(key)
+                if found:
+                    outcomes[i] = (True, value, 0.0)
+                    cached[i] = True
+                else:
+                    leaders[key] = i
+                    pending.append(i)
+
+        handles = {i: self._experts[selections[i]].module.handle for i in pending}
+        is_async = {i: inspect.iscoroutinefunction(handle) for i, handle in handles.items()}
+
+        def run_sync(i: int) -> Tuple[bool, Any, float]:
+            start = perf_counter()
+            try:
+                return True, handles[i](requests[i]), perf_counter() - start
+            except Exception as exc:
+                return False, exc, perf_counter() - start
+
+        async def run_async(i: int) -> Tuple[bool, Any, float]:
+            start = perf_counter()
+            try:
+                return True, await handles[i](requests[i]), perf_counter() - start
+            except Exception as exc:
+                return False, exc, perf_counter() - start
+
+        async def gather_async(indices: List[int]) -> List[Tuple[bool, Any, float]]:
+            return await asyncio.gather(*(run_async(i) for i in indices))
+
+        sync_indices = [i for i in pending if not is_async[i]]
+        async_indices = [i for i in pending if is_async[i]]
+        if pending:
+            workers = max_workers or min(32, len(sync_indices) + bool(async_indices))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # el bucle asíncrono vive en su propio hilo: route_many puede
+                # llamarse también desde código que ya tiene un bucle en marcha
+                async_future = (
+                    pool.submit(asyncio.run, gather_async(async_indices))
+                    if async_indices
+                    else None
+                )
+                futures = [(i, pool.submit(run_sync, i)) for i in sync_indices]
+                for i, future in futures:
+                    outcomes[i] = future.result()
+                if async_future is not None:
+                    for i, outcome in zip(async_indices, async_future.result()):
+                        outcomes[i] = outcome
+
+        for key, i in leaders.items():
+            if outcomes[i][0]:
+                self._cache.put(key, outcomes[i][1])
+        for i, leader in followers.items():
+            ok, value, _ = outcomes[leader]
+            outcomes[i] = (ok, value, 0.0)
+            cached[i] = ok
+        # un repetido solo es un acierto si su líder obtuvo un resultado
+        follower_hits = sum(cached[i] for i in followers)
+        self._cache.count(hits=follower_hits, misses=len(followers) - follower_hits)
+
+        results: List[Any] = []
+        first_error: Optional[BaseException] = None
+        for i, (request, name) in enumerate(zip(requests, selections)):
+            ok, value, latency = outcomes[i]
+            if ok:
+                self._record(request, name, value, "success", latency, cached=cached[i])
+            else:
+                self._record(request, name, str(value), "failure", latency)
+                if first_error is None:
+                    first_error = value
+            results.append(value)
+        if first_error is not None and not return_exceptions:
+            raise first_error
+        return results
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from gpt_oss.responses_api.admission import AdmissionController, AdmissionRejected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_queue_is_served_round_robin_between_clients():
+    async def scenario():
+        admission = AdmissionController(max_active=1)
+        first = await admission.acquire("a")
+        order = []
+
+        async def request(client, tag):
+            ticket = await admission.acquire(client)
+            order.append(tag)
+            admission.release(ticket)
+
+        tasks = [asyncio.create_task(request("a", f"a{i}")) for i in range(3)]
+        tasks.append(asyncio.create_task(request("b", "b0")))
+        tasks.append(asyncio.create_task(request("c", "c0")))
+        await asyncio.sleep(0)
+        assert admission.queued == 5
+        admission.release(first)
+        await asyncio.gather(*tasks)
+        return order, admission
+
+    order, admission = asyncio.run(scenario())
+    assert order == ["a0", "b0", "c0", "a1", "a2"]
+    assert admission.stats()["active"] == 0
+    assert admission.stats()["queued"] == 0
+
+
+def test_rejects_when_queue_full_or_client_over_limit():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queued=1, max_per_client=2)
+        await admission.acquire("a")
+        waiter = asyncio.create_task(admission.acquire("a"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as client_exc:
+            await admission.acquire("a")
+        with pytest.raises(AdmissionRejected) as queue_exc:
+            await admission.acquire("b")
+        waiter.cancel()
+        return admission, client_exc.value, queue_exc.value
+
+    admission, client_exc, queue_exc = asyncio.run(scenario())
+    assert client_exc.reason == "client_limit"
+    assert queue_exc.reason == "queue_full"
+    assert queue_exc.retry_after >= 1
+    assert admission.stats()["rejected_total"] == {"client_limit": 1, "queue_full": 1}
+
+
+def test_token_budget_limits_active_cost():
+    async def scenario():
+        admission = AdmissionController(token_budget=100)
+        big = await admission.acquire("a", 80)
+        small = await admission.acquire("b", 20)
+        pending = asyncio.create_task(admission.acquire("c", 10))
+        await asyncio.sleep(0)
+        assert not pending.done()
+        admission.release(small)
+        third = await pending
+        admission.release(big)
+        admission.release(third)
+        # una solicitud mayor que todo el presupuesto pasa si no hay nada activo
+        huge = await admission.acquire("d", 500)
+        return admission, huge
+
+    admission, huge = asyncio.run(scenario())
+    assert admission.active_tokens == 500
+    admission.release(huge)
+    admission.release(huge)
+    assert admission.active == 0 and admission.active_tokens == 0
+
+
+def test_queue_timeout_and_cancellation_free_their_place():
+    async def scenario():
+        admission = AdmissionController(max_active=1, queue_timeout_s=0.01)
+        busy = await admission.acquire("a")
+        with pytest.raises(AdmissionRejected) as exc:
+            await admission.acquire("b")
+        cancelled = asyncio.create_task(admission.acquire("c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert admission.queued == 0
+        admission.release(busy)
+        ticket = await admission.acquire("d")
+        return admission, exc.value, ticket
+
+    admission, exc, ticket = asyncio.run(scenario())
+    assert exc.reason == "queue_timeout"
+    assert admission.active == 1
+    assert admission._inflight_by_client == {"d": 1}
+
+
+def test_wait_time_metrics():
+    clock = FakeClock()
+
+    async def scenario():
+        admission = AdmissionController(max_active=1, clock=clock)
+        busy = await admission.acquire("a")
+        waiter = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        clock.now = 2.0
+        admission.release(busy)
+        await waiter
+        return admission
+
+    stats = asyncio.run(scenario()).stats()
+    assert stats["admitted_total"] == 2
+    assert stats["wait_time_max_s"] == 2.0
+    assert stats["wait_time_avg_s"] == 1.0
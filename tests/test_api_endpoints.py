@@ -175,6 +175,171 @@ class TestToolIntegration:
         response = api_client.post("/v1/responses", json=sample_request_data)
         assert response.status_code == status.HTTP_200_OK
 
+    @staticmethod
+    def _browser_app(harmony_encoding, backend, tool_executor):
+        from gpt_oss.responses_api.api_server import create_api_server
+
+        call = harmony_encoding.encode(
+            '<|channel|>analysis to=browser.search <|constrain|>json<|message|>{"query": "gatos"}<|call|>',
+            allowed_special="all",
+        )
+        final = harmony_encoding.encode(
+            "<|start|>assistant<|channel|>final<|message|>listo<|return|>",
+            allowed_special="all",
+        )
+        state = {"script": call, "i": 0}
+
+        def infer(tokens, temperature=0.0, new_request=False):
+            if new_request:
+                # tras completar la llamada a la herramienta el modelo responde
+                finished_call = state["script"] is call and state["i"] == len(call)
+                state["script"] = final if finished_call else call
+                state["i"] = 0
+            tok = state["script"][state["i"]]
+            state["i"] += 1
+            return tok
+
+        return create_api_server(
+            infer, harmony_encoding, browser_backend=backend, tool_executor=tool_executor
+        )
+
+    def test_browser_tool_runs_in_executor_with_shared_backend(self, harmony_encoding, sample_request_data):
+        import threading
+        from fastapi.testclient import TestClient
+        from gpt_oss.responses_api.tool_executor import ToolExecutor
+        from gpt_oss.tools.simple_browser.page_contents import PageContents
+
+        class FakeBackend:
+            source = "web"
+
+            def __init__(self):
+                self.searches = []
+
+            async def search(self, query, topn, session):
+                self.searches.append((query, threading.current_thread().name))
+                return PageContents(url="", text=f"resultado para {query}", title=query, urls={})
+
+            async def fetch(self, url, session):
+                return PageContents(url=url, text="", title=url, urls={})
+
+        backend = FakeBackend()
+        executor = ToolExecutor(max_workers=1)
+        app = self._browser_app(harmony_encoding, backend, executor)
+        sample_request_data["tools"] = [{"type": "browser_search"}]
+        with TestClient(app) as client:
+            for _ in range(2):
+                response = client.post("/v1/responses", json=sample_request_data)
+                assert response.status_code == status.HTTP_200_OK
+                output = response.json()["output"]
+                assert output[0]["type"] == "web_search_call"
+                assert output[0]["action"] == {"type": "search", "query": "gatos"}
+                assert "resultado para gatos" in output[1]["content"][0]["text"]
+                assert output[-1]["content"][0]["text"] == "listo"
+        executor.shutdown()
+        assert [name for _, name in backend.searches] == ["tool-executor-0"] * 2
+
+    def test_browser_tool_timeout_is_reported_to_model(self, harmony_encoding, sample_request_data):
+        import asyncio as _asyncio
+        from fastapi.testclient import TestClient
+        from gpt_oss.responses_api.tool_executor import ToolExecutor
+
+        class SlowBackend:
+            source = "web"
+
+            def __init__(self):
+                self.searches = []
+
+            async def search(self, query, topn, session):
+                self.searches.append(query)
+                await _asyncio.sleep(10)
+
+            async def fetch(self, url, session):
+                return PageContents(url=url, text="", title=url, urls={})
+
+        executor = ToolExecutor(max_workers=1, timeout_s=0.05)
+        app = self._browser_app(harmony_encoding, SlowBackend(), executor)
+        sample_request_data["tools"] = [{"type": "browser_search"}]
+        with TestClient(app) as client:
+            response = client.post("/v1/responses", json=sample_request_data)
+        executor.shutdown()
+        assert response.status_code == status.HTTP_200_OK
+        output = response.json()["output"]
+        assert "timed out" in output[1]["content"][0]["text"]
+        assert output[-1]["content"][0]["text"] == "listo"
+
+    def test_long_tool_output_is_ingested_without_printing(
+        self, harmony_encoding, sample_request_data, performance_timer, capsys
+    ):
+        from fastapi.testclient import TestClient
+        from gpt_oss.responses_api.tool_executor import ToolExecutor
+        from gpt_oss.tools.simple_browser.page_contents import PageContents
+
+        page_text = "\n".join(f"línea {i} de una página larga" for i in range(2000))
+
+        class LongPageBackend:
+            source = "web"
+            searches = []
+
+            async def search(self, query, topn, session):
+                self.searches.append(query)
+                return PageContents(url="", text=page_text, title=query, urls={})
+
+            async def fetch(self, url, session):
+                return PageContents(url=url, text="", title=url, urls={})
+
+        executor = ToolExecutor(max_workers=1)
+        app = self._browser_app(harmony_encoding, LongPageBackend(), executor)
+        sample_request_data["tools"] = [{"type": "browser_search"}]
+        with TestClient(app) as client:
+            performance_timer.start()
+            response = client.post("/v1/responses", json=sample_request_data)
+            elapsed = performance_timer.stop()
+        executor.shutdown()
+
+        assert response.status_code == status.HTTP_200_OK
+        output = response.json()["output"]
+        assert "línea 0 de una página larga" in output[1]["content"][0]["text"]
+        assert output[-1]["content"][0]["text"] == "listo"
+        assert "página larga" not in capsys.readouterr().out
+        assert elapsed < 5.0
+
+
+class TestFinalResponseAssembly:
+
+    @pytest.fixture
+    def parse_calls(self, harmony_encoding, monkeypatch):
+        calls = []
+        original = harmony_encoding.parse_messages_from_completion_tokens
+
+        def counting_parse(tokens, role, *args, **kwargs):
+            calls.append(len(tokens))
+            return original(tokens, role, *args, **kwargs)
+
+        monkeypatch.setattr(
+            harmony_encoding, "parse_messages_from_completion_tokens", counting_parse
+        )
+        return calls
+
+    def test_complete_output_reuses_streamed_messages(self, api_client, sample_request_data, parse_calls):
+        response = api_client.post("/v1/responses", json=sample_request_data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["output"][0]["content"][0]["text"] == "Test response"
+        assert parse_calls == []
+
+    def test_truncated_output_falls_back_to_full_parse(self, api_client, sample_request_data, parse_calls):
+        sample_request_data["max_output_tokens"] = 5
+        response = api_client.post("/v1/responses", json=sample_request_data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["usage"]["output_tokens"] == 5
+        assert parse_calls == [5]
+
+    def test_debug_mode_falls_back_to_full_parse(self, api_client, sample_request_data, parse_calls):
+        sample_request_data["metadata"] = {"__debug": True}
+        response = api_client.post("/v1/responses", json=sample_request_data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["output"][0]["content"][0]["text"] == "Test response"
+        assert len(parse_calls) == 1
+
 
 class TestPerformance:
     
@@ -227,4 +392,59 @@ class TestUsageTracking:
         usage2 = response2.json()["usage"]
         
         # Longer input should use more tokens
-        assert usage2["input_tokens"] > usage1["input_tokens"]
\ No newline at end of file
+        assert usage2["input_tokens"] > usage1["input_tokens"]
+
+class TestAdmissionControl:
+
+    def test_saturated_server_returns_429(self, harmony_encoding, mock_infer_token, sample_request_data):
+        from fastapi.testclient import TestClient
+        from gpt_oss.responses_api.admission import AdmissionController
+        from gpt_oss.responses_api.api_server import create_api_server
+
+        admission = AdmissionController(max_active=1, max_queued=0)
+        app = create_api_server(mock_infer_token, harmony_encoding, admission=admission)
+        busy = asyncio.run(admission.acquire("other-client"))
+
+        with TestClient(app) as client:
+            response = client.post("/v1/responses", json=sample_request_data)
+            assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+            assert int(response.headers["Retry-After"]) >= 1
+            assert response.json()["error"]["code"] == "queue_full"
+
+            admission.release(busy)
+            response = client.post("/v1/responses", json=sample_request_data)
+            assert response.status_code == status.HTTP_200_OK
+
+            sample_request_data["stream"] = True
+            response = client.post("/v1/responses", json=sample_request_data)
+            assert response.status_code == status.HTTP_200_OK
+
+        stats = admission.stats()
+        assert stats["active"] == 0
+        assert stats["admitted_total"] == 3
+        assert stats["rejected_total"] == {"queue_full": 1}
+
+
+class TestMetricsEndpoint:
+
+    def test_metrics_after_request(self, api_client, sample_request_data):
+        response = api_client.post("/v1/responses", json=sample_request_data)
+        assert response.status_code == status.HTTP_200_OK
+        api_client.post("/v1/responses", json=sample_request_data)
+
+        metrics = api_client.get("/metrics")
+        assert metrics.status_code == status.HTTP_200_OK
+        assert metrics.headers["content-type"].startswith("text/plain")
+        text = metrics.text
+        assert 'gpt_oss_requests_total{stream="false"} 2' in text
+        assert "gpt_oss_time_to_first_token_seconds_count 2" in text
+        assert "gpt_oss_active_generations 0" in text
+        assert "gpt_oss_prefix_cache_hits_total 1" in text
+
+    def test_metrics_can_be_disabled(self, harmony_encoding, mock_infer_token):
+        from fastapi.testclient import TestClient
+        from gpt_oss.responses_api.api_server import create_api_server
+
+        app = create_api_server(mock_infer_token, harmony_encoding, enable_metrics=False)
+        with TestClient(app) as client:
+            assert client.get("/metrics").status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,49 @@
+from gpt_oss.responses_api.detokenizer import IncrementalDetokenizer
+
+
+class ByteEncoding:
+    """Codificación mínima en la que cada token es un byte UTF-8."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode_bytes(self, tokens):
+        self.calls += 1
+        return bytes(tokens)
+
+
+def test_push_holds_partial_utf8_sequences():
+    encoding = ByteEncoding()
+    detok = IncrementalDetokenizer(encoding)
+    tokens = encoding.encode("año €")
+    deltas = [detok.push(t) for t in tokens]
+    assert "".join(deltas) == "año €"
+    # "ñ" ocupa dos bytes: el primero no produce texto hasta recibir el segundo
+    assert deltas[1] == ""
+    assert deltas[2] == "ñ"
+
+
+def test_extend_matches_push():
+    encoding = ByteEncoding()
+    text = "naïve café – ok"
+    tokens = encoding.encode(text)
+    detok = IncrementalDetokenizer(encoding)
+    assert detok.extend(tokens[:5]) + detok.extend(tokens[5:]) == text
+
+
+def test_flush_replaces_incomplete_bytes():
+    encoding = ByteEncoding()
+    detok = IncrementalDetokenizer(encoding)
+    assert detok.push("€".encode("utf-8")[0]) == ""
+    assert detok.flush() == "�"
+
+
+def test_token_bytes_are_memoized():
+    encoding = ByteEncoding()
+    detok = IncrementalDetokenizer(encoding)
+    for _ in range(8000):
+        detok.push(ord("a"))
+    assert encoding.calls == 1
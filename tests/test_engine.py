@@ -0,0 +1,102 @@
+import os
+import threading
+
+import pytest
+
+from gpt_oss.responses_api.engine import EngineClient, serve_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    calls = []
+
+    def infer(tokens, temperature=0.0, new_request=False):
+        if tokens and tokens[-1] < 0:
+            raise ValueError("bad token")
+        calls.append((list(tokens), temperature, new_request))
+        return len(tokens)
+
+    address = str(tmp_path / "engine.sock")
+    authkey = os.urandom(16)
+    ready = threading.Event()
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=serve_engine, args=(infer, address, authkey, ready.set, stop), daemon=True
+    )
+    thread.start()
+    assert ready.wait(5)
+    yield address, authkey, calls
+    stop.set()
+
+
+def test_client_sends_only_new_tokens(engine, monkeypatch):
+    address, authkey, calls = engine
+    client = EngineClient(address, authkey)
+    sent = []
+    original_send = client._conn.send
+    monkeypatch.setattr(client._conn, "send", lambda msg: (sent.append(msg), original_send(msg)))
+
+    tokens = [1, 2, 3]
+    assert client(tokens, temperature=0.5, new_request=True) == 3
+    for tok in (4, 5):
+        tokens.append(tok)
+        assert client(tokens) == len(tokens)
+
+    assert [msg[0] for msg in sent] == ["reset", "extend", "extend"]
+    assert sent[2][2] == [5]
+    assert calls == [
+        ([1, 2, 3], 0.5, True),
+        ([1, 2, 3, 4], 0.0, False),
+        ([1, 2, 3, 4, 5], 0.0, False),
+    ]
+
+
+def test_interleaved_streams_send_only_new_tokens(engine, monkeypatch):
+    address, authkey, calls = engine
+    client = EngineClient(address, authkey, max_streams=2)
+    sent = []
+    original_send = client._conn.send
+    monkeypatch.setattr(client._conn, "send", lambda msg: (sent.append(msg), original_send(msg)))
+
+    a, b = [1, 2, 3], [7, 8]
+    client(a, new_request=True)
+    client(b, new_request=True)
+    for tok in (4, 5):
+        a.append(tok)
+        b.append(tok)
+        client(a)
+        client(b)
+
+    assert [msg[0] for msg in sent] == ["reset", "reset"] + ["extend"] * 4
+    assert [c[0] for c in calls[-2:]] == [[1, 2, 3, 4, 5], [7, 8, 4, 5]]
+
+    # un tercer stream reutiliza la ranura menos reciente
+    client([9])
+    client(b + [6])
+    client(a + [6])
+    assert [msg[:2] for msg in sent[-3:]] == [("reset", 0), ("extend", 1), ("reset", 0)]
+    assert calls[-1][0] == [1, 2, 3, 4, 5, 6]
+
+
+def test_diverging_context_is_resent(engine):
+    address, authkey, calls = engine
+    client = EngineClient(address, authkey)
+    client([1, 2, 3])
+    client([1, 9])
+    client([7, 8, 9, 10])
+    assert [c[0] for c in calls] == [[1, 2, 3], [1, 9], [7, 8, 9, 10]]
+
+
+def test_engine_errors_are_raised_in_client(engine):
+    address, authkey, _ = engine
+    client = EngineClient(address, authkey)
+    with pytest.raises(RuntimeError, match="bad token"):
+        client([1, -1])
+    assert client([1, 2]) == 2
+
+
+def test_wrong_authkey_is_rejected_without_stopping_engine(engine):
+    address, authkey, _ = engine
+    with pytest.raises(Exception):
+        EngineClient(address, b"wrong")
+    assert EngineClient(address, authkey)([1]) == 1
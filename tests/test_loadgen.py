@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+
+from gpt_oss.responses_api.loadgen import load_requests, percentile, replay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_load_requests_accepts_bodies_and_backlog_lines(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    path.write_text(
+        json.dumps({"input": "hola", "max_output_tokens": 10})
+        + "\n\n"
+        + json.dumps({"request_id": "r1", "title": "t", "body": "texto"})
+        + "\n"
+    )
+    assert load_requests(str(path)) == [
+        {"input": "hola", "max_output_tokens": 10, "stream": True},
+        {"input": "texto", "stream": True},
+    ]
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_replay_reports_latency_percentiles():
+    clock = FakeClock()
+    sent = []
+
+    async def fake_sleep(delay):
+        clock.now += delay
+
+    def send(body):
+        async def events():
+            sent.append((clock.now, body["input"]))
+            if body["input"] == "limit":
+                yield "error", {"error": {"code": "http_429"}}
+                return
+            yield "response.created", {}
+            clock.now += 0.2
+            for _ in range(3):
+                yield "response.output_text.delta", {}
+                clock.now += 0.05
+            yield "response.completed", {"response": {"usage": {"output_tokens": 3}}}
+
+        return events()
+
+    bodies = [{"input": "a"}, {"input": "b"}, {"input": "limit"}]
+    summary = asyncio.run(
+        replay(send, bodies, qps=2.0, num_requests=4, arrival="uniform", sleep=fake_sleep, clock=clock)
+    )
+
+    assert [text for _, text in sent] == ["a", "b", "limit", "a"]
+    assert summary["requests"] == 4
+    assert summary["completed"] == 3
+    assert summary["errors"] == {"http_429": 1}
+    assert summary["ttft_s"]["p50"] == pytest.approx(0.2)
+    assert summary["itl_s"]["p99"] == pytest.approx(0.05)
+    assert summary["output_tokens_per_s"] == pytest.approx(9 / summary["wall_time_s"])
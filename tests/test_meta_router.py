@@ -236,3 +236,432 @@ def test_scores_update_with_episode_history():
     router.route({"task": "t", "context": "c", "goals": ["g"]})
     assert good.received is not None
     assert bad.received is None
+
+
+def _reference_selection(router, task, context, goals):
+    """Selección original: puntúa a todos los expertos y desempata por nombre."""
+    scores = {}
+    for name, expert in router._experts.items():
+        score = expert.priority
+        score += task in expert.tasks
+        score += context in expert.contexts
+        score += len(set(goals).intersection(expert.goals))
+        scores[name] = score
+    best = max(scores.values())
+    return sorted(n for n, s in scores.items() if s == best)[0], best
+
+
+def test_indexed_selection_matches_full_scan():
+    import random
+
+    rng = random.Random(0)
+    router = MetaRouter()
+    vocab = [f"k{i}" for i in range(12)]
+    names = [f"e{i:03d}" for i in range(300)]
+    rng.shuffle(names)
+    for name in names:
+        router.register(
+            name,
+            DummyModule(),
+            tasks=rng.sample(vocab, rng.randint(0, 2)),
+            contexts=rng.sample(vocab, rng.randint(0, 2)),
+            goals=rng.sample(vocab, rng.randint(0, 3)),
+            priority=rng.choice([0, 0, 0, 1, 2]),
+        )
+    for _ in range(200):
+        task, context = rng.choice(vocab + ["none"]), rng.choice(vocab + ["none"])
+        goals = rng.sample(vocab, rng.randint(0, 3))
+        deltas = router._match_scores(task, context, goals, 1, 1, 1)
+        assert router._best_expert(deltas) == _reference_selection(
+            router, task, context, goals
+        )
+        scores = router.select_expert(task, context, goals)
+        assert max(scores.values()) == _reference_selection(router, task, context, goals)[1]
+
+
+def test_unhashable_request_values_fall_back_to_linear_match():
+    router = MetaRouter(StrategicMemory())
+    spec = {"kind": "sql", "dialect": ["pg"]}
+    router.register("spec", DummyModule(), tasks=[spec], contexts=["db"], goals=["q"])
+    router.register("plain", DummyModule(), tasks=["sql"], contexts=[["db"]], goals=["q"])
+
+    request = {"task": dict(spec, dialect=["pg"]), "context": "db", "goals": ["q"]}
+    assert router.route(request) == "ok"
+    assert router.route(dict(request)) == "ok"
+    assert router._experts["spec"].module.received["task"] == spec
+    assert router._experts["plain"].module.received is None
+
+    scores = router.select_expert("sql", ["db"], ["q"])
+    assert scores["plain"] > scores["spec"]
+
+
+def test_priority_fallback_when_nothing_matches():
+    router = MetaRouter()
+    low, high_b, high_a = DummyModule(), DummyModule(), DummyModule()
+    router.register("low", low, tasks=["t"], priority=0)
+    router.register("zeta", high_b, priority=2)
+    router.register("alfa", high_a, priority=2)
+    assert router.route({"task": "otra", "context": "c", "goals": []}) == "ok"
+    assert high_a.received is not None
+    assert high_b.received is None and low.received is None
+
+
+def _episode(expert, status, latency=0, goals=("g",)):
+    return Episode(
+        timestamp=datetime.now(),
+        input={},
+        action=expert,
+        outcome="",
+        metadata={
+            "task": "t",
+            "context": "c",
+            "goals": list(goals),
+            "expert": expert,
+            "status": status,
+            "latency": latency,
+        },
+    )
+
+
+def _scores_from_query(router, memory, task, context, goals):
+    """Puntuación original: recorre los episodios devueltos por ``query``."""
+    scores = {}
+    episodes = memory.query({"task": task, "context": context, "goals": goals})
+    for name, expert in router._experts.items():
+        score = expert.priority + (task in expert.tasks) + (context in expert.contexts)
+        score += len(set(goals).intersection(expert.goals))
+        for ep in episodes:
+            if ep.metadata.get("expert") != name:
+                continue
+            status = ep.metadata.get("status")
+            score += 1 if status == "success" else -1 if status == "failure" else 0
+            score -= int(ep.metadata.get("latency", 0))
+        scores[name] = score
+    return scores
+
+
+def test_outcome_aggregates_follow_memory_eviction():
+    import random
+
+    rng = random.Random(1)
+    memory = StrategicMemory(max_episodes=25)
+    router = MetaRouter(memory=memory)
+    for name in ("a", "b", "c"):
+        router.register(name, DummyModule(), tasks=["t"], contexts=["c"], goals=["g"])
+    for _ in range(200):
+        memory.add_episode(
+            _episode(
+                rng.choice("abcz"),
+                rng.choice(["success", "failure", "other"]),
+                latency=rng.choice([0, 0.5, 1.7, 3]),
+                goals=rng.choice([("g",), ("g", "h"), ()]),
+            )
+        )
+        for goals in (["g"], ["g", "h"], []):
+            assert router.select_expert("t", "c", goals) == _scores_from_query(
+                router, memory, "t", "c", goals
+            )
+
+
+def test_mutating_request_goals_does_not_corrupt_aggregates():
+    memory = StrategicMemory(max_episodes=1)
+    router = MetaRouter(memory=memory)
+    router.register("a", DummyModule(), tasks=["t"], contexts=["c"], goals=["g"])
+    goals = ["g"]
+    router.route({"task": "t", "context": "c", "goals": goals})
+    goals.append("h")
+    router.route({"task": "t", "context": "c", "goals": ["x"]})
+
+    assert memory.query({})[0].metadata["goals"] == ["x"]
+    assert router._outcomes == {("t", "c", ("x",)): {"a": [1, 0, 0]}}
+
+
+def test_set_memory_rebuilds_outcomes_and_detaches_previous():
+    old = StrategicMemory()
+    router = MetaRouter(memory=old)
+    router.register("a", DummyModule(), tasks=["t"], contexts=["c"], goals=["g"])
+
+    new = StrategicMemory()
+    for _ in range(3):
+        new.add_episode(_episode("a", "failure"))
+    router.set_memory(new)
+    assert router.select_expert("t", "c", ["g"]) == {"a": 0}
+
+    old.add_episode(_episode("a", "success"))
+    new.add_episode(_episode("a", "success"))
+    assert router.select_expert("t", "c", ["g"]) == {"a": 1}
+
+
+class SlowModule:
+    def __init__(self, name, delay=0.1):
+        self.name = name
+        self.delay = delay
+
+    def handle(self, request):
+        import time
+
+        time.sleep(self.delay)
+        if request.get("fail"):
+            raise RuntimeError("fallo")
+        return (self.name, request["payload"])
+
+
+class AsyncModule:
+    def __init__(self, delay=0.1):
+        self.delay = delay
+
+    async def handle(self, request):
+        import asyncio
+
+        await asyncio.sleep(self.delay)
+        return ("async", request["payload"])
+
+
+def _mixed_router(memory=None):
+    router = MetaRouter(memory=memory)
+    router.register("sync", SlowModule("sync"), tasks=["s"], contexts=["c"], goals=[])
+    router.register("async", AsyncModule(), tasks=["a"], contexts=["c"], goals=[])
+    return router
+
+
+def test_route_many_runs_sync_and_async_experts_concurrently():
+    import time
+
+    memory = StrategicMemory()
+    router = _mixed_router(memory)
+    requests = [
+        {"task": task, "context": "c", "goals": [], "payload": i}
+        for i, task in enumerate(["s", "a", "s", "a", "s", "a"])
+    ]
+
+    start = time.perf_counter()
+    results = router.route_many(requests)
+    elapsed = time.perf_counter() - start
+
+    assert results == [
+        ("sync", 0), ("async", 1), ("sync", 2), ("async", 3), ("sync", 4), ("async", 5)
+    ]
+    # seis llamadas de 0,1 s en serie tardarían 0,6 s
+    assert elapsed < 0.35
+    episodes = memory.query({})
+    assert [ep.input["payload"] for ep in episodes] == list(range(6))
+    assert all(ep.metadata["status"] == "success" for ep in episodes)
+
+
+def test_route_many_records_failures_and_raises_first():
+    memory = StrategicMemory()
+    router = _mixed_router(memory)
+    requests = [
+        {"task": "s", "context": "c", "goals": [], "payload": 0, "fail": True},
+        {"task": "a", "context": "c", "goals": [], "payload": 1},
+    ]
+    with pytest.raises(RuntimeError):
+        router.route_many(requests)
+    statuses = [ep.metadata["status"] for ep in memory.query({})]
+    assert statuses == ["failure", "success"]
+
+    # sin memoria: el fallo anterior no cambia la selección
+    results = _mixed_router().route_many(requests, return_exceptions=True)
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == ("async", 1)
+
+
+def test_route_many_validates_before_dispatching():
+    router = _mixed_router()
+    module = router._experts["sync"].module
+    calls = []
+    module.handle = lambda request: calls.append(request)
+    with pytest.raises(ValueError):
+        router.route_many(
+            [
+                {"task": "s", "context": "c", "goals": []},
+                {"task": "nada", "context": "x", "goals": []},
+            ]
+        )
+    assert calls == []
+
+
+def test_aroute_awaits_async_and_offloads_sync_experts():
+    import asyncio
+
+    memory = StrategicMemory()
+    router = _mixed_router(memory)
+
+    async def main():
+        return await asyncio.gather(
+            router.aroute({"task": "a", "context": "c", "goals": [], "payload": 1}),
+            router.aroute({"task": "s", "context": "c", "goals": [], "payload": 2}),
+        )
+
+    assert asyncio.run(main()) == [("async", 1), ("sync", 2)]
+    assert {ep.metadata["expert"] for ep in memory.query({})} == {"async", "sync"}
+
+
+class CountingModule:
+    def __init__(self):
+        self.calls = 0
+
+    def handle(self, request):
+        self.calls += 1
+        if request.get("fail"):
+            raise RuntimeError("fallo")
+        return {"echo": request.get("payload")}
+
+
+def test_cacheable_expert_result_is_memoized():
+    memory = StrategicMemory()
+    router = MetaRouter(memory)
+    counting = CountingModule()
+    router.register("det", counting, tasks=["t"], contexts=["c"], cacheable=True)
+
+    first = router.route({"task": "t", "context": "c", "goals": [], "payload": {"a": 1, "b": 2}})
+    # mismo contenido con otro orden de claves: misma entrada de caché
+    second = router.route({"payload": {"b": 2, "a": 1}, "goals": [], "context": "c", "task": "t"})
+    router.route({"task": "t", "context": "c", "goals": [], "payload": 3})
+
+    assert second is first
+    assert counting.calls == 2
+    stats = router.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+    episodes = memory.query({})
+    assert [ep.metadata.get("cached", False) for ep in episodes] == [False, True, False]
+    assert episodes[1].metadata["latency"] == 0.0
+    assert episodes[1].metadata["status"] == "success"
+
+
+def test_non_cacheable_and_unserializable_requests_are_not_cached():
+    router = MetaRouter()
+    plain = CountingModule()
+    router.register("plain", plain, tasks=["t"])
+    for _ in range(2):
+        router.route({"task": "t", "context": "c", "goals": [], "payload": 1})
+    assert plain.calls == 2
+
+    router = MetaRouter()
+    det = CountingModule()
+    router.register("det", det, tasks=["t"], cacheable=True)
+    for _ in range(2):
+        router.route({"task": "t", "context": "c", "goals": [], "payload": object()})
+    assert det.calls == 2
+    assert router.cache_stats()["misses"] == 0
+
+
+def test_cache_size_limit_and_ttl(monkeypatch):
+    import meta_router
+
+    now = [0.0]
+    monkeypatch.setattr(meta_router, "monotonic", lambda: now[0])
+    router = MetaRouter(cache_size=2, cache_ttl=10.0)
+    det = CountingModule()
+    router.register("det", det, tasks=["t"], cacheable=True)
+
+    def call(payload):
+        return router.route({"task": "t", "context": "c", "goals": [], "payload": payload})
+
+    call(1)
+    call(2)
+    call(1)
+    call(3)  # desaloja 2, el menos usado
+    call(2)
+    assert det.calls == 4
+    assert router.cache_stats()["evictions"] == 2
+
+    now[0] = 11.0
+    call(2)
+    assert det.calls == 5
+    assert router.cache_stats()["expirations"] == 1
+
+
+def test_failures_are_not_cached():
+    router = MetaRouter()
+    failing = CountingModule()
+    router.register("fail", failing, tasks=["t"], cacheable=True)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            router.route({"task": "t", "context": "c", "goals": [], "fail": True})
+    assert failing.calls == 2
+    assert router.cache_stats()["size"] == 0
+
+
+def test_route_many_runs_repeated_cacheable_requests_once():
+    memory = StrategicMemory()
+    router = MetaRouter(memory)
+    det = CountingModule()
+    router.register("det", det, tasks=["t"], cacheable=True)
+    router.route({"task": "t", "context": "c", "goals": [], "payload": 0})
+
+    requests = [{"task": "t", "context": "c", "goals": [], "payload": p} for p in (0, 1, 1, 2)]
+    results = router.route_many(requests)
+
+    assert results == [{"echo": 0}, {"echo": 1}, {"echo": 1}, {"echo": 2}]
+    assert det.calls == 3
+    cached = [ep.metadata.get("cached", False) for ep in memory.query({})[1:]]
+    assert cached == [True, False, True, False]
+    stats = router.cache_stats()
+    assert (stats["hits"], stats["size"]) == (2, 3)
+
+
+def test_followers_of_failed_leader_are_not_cache_hits():
+    router = MetaRouter(StrategicMemory())
+    router.register("det", CountingModule(), tasks=["t"], cacheable=True)
+    request = {"task": "t", "context": "c", "goals": [], "fail": True}
+
+    results = router.route_many([request, dict(request), dict(request)], return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    stats = router.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (0, 3, 0)
+
+
+def test_outcome_half_life_favors_recent_results():
+    from datetime import timedelta
+
+    memory = StrategicMemory()
+    ahora = datetime.now()
+    for experto, dias, veces in (("veterano", 60, 5), ("reciente", 0, 2)):
+        for _ in range(veces):
+            memory.add_episode(
+                Episode(
+                    timestamp=ahora - timedelta(days=dias),
+                    input={},
+                    action=experto,
+                    outcome="ok",
+                    metadata={
+                        "task": "t",
+                        "context": "c",
+                        "goals": [],
+                        "expert": experto,
+                        "status": "success",
+                        "latency": 0.0,
+                    },
+                )
+            )
+
+    def puntos(router):
+        router.register("veterano", DummyModule(), tasks=["t"])
+        router.register("reciente", DummyModule(), tasks=["t"])
+        return router.select_expert("t", "c", [])
+
+    sin_decaimiento = puntos(MetaRouter(memory))
+    assert sin_decaimiento["veterano"] > sin_decaimiento["reciente"]
+    con_decaimiento = puntos(MetaRouter(memory, outcome_half_life=24 * 3600))
+    assert con_decaimiento["reciente"] > con_decaimiento["veterano"]
+    assert con_decaimiento["veterano"] == pytest.approx(1.0, abs=1e-6)
+    assert con_decaimiento["reciente"] == pytest.approx(3.0, abs=1e-3)
+
+
+def test_long_half_life_matches_undecayed_scores():
+    memory = StrategicMemory()
+    for status, latency in (("success", 0.4), ("success", 2.5), ("failure", 0.9)):
+        memory.add_episode(_episode("a", status, latency=latency))
+    memory.add_episode(_episode("b", "success", latency=1.2))
+
+    def puntos(router):
+        router.register("a", DummyModule(), tasks=["t"], contexts=["c"], goals=["g"])
+        router.register("b", DummyModule(), tasks=["t"], contexts=["c"], goals=["g"])
+        return router.select_expert("t", "c", ["g"])
+
+    sin_decaimiento = puntos(MetaRouter(memory))
+    con_decaimiento = puntos(MetaRouter(memory, outcome_half_life=1e12))
+    assert con_decaimiento == pytest.approx(sin_decaimiento)
+
@@ -0,0 +1,62 @@
+from gpt_oss.responses_api.metrics import Counter, Histogram, ServerMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latencia", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "browser.search")
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP latency_seconds Latencia", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{tool="browser.search",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{tool="browser.search",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{tool="browser.search",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{tool="browser.search"} 3.65' in lines
+    assert 'latency_seconds_count{tool="browser.search"} 4' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errores", ("reason",))
+    counter.inc(2, 'a "b"\n')
+    assert counter.render()[-1] == 'errors_total{reason="a \\"b\\"\\n"} 2'
+
+
+def test_generation_timer_splits_prefill_and_decode():
+    clock = FakeClock()
+    metrics = ServerMetrics(clock=clock)
+    timer = metrics.start_generation()
+    assert metrics.active_generations.values[()] == 1
+
+    timer.token(0.0, 0.5, prefill=True)
+    timer.token(0.5, 0.6, prefill=False)
+    timer.token(0.6, 0.7, prefill=False)
+    # una herramienta intermedia: nuevo prefill, sin latencia entre tokens
+    timer.token(2.0, 2.2, prefill=True)
+    timer.token(2.2, 2.3, prefill=False)
+    clock.now = 2.5
+    timer.finish()
+    timer.finish()
+
+    assert metrics.ttft.series[()][1] == 0.5
+    assert metrics.prefill.count() == 2
+    assert metrics.inter_token_latency.count() == 3
+    assert abs(metrics.decode.series[()][1] - 0.3) < 1e-9
+    assert metrics.generated_tokens.values[()] == 5
+    assert metrics.request_duration.series[()][1] == 2.5
+    assert metrics.active_generations.values[()] == 0
+
+
+def test_render_includes_collectors():
+    metrics = ServerMetrics()
+    metrics.add_collector(lambda: [Counter("extra_total", "Extra")])
+    text = metrics.render()
+    assert "# TYPE gpt_oss_time_to_first_token_seconds histogram" in text
+    assert "# TYPE extra_total counter" in text
+    assert text.endswith("\n")
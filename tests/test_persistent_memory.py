@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta
+
+from gpt_oss.persistent_memory import SQLiteStrategicMemory
+from gpt_oss.strategic_memory import Episode, StrategicMemory
+from meta_router import MetaRouter
+
+T0 = datetime(2024, 1, 1)
+
+
+def _episode(i, **metadata):
+    return Episode(
+        timestamp=T0 + timedelta(seconds=i),
+        input={"n": i},
+        action="a" if i % 3 else "b",
+        outcome="success" if i % 2 else "failure",
+        metadata={"task": f"t{i % 4}", **metadata},
+    )
+
+
+def test_episodes_and_storage_survive_reopen(tmp_path):
+    path = str(tmp_path / "memoria.db")
+    with SQLiteStrategicMemory(path, batch_size=4) as memoria:
+        for i in range(10):
+            memoria.add_episode(_episode(i))
+        memoria.save("temperatura", 0.7)
+        memoria.update("temperatura", 0.5)
+
+    reabierta = SQLiteStrategicMemory(path, hot_window=3)
+    assert len(reabierta) == 10
+    assert reabierta.get("temperatura") == 0.5
+    assert reabierta.query({}) == [_episode(i) for i in range(10)]
+    assert reabierta.query({"task": "t1", "outcome": "success"}) == [
+        _episode(1), _episode(5), _episode(9)
+    ]
+    reabierta.close()
+
+
+def test_matches_in_memory_backend_beyond_hot_window(tmp_path):
+    persistente = SQLiteStrategicMemory(
+        str(tmp_path / "m.db"), max_episodes=20, hot_window=5, batch_size=7
+    )
+    referencia = StrategicMemory(max_episodes=20)
+    quitados = []
+    persistente.add_listener(lambda ep: None, quitados.append)
+    for i in range(45):
+        ep = _episode(i, step=i % 5)
+        persistente.add_episode(ep)
+        referencia.add_episode(ep)
+        for patron in ({}, {"task": "t2"}, {"action": "b", "step": 3}, {"outcome": "failure"}):
+            assert persistente.query(patron) == referencia.query(patron)
+    assert persistente.summarize() == referencia.summarize()
+    assert quitados == [_episode(i, step=i % 5) for i in range(25)]
+    # los episodios de la ventana caliente son los mismos objetos
+    recientes = persistente.query({"task": "t0"})
+    assert recientes[-1] is persistente._episodes[-1]
+    persistente.close()
+
+
+def test_batched_writes(tmp_path):
+    memoria = SQLiteStrategicMemory(str(tmp_path / "m.db"), batch_size=8)
+    for i in range(7):
+        memoria.add_episode(_episode(i))
+    filas = memoria._conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+    assert filas == 0
+    memoria.add_episode(_episode(7))
+    filas = memoria._conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+    assert filas == 8
+    memoria.close()
+
+
+def test_router_outcomes_restored_after_restart(tmp_path):
+    class Modulo:
+        def handle(self, request):
+            return "ok"
+
+    path = str(tmp_path / "router.db")
+    memoria = SQLiteStrategicMemory(path, hot_window=2)
+    router = MetaRouter(memoria)
+    router.register("x", Modulo(), tasks=["t"])
+    for _ in range(5):
+        router.route({"task": "t", "context": "c", "goals": []})
+    memoria.close()
+
+    router = MetaRouter(SQLiteStrategicMemory(path, hot_window=2))
+    assert router._outcomes[("t", "c", ())]["x"][:2] == [5, 0]
+
+
+def test_windowed_summaries_beyond_hot_window(tmp_path):
+    path = str(tmp_path / "m.db")
+    persistente = SQLiteStrategicMemory(path, hot_window=4, batch_size=3)
+    referencia = StrategicMemory()
+    for i in range(30):
+        persistente.add_episode(_episode(i))
+        referencia.add_episode(_episode(i))
+    ventanas = (
+        {},
+        {"last": 3},
+        {"last": 12},
+        {"seconds": 2},
+        {"seconds": 15},
+        {"last": 5, "seconds": 20},
+    )
+    for ventana in ventanas:
+        assert persistente.summarize(**ventana) == referencia.summarize(**ventana)
+    persistente.close()
+
+    # los contadores globales se reconstruyen al reabrir
+    with SQLiteStrategicMemory(path, hot_window=4) as reabierta:
+        assert reabierta.summarize() == referencia.summarize()
+
+
+def test_query_similar_over_hot_window(tmp_path):
+    import pytest
+
+    pytest.importorskip("numpy")
+    from gpt_oss.similarity_index import HashedFeatureIndex
+
+    path = str(tmp_path / "m.db")
+    with SQLiteStrategicMemory(path, hot_window=4, similarity_index=HashedFeatureIndex()) as memoria:
+        for i in range(10):
+            memoria.add_episode(_episode(i))
+        assert [ep.input["n"] for ep, _ in memoria.query_similar({"task": "t1"}, k=4)][:1] == [9]
+    # al reabrir, la ventana cargada se indexa de nuevo
+    with SQLiteStrategicMemory(path, hot_window=4, similarity_index=HashedFeatureIndex()) as memoria:
+        assert len(memoria._similarity) == 4
+        assert memoria.query_similar({"task": "t2", "action": "b"}, k=1)[0][0] == _episode(6)
+
+
+def test_query_range_beyond_hot_window(tmp_path):
+    persistente = SQLiteStrategicMemory(str(tmp_path / "m.db"), hot_window=3, batch_size=4)
+    referencia = StrategicMemory()
+    for i in range(20):
+        persistente.add_episode(_episode(i))
+        referencia.add_episode(_episode(i))
+    inicio, fin = T0 + timedelta(seconds=4), T0 + timedelta(seconds=15)
+    assert persistente.query_range(inicio, fin) == referencia.query_range(inicio, fin)
+    assert persistente.query_range(inicio, None, {"task": "t1"}) == referencia.query_range(
+        inicio, None, {"task": "t1"}
+    )
+    persistente.close()
+
+
+def test_query_range_mixed_offsets_beyond_hot_window(tmp_path):
+    from datetime import timezone
+
+    zonas = [timezone(timedelta(hours=h)) for h in (-8, 0, 5, 13)]
+    persistente = SQLiteStrategicMemory(str(tmp_path / "m.db"), hot_window=3, batch_size=4)
+    referencia = StrategicMemory()
+    for i in range(40):
+        ep = _episode(i * 600)
+        # mismo instante escrito con distintos desfases: el orden ISO no es el temporal
+        ep.timestamp = ep.timestamp.replace(tzinfo=timezone.utc).astimezone(zonas[i % 4])
+        persistente.add_episode(ep)
+        referencia.add_episode(ep)
+    assert not persistente._all_hot()
+    t0_utc = T0.replace(tzinfo=timezone.utc)
+    for inicio, fin in (
+        (t0_utc + timedelta(hours=1), t0_utc + timedelta(hours=5)),
+        (datetime(2024, 1, 1, 9, tzinfo=zonas[2]), None),
+        (None, datetime(2023, 12, 31, 22, tzinfo=zonas[0])),
+    ):
+        esperado = referencia.query_range(inicio, fin)
+        assert esperado
+        assert persistente.query_range(inicio, fin) == esperado
+    persistente.close()
+
+
+def test_pending_episodes_written_without_close(tmp_path):
+    import gc
+
+    path = str(tmp_path / "m.db")
+    memoria = SQLiteStrategicMemory(path, batch_size=64)
+    for i in range(10):
+        memoria.add_episode(_episode(i))
+    del memoria
+    gc.collect()
+
+    with SQLiteStrategicMemory(path) as reabierta:
+        assert len(reabierta) == 10
+        assert [ep.input["n"] for ep in reabierta.query({})] == list(range(10))
+
+
+def test_windowed_summaries_out_of_order_beyond_hot_window(tmp_path):
+    import random
+    from datetime import timezone
+
+    rng = random.Random(7)
+    persistente = SQLiteStrategicMemory(str(tmp_path / "m.db"), hot_window=4, batch_size=3)
+    referencia = StrategicMemory()
+    for i in range(60):
+        ep = _episode(i)
+        # llegadas desordenadas y fechas con y sin zona horaria
+        ep.timestamp -= timedelta(seconds=rng.randrange(40))
+        if i % 3 == 0:
+            ep.timestamp = ep.timestamp.astimezone(timezone.utc)
+        persistente.add_episode(ep)
+        referencia.add_episode(ep)
+    for ventana in (
+        {"seconds": 3},
+        {"seconds": 30},
+        {"last": 10, "seconds": 25},
+        {"seconds": 10, "now": T0 + timedelta(seconds=20)},
+    ):
+        esperado = referencia.summarize(**ventana)
+        resumen = persistente.summarize(**ventana)
+        assert resumen["total"] == esperado["total"]
+        assert dict(resumen["actions"]) == dict(esperado["actions"])
+        assert dict(resumen["outcomes"]) == dict(esperado["outcomes"])
+    persistente.close()
@@ -100,3 +100,26 @@ def test_activate_mode_sin_valores_validos_mantiene_default() -> None:
     planner = Planner(memory=memory)
     planner.activate_mode("analytic")
     assert planner.get_mode_parameters()["temperature"] == pytest.approx(0.5)
+
+
+def test_activate_mode_pondera_episodios_recientes() -> None:
+    from datetime import timedelta
+
+    memory = StrategicMemory()
+    for dias, temperatura in ((30, 0.9), (0, 0.3)):
+        memory.add_episode(
+            Episode(
+                timestamp=datetime.now() - timedelta(days=dias),
+                input="i",
+                action="a",
+                outcome="success",
+                metadata={"mode": "creative", "temperature": temperatura},
+            )
+        )
+    planner = Planner(memory=memory)
+    planner.activate_mode("creative")
+    assert planner.get_mode_parameters()["temperature"] == pytest.approx(0.6)
+
+    planner = Planner(memory=memory, temperature_half_life=24 * 3600)
+    planner.activate_mode("creative")
+    assert planner.get_mode_parameters()["temperature"] == pytest.approx(0.3, abs=1e-6)
@@ -0,0 +1,86 @@
+import pytest
+
+from gpt_oss.responses_api import prefix_cache
+from gpt_oss.responses_api.prefix_cache import PrefixRenderCache
+
+
+class FakeConversation:
+    def __init__(self, messages):
+        self.messages = messages
+
+    @classmethod
+    def from_messages(cls, messages):
+        return cls(list(messages))
+
+
+class FakeEncoding:
+    """Renderiza cada mensaje (una cadena) como la lista de sus caracteres."""
+
+    def __init__(self, count_messages_in_prefix=False):
+        self.count_messages_in_prefix = count_messages_in_prefix
+        self.full_renders = 0
+
+    def render_conversation(self, conversation):
+        return [ord(c) for m in conversation.messages for c in m]
+
+    def render_conversation_for_completion(self, conversation, role):
+        self.full_renders += 1
+        tokens = self.render_conversation(conversation)
+        if self.count_messages_in_prefix:
+            # el renderizado depende de la conversación completa
+            tokens = [len(conversation.messages)] + tokens
+        return tokens + [0]
+
+
+@pytest.fixture(autouse=True)
+def fake_conversation(monkeypatch):
+    monkeypatch.setattr(prefix_cache, "Conversation", FakeConversation)
+
+
+def test_hit_reuses_prefix_without_rebuilding():
+    encoding = FakeEncoding()
+    cache = PrefixRenderCache(encoding)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return ["sys", "dev"]
+
+    first = cache.render_for_completion("k", build, ["hola"])
+    second = cache.render_for_completion("k", build, ["adiós"])
+
+    assert first == encoding.render_conversation_for_completion(
+        FakeConversation(["sys", "dev", "hola"]), None
+    )
+    assert second == encoding.render_conversation_for_completion(
+        FakeConversation(["sys", "dev", "adiós"]), None
+    )
+    assert len(builds) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_non_decomposable_render_falls_back_to_full_render():
+    encoding = FakeEncoding(count_messages_in_prefix=True)
+    cache = PrefixRenderCache(encoding)
+    for text in ["a", "b"]:
+        tokens = cache.render_for_completion("k", lambda: ["sys"], [text])
+        assert tokens == [2, ord("s"), ord("y"), ord("s"), ord(text), 0]
+    assert cache.hits == 0
+
+
+def test_lru_eviction():
+    cache = PrefixRenderCache(FakeEncoding(), maxsize=2)
+    for key in ["a", "b", "a", "c"]:
+        cache.render_for_completion(key, lambda: ["p"], ["m"])
+    assert len(cache) == 2
+    cache.render_for_completion("b", lambda: ["p"], ["m"])
+    assert cache.misses == 4
+
+
+def test_disabled_cache_always_renders_full():
+    encoding = FakeEncoding()
+    cache = PrefixRenderCache(encoding, maxsize=0)
+    cache.render_for_completion("k", lambda: ["p"], ["m"])
+    cache.render_for_completion("k", lambda: ["p"], ["m"])
+    assert len(cache) == 0
+    assert encoding.full_renders == 2
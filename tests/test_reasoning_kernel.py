@@ -130,3 +130,28 @@ def test_run_conditional_else_branch_selects_expert_and_iterations():
     assert kernel.get_state()["count"] == -2
     assert "done" not in kernel.get_state()
     assert planner.plan.call_count == 2
+
+
+def test_execute_plan_parallel_uses_route_many():
+    import threading
+
+    # las cuatro llamadas solo pasan la barrera si se ejecutan a la vez
+    barrier = threading.Barrier(4, timeout=5)
+
+    class ConcurrentExpert(DummyExpert):
+        def handle(self, request):
+            barrier.wait()
+            return super().handle(request)
+
+    router = MetaRouter()
+    expert = ConcurrentExpert()
+    router.register("slow", expert, tasks=["task"], contexts=["ctx"], goals=["g"])
+    kernel = ReasoningKernel(router)
+    plan = [{"payload": i} for i in range(4)]
+
+    results = kernel.execute_plan(
+        plan, task="task", context="ctx", goals=["g"], parallel=True
+    )
+
+    assert results == [0, 1, 2, 3]
+    assert len(expert.calls) == 4
@@ -0,0 +1,43 @@
+from gpt_oss.responses_api.store import SQLiteResponseStore
+from gpt_oss.responses_api.types import ResponseObject, ResponsesRequest
+
+
+def make_pair():
+    request = ResponsesRequest(
+        input=[
+            {"type": "message", "role": "user", "content": [{"type": "input_text", "text": "hola"}]},
+            {"type": "function_call", "name": "f", "arguments": "{}", "call_id": "call_1"},
+            {"type": "function_call_output", "call_id": "call_1", "output": "42"},
+        ],
+        instructions="sé breve",
+        reasoning={"effort": "medium"},
+        store=True,
+    )
+    response = ResponseObject(
+        output=[
+            {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": "¡hola!", "annotations": []}],
+            }
+        ],
+        created_at=1,
+        id="resp_1",
+        status="completed",
+    )
+    return request, response
+
+
+def test_roundtrip_between_connections(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    writer = SQLiteResponseStore(path)
+    reader = SQLiteResponseStore(path)
+    request, response = make_pair()
+
+    assert reader.get("resp_1") is None
+    writer["resp_1"] = (request, response)
+
+    stored_request, stored_response = reader.get("resp_1")
+    assert stored_request == request
+    assert stored_response == response
+    assert "resp_1" in reader
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from gpt_oss.similarity_index import HashedFeatureIndex  # noqa: E402
+from gpt_oss.strategic_memory import (  # noqa: E402
+    CompactStrategicMemory,
+    Episode,
+    StrategicMemory,
+)
+
+
+def _episode(i, **metadata):
+    return Episode(
+        timestamp=datetime(2024, 1, 1),
+        input=i,
+        action="token",
+        outcome=f"o{i}",
+        metadata=metadata,
+    )
+
+
+def test_query_similar_ranks_partial_matches():
+    memoria = StrategicMemory(similarity_index=HashedFeatureIndex(dim=512))
+    memoria.add_episode(_episode(0, task="resumir", context="web", mode="deductivo"))
+    memoria.add_episode(_episode(1, task="traducir", context="web", mode="inductivo"))
+    memoria.add_episode(_episode(2, task="resumir", context="pdf", mode="deductivo"))
+
+    # ningún episodio coincide exactamente con el estado completo
+    estado = {"task": "resumir", "context": "web", "mode": "deductivo", "paso": 7}
+    assert memoria.query(estado) == []
+    resultados = memoria.query_similar(estado, k=2)
+    assert [ep.input for ep, _ in resultados] == [0, 2]
+    assert resultados[0][1] > resultados[1][1] > 0
+
+
+def test_similarity_index_follows_eviction_and_growth():
+    for cls in (StrategicMemory, CompactStrategicMemory):
+        indice = HashedFeatureIndex(dim=64, initial_capacity=2)
+        memoria = cls(max_episodes=5, similarity_index=indice)
+        for i in range(12):
+            memoria.add_episode(_episode(i, task=f"t{i % 3}"))
+        assert len(indice) == 5
+        encontrados = memoria.query_similar({"task": "t1"}, k=10)
+        assert len(encontrados) == 5
+        # los más parecidos primero y, a igualdad, los más recientes
+        assert [ep.input for ep, _ in encontrados[:2]] == [10, 7]
+        assert {ep.input for ep, _ in encontrados} == set(range(7, 12))
+
+
+def test_user_supplied_embeddings():
+    def embed(rasgos):
+        return [1.0, float(rasgos.get("x", 0))]
+
+    memoria = StrategicMemory(similarity_index=HashedFeatureIndex(dim=2, embed=embed))
+    for x in (0, 1, 5):
+        memoria.add_episode(_episode(x, x=x))
+    assert [ep.input for ep, _ in memoria.query_similar({"x": 4}, k=1)] == [5]
+
+    with pytest.raises(ValueError):
+        HashedFeatureIndex(dim=3, embed=embed).vectorize({})
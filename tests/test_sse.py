@@ -0,0 +1,104 @@
+import pytest
+
+from gpt_oss.responses_api.events import (
+    ResponseCreatedEvent,
+    ResponseOutputTextDelta,
+    ResponseReasoningTextDelta,
+)
+from gpt_oss.responses_api.sse import (
+    DeltaCoalescer,
+    format_delta_event,
+    format_event,
+    format_response_event,
+)
+from gpt_oss.responses_api.types import ResponseObject
+
+
+DELTAS = [
+    "",
+    "hola",
+    ' "comillas" y \\barras\\ ',
+    "línea\nnueva\r\ttab\b\f",
+    "".join(chr(c) for c in range(0x20)),
+    "ñandú € 😀   \u007f",
+]
+
+
+@pytest.mark.parametrize("event_cls", [ResponseOutputTextDelta, ResponseReasoningTextDelta])
+@pytest.mark.parametrize("delta", DELTAS)
+def test_delta_template_matches_pydantic(event_cls, delta):
+    event = event_cls(output_index=3, content_index=1, delta=delta, sequence_number=17)
+    assert format_delta_event(
+        event_cls, 17, delta, output_index=3, content_index=1
+    ) == format_event(event)
+
+
+def test_response_event_matches_pydantic():
+    response = ResponseObject(output=[], created_at=123, id="resp_abc")
+    event = ResponseCreatedEvent(
+        type="response.created", response=response, sequence_number=0
+    )
+    assert format_response_event(
+        "response.created", 0, response.model_dump_json(indent=None)
+    ) == format_event(event)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_coalescer_disabled_passes_through():
+    coalescer = DeltaCoalescer(0.0)
+    assert coalescer.add("a", "x") == [("a", "x")]
+    assert coalescer.flush() == []
+
+
+def test_coalescer_groups_within_budget():
+    clock = FakeClock()
+    coalescer = DeltaCoalescer(0.05, clock=clock)
+    # el primer delta no tiene con qué agruparse: sale sin esperar
+    assert coalescer.add("a", "¡") == [("a", "¡")]
+    clock.now = 0.01
+    assert coalescer.add("a", "ho") == []
+    clock.now = 0.02
+    assert coalescer.add("a", "la") == []
+    clock.now = 0.03
+    assert coalescer.add("a", " mun") == []
+    # el siguiente token se espera fuera del presupuesto: se entrega el lote
+    clock.now = 0.05
+    assert coalescer.add("a", "do") == [("a", "hola mundo")]
+    assert coalescer.flush() == []
+
+
+def test_coalescer_flushes_on_key_change_and_slow_tokens():
+    clock = FakeClock()
+    coalescer = DeltaCoalescer(0.05, clock=clock)
+    assert coalescer.add("a", "w") == [("a", "w")]
+    clock.now = 0.0005
+    assert coalescer.add("a", "x") == []
+    clock.now = 0.001
+    assert coalescer.add("b", "y") == [("a", "x")]
+    # con tokens más lentos que el presupuesto no se retiene nada
+    clock.now = 0.1
+    assert coalescer.add("b", "z") == [("b", "yz")]
+    clock.now = 0.2
+    assert coalescer.add("b", "w") == [("b", "w")]
+
+
+def test_coalescer_does_not_hold_delta_after_idle_period():
+    clock = FakeClock()
+    coalescer = DeltaCoalescer(0.05, clock=clock)
+    assert coalescer.add("a", "x") == [("a", "x")]
+    clock.now = 0.01
+    assert coalescer.add("a", "y") == []
+    clock.now = 0.02
+    assert coalescer.add("a", "z") == []
+    assert coalescer.flush() == [("a", "yz")]
+    # tras un envío, el siguiente delta pasado el presupuesto sale sin esperar
+    clock.now = 1.0
+    assert coalescer.add("a", "w") == [("a", "w")]
+
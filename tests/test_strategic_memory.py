@@ -124,3 +124,256 @@ def test_max_episodes_fifo():
     assert memoria.query({"action": "a2"}) == [ep2]
     assert memoria.query({"action": "a3"}) == [ep3]
     assert memoria.summarize()["total"] == 2
+
+
+def test_listeners_see_added_and_evicted_episodes():
+    memoria = StrategicMemory(max_episodes=2)
+    added, removed = [], []
+    memoria.add_listener(added.append, removed.append)
+    episodios = [
+        Episode(timestamp=datetime.utcnow(), input=i, action="a", outcome="ok")
+        for i in range(3)
+    ]
+    for ep in episodios:
+        memoria.add_episode(ep)
+    assert added == episodios
+    assert removed == episodios[:1]
+
+    memoria.remove_listener(added.append)
+    memoria.add_episode(episodios[0])
+    assert len(added) == 3
+
+
+def _linear_query(episodios, pattern):
+    return [
+        ep
+        for ep in episodios
+        if all(getattr(ep, k, ep.metadata.get(k)) == v for k, v in pattern.items())
+    ]
+
+
+def test_indexed_query_matches_linear_scan():
+    import random
+
+    rng = random.Random(0)
+    memoria = StrategicMemory(max_episodes=50)
+    vistos = []
+    for i in range(300):
+        metadata = {"task": rng.choice(["t1", "t2", "t3"]), "step": i % 4}
+        if rng.random() < 0.5:
+            metadata["mode"] = rng.choice(["deductivo", "inductivo"])
+        # resultados no hashables intercalados con otros que sí lo son
+        outcome = {"valor": i} if i % 7 == 0 else rng.choice(["success", "failure"])
+        ep = Episode(
+            timestamp=datetime.utcnow(),
+            input=i,
+            action=rng.choice(["a", "b"]),
+            outcome=outcome,
+            metadata=metadata,
+        )
+        memoria.add_episode(ep)
+        vistos.append(ep)
+        patrones = [
+            {"task": "t1"},
+            {"task": "t2", "action": "b"},
+            {"mode": None},
+            {"mode": "inductivo", "outcome": "success"},
+            {"outcome": {"valor": 0}},
+            {"step": 2, "task": "t3"},
+            {"task": ["no", "hashable"]},
+            {"task": "otra"},
+        ]
+        for patron in patrones:
+            assert memoria.query(patron) == _linear_query(vistos[-50:], patron)
+
+
+def test_query_uses_configured_index_fields():
+    memoria = StrategicMemory(max_episodes=3, indexed_fields=("step",))
+    for i in range(5):
+        memoria.add_episode(
+            Episode(
+                timestamp=datetime.utcnow(),
+                input=i,
+                action="a",
+                outcome="ok",
+                metadata={"step": i},
+            )
+        )
+    assert [ep.input for ep in memoria.query({"step": 1})] == []
+    assert [ep.input for ep in memoria.query({"step": 4, "action": "a"})] == [4]
+    assert list(memoria._index["step"]) == [2, 3, 4]
+
+
+def test_compact_memory_matches_episode_memory():
+    import random
+    from datetime import timedelta, timezone
+
+    from gpt_oss.strategic_memory import CompactStrategicMemory
+
+    rng = random.Random(1)
+    compacta = CompactStrategicMemory(max_episodes=30)
+    referencia = StrategicMemory(max_episodes=30)
+    quitados_c, quitados_r = [], []
+    compacta.add_listener(lambda ep: None, quitados_c.append)
+    referencia.add_listener(lambda ep: None, quitados_r.append)
+    base = datetime(2024, 5, 1, 12, 0, 0, 123456)
+    for i in range(120):
+        metadata = {"task": rng.choice(["t1", "t2"]), "latency": rng.random()}
+        if i % 3 == 0:
+            metadata["goals"] = ["g", str(i)]
+        if i % 5 == 0:
+            metadata = {"mode": rng.choice(["deductivo", "inductivo"]), **metadata}
+        ep = Episode(
+            timestamp=base + timedelta(seconds=i)
+            if i % 11
+            else datetime(2024, 1, 1, tzinfo=timezone.utc),
+            input={"token": i},
+            action=rng.choice(["a", "b"]),
+            outcome=rng.choice(["success", "failure", ("raro", i)]),
+            metadata=metadata,
+        )
+        compacta.add_episode(ep)
+        referencia.add_episode(ep)
+        patrones = (
+            {},
+            {"task": "t1"},
+            {"mode": "inductivo", "action": "b"},
+            {"outcome": "failure"},
+            {"goals": ["g", str(i)]},
+        )
+        for patron in patrones:
+            assert compacta.query(patron) == referencia.query(patron)
+    assert quitados_c == quitados_r
+    assert compacta.summarize() == referencia.summarize()
+
+    # los metadatos devueltos son copias
+    compacta.query({})[0].metadata["task"] = "otra"
+    assert compacta.query({})[0].metadata["task"] != "otra"
+
+
+def test_summarize_counts_unhashable_outcomes_and_windows():
+    from datetime import timedelta
+
+    memoria = StrategicMemory(max_episodes=5)
+    base = datetime(2024, 1, 1)
+    resultados = ["ok", {"valor": 1}, "ok", "fallo", {"valor": 1}, "ok", "ok"]
+    for i, resultado in enumerate(resultados):
+        memoria.add_episode(
+            Episode(
+                timestamp=base + timedelta(seconds=10 * i),
+                input=i,
+                action="a" if i < 4 else "b",
+                outcome=resultado,
+            )
+        )
+
+    # solo quedan los cinco últimos
+    resumen = memoria.summarize()
+    assert resumen["total"] == 5
+    assert resumen["actions"] == [("b", 3), ("a", 2)]
+    assert resumen["outcomes"][0] == ("ok", 3)
+    assert dict(resumen["outcomes"]) == {"ok": 3, "fallo": 1, "{'valor': 1}": 1}
+    assert memoria.summarize(last=2) == {
+        "total": 2,
+        "actions": [("b", 2)],
+        "outcomes": [("ok", 2)],
+    }
+    # ventana de 25 s respecto al último episodio (t=60): t=40, 50 y 60
+    assert memoria.summarize(seconds=25)["total"] == 3
+    assert memoria.summarize(seconds=25, now=base + timedelta(seconds=75))["total"] == 2
+    assert memoria.summarize(last=1, seconds=100)["total"] == 1
+
+
+def test_query_similar_requires_index():
+    with pytest.raises(ValueError):
+        StrategicMemory().query_similar({"task": "t"})
+
+
+def test_query_range_with_out_of_order_inserts_and_eviction():
+    import random
+    from datetime import timedelta
+
+    from gpt_oss.strategic_memory import CompactStrategicMemory
+
+    rng = random.Random(3)
+    base = datetime(2024, 1, 1)
+    for cls in (StrategicMemory, CompactStrategicMemory):
+        memoria = cls(max_episodes=100)
+        vistos = []
+        for i in range(500):
+            # llegadas casi ordenadas, con algún episodio retrasado
+            segundos = i - (rng.randrange(20) if i % 7 == 0 else 0)
+            ep = Episode(
+                timestamp=base + timedelta(seconds=segundos),
+                input=i,
+                action=rng.choice(["a", "b"]),
+                outcome="ok",
+            )
+            memoria.add_episode(ep)
+            vistos.append(ep)
+        vivos = vistos[-100:]
+        inicio, fin = base + timedelta(seconds=420), base + timedelta(seconds=470)
+        esperado = sorted(
+            (ep for ep in vivos if inicio <= ep.timestamp < fin),
+            key=lambda ep: ep.timestamp,
+        )
+        assert memoria.query_range(inicio, fin) == esperado
+        assert memoria.query_range(inicio, fin, {"action": "a"}) == [
+            ep for ep in esperado if ep.action == "a"
+        ]
+        assert len(memoria.query_range()) == 100
+        assert memoria.query_range(end=base) == []
+        # los descartados se purgan de la lista ordenada de vez en cuando
+        assert len(memoria._time_keys) < 300
+
+
+def test_decayed_aggregate_add_remove_and_rebase():
+    from gpt_oss.strategic_memory import DecayedAggregate
+
+    agregado = DecayedAggregate(half_life=10.0)
+    agregado.add("k", (1.0, 2.0), timestamp=0.0)
+    agregado.add("k", (1.0, 0.0), timestamp=10.0)
+    assert agregado.get("k", now=10.0) == pytest.approx([1.5, 1.0])
+    assert agregado.get("k", now=20.0) == pytest.approx([0.75, 0.5])
+
+    # muy lejos en el tiempo: se reescala sin desbordar
+    agregado.add("k", (4.0, 0.0), timestamp=10_000.0)
+    assert agregado.get("k", now=10_000.0) == pytest.approx([4.0, 0.0])
+    agregado.add("k", (1.0, 2.0), timestamp=0.0, sign=-1)
+    agregado.add("k", (1.0, 0.0), timestamp=10.0, sign=-1)
+    assert agregado.get("k", now=10_010.0) == pytest.approx([2.0, 0.0])
+    agregado.add("k", (4.0, 0.0), timestamp=10_000.0, sign=-1)
+    assert "k" not in agregado
+    assert agregado.get("k", now=0.0) is None
+
+
+def test_windowed_summary_with_out_of_order_and_mixed_timezones():
+    import random
+    from collections import Counter
+    from datetime import timedelta, timezone
+
+    rng = random.Random(5)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    memoria = StrategicMemory(max_episodes=150)
+    vivos = []
+    for i in range(400):
+        marca = base + timedelta(seconds=i - rng.randrange(30))
+        if i % 2:
+            # misma hora sin zona horaria (en hora local, como ``datetime.now()``)
+            marca = marca.astimezone().replace(tzinfo=None)
+        ep = Episode(timestamp=marca, input=i, action=rng.choice("ab"), outcome="ok")
+        memoria.add_episode(ep)
+        vivos = (vivos + [ep])[-150:]
+
+    referencia = max(ep.timestamp.timestamp() for ep in vivos)
+    for segundos in (5, 40, 1000):
+        ventana = [ep for ep in vivos if ep.timestamp.timestamp() >= referencia - segundos]
+        resumen = memoria.summarize(seconds=segundos)
+        assert resumen["total"] == len(ventana)
+        assert dict(resumen["actions"]) == dict(Counter(ep.action for ep in ventana))
+    ultimos = vivos[-20:]
+    en_ventana = [ep for ep in ultimos if ep.timestamp.timestamp() >= referencia - 10]
+    assert memoria.summarize(last=20, seconds=10)["total"] == len(en_ventana)
+    assert memoria.summarize(seconds=10, now=base)["total"] == sum(
+        ep.timestamp.timestamp() >= base.timestamp() - 10 for ep in vivos
+    )
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from gpt_oss.responses_api.inference.stub import StubProfile, SyntheticBackend, setup_model
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _backend(**profile):
+    sleeps = []
+    clock = FakeClock()
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    backend = SyntheticBackend(StubProfile(**profile), sleep=sleep, clock=clock)
+    return backend, sleeps
+
+
+def test_each_stream_follows_its_own_script():
+    backend, sleeps = _backend(
+        prefill_s_per_token=0.01,
+        decode_latency_s=0.1,
+        batch_curve=[(1, 1.0), (2, 1.5)],
+        scripts=[[1, 2, 3], [7, 8, 9]],
+    )
+    infer = backend.infer_next_token
+
+    a, b = [100] * 10, [200] * 20
+    a.append(infer(a, new_request=True))
+    b.append(infer(b, new_request=True))
+    for _ in range(2):
+        a.append(infer(a))
+        b.append(infer(b))
+
+    assert a[10:] == [1, 2, 3]
+    assert b[20:] == [7, 8, 9]
+    # prefill por token del prompt + un paso de decodificación escalado por
+    # los streams activos; ``a`` recibe sus tokens de los pasos que abre ``b``
+    assert sleeps == pytest.approx([0.1 + 0.1, 0.2 + 0.15, 0.15, 0.1])
+    # el último token de un guion libera su stream: el último paso es de uno
+
+
+def test_streams_share_each_decode_step():
+    backend, sleeps = _backend(decode_latency_s=0.1, batch_curve=[(1, 1.0), (4, 2.0)])
+    infer = backend.infer_next_token
+
+    histories = [[i] for i in range(4)]
+    for h in histories:
+        h.append(infer(h, new_request=True))
+    warmup = len(sleeps)
+    for _ in range(5):
+        for h in histories:
+            h.append(infer(h))
+
+    # llamadas en serie: cada ronda de cuatro tokens es un único paso de 0,1 * 2
+    assert sum(sleeps[warmup:]) == pytest.approx(5 * 0.2)
+    assert len(sleeps) - warmup == 5
+
+
+def test_batch_curve_is_interpolated():
+    backend, _ = _backend(batch_curve=[(1, 1.0), (4, 2.5), (8, 3.0)])
+    assert backend.batch_multiplier(1) == 1.0
+    assert backend.batch_multiplier(2) == pytest.approx(1.5)
+    assert backend.batch_multiplier(6) == pytest.approx(2.75)
+    assert backend.batch_multiplier(32) == 3.0
+
+
+def test_decode_latency_distribution_keeps_mean():
+    backend, sleeps = _backend(decode_latency_s=0.05, decode_latency_sigma=0.5, seed=0)
+    for _ in range(4000):
+        backend.infer_next_token([])
+    mean = sum(sleeps) / len(sleeps)
+    assert mean == pytest.approx(0.05, rel=0.05)
+    assert min(sleeps) < 0.03 < 0.08 < max(sleeps)
+
+
+def test_setup_model_reads_profile(tmp_path, monkeypatch):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps({"decode_latency_s": 0.0, "scripts": [[5, 6]]}))
+    infer = setup_model(str(path))
+    assert [infer([], new_request=True), infer([])] == [5, 6]
+
+
+def test_same_length_histories_keep_their_streams():
+    backend, _ = _backend(decode_latency_s=0.0, scripts=[[1, 2, 3], [1, 8, 9]])
+    infer = backend.infer_next_token
+
+    # misma longitud y mismo último token: solo el historial completo las distingue
+    a, b = [5, 100], [6, 100]
+    a.append(infer(a, new_request=True))
+    b.append(infer(b, new_request=True))
+    a.append(infer(a))
+    b.append(infer(b))
+    assert a[2:] == [1, 2]
+    assert b[2:] == [1, 8]
+
+    # un historial desconocido abre su propio stream
+    assert infer([4, 100, 1, 2]) == 1
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gpt_oss.responses_api.tool_executor import ToolExecutor
+
+
+def test_runs_coroutine_on_executor_thread():
+    executor = ToolExecutor(max_workers=2)
+
+    async def tool():
+        await asyncio.sleep(0)
+        return threading.current_thread().name
+
+    try:
+        name = asyncio.run(executor.run(tool()))
+    finally:
+        executor.shutdown()
+    assert name.startswith("tool-executor-")
+
+
+def test_blocking_tool_does_not_stall_event_loop():
+    executor = ToolExecutor(max_workers=1)
+    ticks = 0
+
+    async def blocking_tool():
+        time.sleep(0.2)  # p. ej. procesar HTML
+        return "ok"
+
+    async def scenario():
+        nonlocal ticks
+        task = asyncio.create_task(executor.run(blocking_tool()))
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return await task
+
+    try:
+        assert asyncio.run(scenario()) == "ok"
+    finally:
+        executor.shutdown()
+    assert ticks >= 5
+
+
+def test_timeout_cancels_tool_task():
+    executor = ToolExecutor(max_workers=1, timeout_s=0.05)
+    cancelled = threading.Event()
+
+    async def slow_tool():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(executor.run(slow_tool()))
+        assert cancelled.wait(1)
+        # sin plazo explícito por llamada
+        assert asyncio.run(executor.run(asyncio.sleep(0.1, "fin"), timeout_s=None)) == "fin"
+    finally:
+        executor.shutdown()
+
+
+def test_concurrent_calls_use_different_threads():
+    executor = ToolExecutor(max_workers=3)
+    barrier = threading.Barrier(3, timeout=1)
+
+    async def tool():
+        barrier.wait()  # solo termina si las tres llamadas corren a la vez
+        return threading.current_thread().name
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run(tool()) for _ in range(3)))
+
+    try:
+        names = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert len(set(names)) == 3
@@ -0,0 +1,116 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from gpt_oss.responses_api.inference.transformers import (  # noqa: E402
+    CachedInference,
+    get_infer_next_token,
+)
+
+
+class CountingModel:
+    """Envuelve el modelo y anota cuántos tokens procesa cada llamada."""
+
+    def __init__(self, model):
+        self.model = model
+        self.device = model.device
+        self.calls = []
+
+    def __call__(self, input_ids, **kwargs):
+        self.calls.append(input_ids.shape[1])
+        return self.model(input_ids=input_ids, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256,
+    )
+    model = transformers.LlamaForCausalLM(config)
+    model.eval()
+    return model
+
+
+def _greedy(infer, prompt, steps, new_request=True):
+    tokens = list(prompt)
+    for i in range(steps):
+        tokens.append(infer(tokens, 0.0, new_request=new_request and i == 0))
+    return tokens
+
+
+def test_cached_greedy_matches_generate(tiny_model):
+    reference = get_infer_next_token(tiny_model)
+    model = CountingModel(tiny_model)
+    cached = CachedInference(model).infer_next_token
+
+    prompt = [1, 5, 9, 13, 2, 7]
+    assert _greedy(cached, prompt, 12) == _greedy(reference, prompt, 12)
+    # prefill del prompt y un token por paso
+    assert model.calls == [len(prompt)] + [1] * 11
+
+
+def test_divergence_and_interleaved_sessions(tiny_model):
+    reference = get_infer_next_token(tiny_model)
+    model = CountingModel(tiny_model)
+    cached = CachedInference(model).infer_next_token
+
+    first = _greedy(cached, [1, 2, 3, 4], 6)
+    # un turno nuevo que comparte solo parte del historial: se recorta una copia
+    forked_prompt = first[:6] + [30, 31]
+    forked = _greedy(cached, forked_prompt, 6)
+    assert forked == _greedy(reference, forked_prompt, 6)
+    assert model.calls[6] == 2
+
+    # la sesión original sigue intacta y continúa sin prefill
+    model.calls.clear()
+    assert cached(first, 0.0) == _greedy(reference, first, 1)[-1]
+    assert model.calls == [1]
+
+    # dos streams intercalados no se pisan
+    a, b = [3, 4, 5], [6, 7, 8]
+    a.append(cached(a, 0.0, new_request=True))
+    b.append(cached(b, 0.0, new_request=True))
+    for _ in range(4):
+        a.append(cached(a, 0.0))
+        b.append(cached(b, 0.0))
+    assert a == _greedy(reference, [3, 4, 5], 5)
+    assert b == _greedy(reference, [6, 7, 8], 5)
+
+
+def test_same_length_sessions_are_not_confused(tiny_model):
+    reference = get_infer_next_token(tiny_model)
+    cached = CachedInference(tiny_model).infer_next_token
+
+    # mismo último token y misma longitud: solo el historial completo las distingue
+    a, b = [1, 2, 9], [3, 4, 9]
+    a.append(cached(a, 0.0, new_request=True))
+    b.append(cached(b, 0.0, new_request=True))
+    for _ in range(3):
+        a.append(cached(a, 0.0))
+        b.append(cached(b, 0.0))
+    assert a == _greedy(reference, [1, 2, 9], 4)
+    assert b == _greedy(reference, [3, 4, 9], 4)
+
+
+def test_divergence_without_new_request_keeps_other_session(tiny_model):
+    reference = get_infer_next_token(tiny_model)
+    model = CountingModel(tiny_model)
+    inference = CachedInference(model)
+    cached = inference.infer_next_token
+
+    first = _greedy(cached, [1, 2, 3, 4], 4)
+    diverged = first[:5] + [40]
+    assert cached(diverged, 0.0) == _greedy(reference, diverged, 1)[-1]
+
+    # la sesión original conserva su caché y continúa sin prefill
+    model.calls.clear()
+    assert cached(first, 0.0) == _greedy(reference, first, 1)[-1]
+    assert model.calls == [1]
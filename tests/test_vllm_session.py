@@ -0,0 +1,177 @@
+import importlib
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+EOS = 99
+
+
+class FakeEngine:
+    """Motor mínimo con la interfaz de ``LLMEngine``: genera ``último token + 1``."""
+
+    def __init__(self, stop_after=None):
+        self.requests = {}
+        self.added = []
+        self.aborted = []
+        self.steps = 0
+        self.stop_after = stop_after
+
+    def add_request(self, request_id, prompt, sampling_params):
+        self.added.append((request_id, list(prompt["prompt_token_ids"])))
+        self.requests[request_id] = [
+            list(prompt["prompt_token_ids"]),
+            [],
+            sampling_params.get("max_tokens"),
+        ]
+
+    def abort_request(self, request_id):
+        self.aborted.append(request_id)
+        del self.requests[request_id]
+
+    def step(self):
+        self.steps += 1
+        outputs = []
+        for request_id, (prompt, generated, max_tokens) in list(self.requests.items()):
+            last = generated[-1] if generated else prompt[-1]
+            generated.append(EOS if last + 1 >= EOS else last + 1)
+            finished = generated[-1] == EOS or len(generated) in (self.stop_after, max_tokens)
+            if finished:
+                del self.requests[request_id]
+            outputs.append(
+                SimpleNamespace(
+                    request_id=request_id,
+                    outputs=[SimpleNamespace(token_ids=list(generated))],
+                    finished=finished,
+                )
+            )
+        return outputs
+
+
+@pytest.fixture
+def vllm_backend(monkeypatch):
+    vllm = types.ModuleType("vllm")
+    for name in ("LLM", "EngineArgs", "LLMEngine"):
+        setattr(vllm, name, object)
+    vllm.SamplingParams = lambda **kwargs: kwargs
+    inputs = types.ModuleType("vllm.inputs")
+    inputs.TokensPrompt = lambda **kwargs: kwargs
+    monkeypatch.setitem(sys.modules, "vllm", vllm)
+    monkeypatch.setitem(sys.modules, "vllm.inputs", inputs)
+    monkeypatch.delitem(sys.modules, "gpt_oss.responses_api.inference.vllm", raising=False)
+    module = importlib.import_module("gpt_oss.responses_api.inference.vllm")
+    yield module
+    sys.modules.pop("gpt_oss.responses_api.inference.vllm", None)
+
+
+def test_one_request_per_stream(vllm_backend):
+    engine = FakeEngine()
+    infer = vllm_backend.StreamingSession(engine).infer_next_token
+
+    tokens = [90, 91]
+    tokens.append(infer(tokens, 0.0, new_request=True))
+    while tokens[-1] != EOS:
+        tokens.append(infer(tokens, 0.0))
+
+    assert tokens == list(range(90, 100))
+    assert engine.added == [("gpt-oss-0", [90, 91])]
+    assert engine.steps == 8
+    assert engine.aborted == []
+
+
+def test_divergent_history_resubmits(vllm_backend):
+    engine = FakeEngine()
+    infer = vllm_backend.StreamingSession(engine).infer_next_token
+
+    tokens = [1]
+    tokens.append(infer(tokens, 0.0, new_request=True))
+    tokens.append(infer(tokens, 0.0))
+    # resultado de una herramienta: el historial sigue, pero con tokens propios
+    tokens += [50, 51]
+    tokens.append(infer(tokens, 0.0, new_request=True))
+
+    assert tokens[-1] == 52
+    assert engine.added == [("gpt-oss-0", [1]), ("gpt-oss-1", [1, 2, 3, 50, 51])]
+    assert engine.aborted == ["gpt-oss-0"]
+
+
+def test_interleaved_streams_do_not_resubmit(vllm_backend):
+    engine = FakeEngine()
+    infer = vllm_backend.StreamingSession(engine).infer_next_token
+
+    a, b = [10], [40]
+    a.append(infer(a, 0.0, new_request=True))
+    b.append(infer(b, 0.0, new_request=True))
+    for _ in range(5):
+        a.append(infer(a, 0.0))
+        b.append(infer(b, 0.0))
+
+    assert a == list(range(10, 17))
+    assert b == list(range(40, 47))
+    assert len(engine.added) == 2
+    assert engine.aborted == []
+
+
+def test_finished_request_is_continued(vllm_backend):
+    engine = FakeEngine(stop_after=2)
+    infer = vllm_backend.StreamingSession(engine).infer_next_token
+
+    tokens = [1]
+    tokens.append(infer(tokens, 0.0, new_request=True))
+    for _ in range(3):
+        tokens.append(infer(tokens, 0.0))
+
+    assert tokens == [1, 2, 3, 4, 5]
+    assert [prompt for _, prompt in engine.added] == [[1], [1, 2, 3]]
+
+
+def test_same_length_histories_do_not_swap_streams(vllm_backend):
+    engine = FakeEngine()
+    infer = vllm_backend.StreamingSession(engine).infer_next_token
+
+    # misma cabecera, misma longitud y mismo último token tras el primer paso
+    a, b = [5, 1, 10], [5, 2, 10]
+    a.append(infer(a, 0.0, new_request=True))
+    b.append(infer(b, 0.0, new_request=True))
+    a.append(infer(a, 0.0))
+    b.append(infer(b, 0.0))
+
+    assert [prompt for _, prompt in engine.added] == [[5, 1, 10], [5, 2, 10]]
+    assert infer([5, 3, 10, 11, 12], 0.0) == 13
+    assert len(engine.added) == 3
+
+
+def test_abandoned_stream_is_aborted_and_resumed(vllm_backend):
+    engine = FakeEngine()
+    session = vllm_backend.StreamingSession(engine, max_pending=3)
+    infer = session.infer_next_token
+
+    a = [10]
+    a.append(infer(a, 0.0, new_request=True))
+    # el llamador de ``a`` deja de leer mientras otro stream avanza
+    b = [40]
+    b.append(infer(b, 0.0, new_request=True))
+    for _ in range(5):
+        b.append(infer(b, 0.0))
+    assert engine.aborted == ["gpt-oss-0"]
+    assert max(len(stream.pending) for stream in session._streams.values()) <= 3
+
+    # si vuelve, recibe los tokens pendientes y luego se reenvía su historial
+    for _ in range(5):
+        a.append(infer(a, 0.0))
+    assert a == list(range(10, 17))
+    assert engine.added[-1] == ("gpt-oss-2", list(range(10, 15)))
+
+
+def test_stream_tokens_are_capped_and_resubmitted(vllm_backend):
+    engine = FakeEngine()
+    infer = vllm_backend.StreamingSession(engine, max_stream_tokens=4).infer_next_token
+
+    tokens = [1]
+    tokens.append(infer(tokens, 0.0, new_request=True))
+    for _ in range(5):
+        tokens.append(infer(tokens, 0.0))
+
+    assert tokens == list(range(1, 8))
+    assert [prompt for _, prompt in engine.added] == [[1], [1, 2, 3, 4, 5]]
@@ -1,9 +1,12 @@
+import http.server
 import json as json_module
 import threading
 import os
+import random
 import sys
 import time
 import pytest
+import tiktoken
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -11,6 +14,7 @@ from gpt_oss.responses_api.inference.ollama import (
     setup_model,
     EOS_TOKEN,
     PAD_TOKEN,
+    IncrementalEncoder,
     OllamaStreamer,
 )
 
@@ -40,7 +44,7 @@ class FakeResponse:
     def raise_for_status(self):
         pass
 
-    def iter_lines(self, decode_unicode=True):
+    def iter_lines(self, chunk_size=512, decode_unicode=True):
         for line in self._lines:
             yield line
 
@@ -51,7 +55,7 @@ def test_multiple_instances_independent(monkeypatch):
         fake_load_harmony_encoding,
     )
 
-    def fake_post(url, json, stream, timeout):
+    def fake_post(self, url, json, stream, timeout):
         token = "A" if "custom1" in url else "B"
         lines = [
             json_module.dumps({"response": token, "done": False}),
@@ -60,7 +64,7 @@ def test_multiple_instances_independent(monkeypatch):
         return FakeResponse(lines)
 
     monkeypatch.setattr(
-        "gpt_oss.responses_api.inference.ollama.requests.post", fake_post
+        "gpt_oss.responses_api.inference.ollama.requests.Session.post", fake_post
     )
 
     infer1 = setup_model("model1", endpoint_url="http://custom1/api/generate")
@@ -95,7 +99,7 @@ def test_env_url(monkeypatch):
     )
     captured = {}
 
-    def fake_post(url, json, stream, timeout):
+    def fake_post(self, url, json, stream, timeout):
         captured["url"] = url
         lines = [
             json_module.dumps({"response": "X", "done": False}),
@@ -104,7 +108,7 @@ def test_env_url(monkeypatch):
         return FakeResponse(lines)
 
     monkeypatch.setattr(
-        "gpt_oss.responses_api.inference.ollama.requests.post", fake_post
+        "gpt_oss.responses_api.inference.ollama.requests.Session.post", fake_post
     )
 
     infer = setup_model("model_env")
@@ -160,3 +164,360 @@ def test_endpoint_validation_invalid(monkeypatch):
 
     with pytest.raises(ValueError):
         OllamaStreamer("model", endpoint_url="ftp://invalid.example/api")
+
+
+class _FakeOllamaHandler(http.server.BaseHTTPRequestHandler):
+    """Servidor Ollama mínimo: responde NDJSON con transferencia fragmentada."""
+
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    token_delay_s = 0.0
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json_module.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for piece in ["ho", "la"]:
+            time.sleep(self.token_delay_s)
+            self._write_chunk(json_module.dumps({"response": piece, "done": False}).encode() + b"\n")
+        done = {"done": True, "context": [len(body["prompt"])]}
+        self._write_chunk(json_module.dumps(done).encode() + b"\n")
+        self._write_chunk(b"")
+
+
+@pytest.fixture
+def fake_ollama_server():
+    _FakeOllamaHandler.connections = 0
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+    server.shutdown()
+    server.server_close()
+
+
+def _generate(infer):
+    tokens = []
+    tok = infer([ord("p")], 0.0, new_request=True)
+    while tok != EOS_TOKEN:
+        if tok != PAD_TOKEN:
+            tokens.append(tok)
+        tok = infer([], 0.0)
+    return "".join(chr(t) for t in tokens)
+
+
+def test_fake_server_reuses_keep_alive_connection(monkeypatch, fake_ollama_server):
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.load_harmony_encoding",
+        fake_load_harmony_encoding,
+    )
+    monkeypatch.setattr(_FakeOllamaHandler, "token_delay_s", 0.0)
+    infer = setup_model("model", endpoint_url=fake_ollama_server)
+
+    assert _generate(infer) == "hola"
+    # EOS se entrega al leer "done"; la conexión vuelve al pool al terminar el cuerpo
+    for conversation in infer.__self__._conversations.values():
+        conversation.stream_thread.join(5)
+    assert _generate(infer) == "hola"
+    assert _FakeOllamaHandler.connections == 1
+    # el segundo prompt no extiende la primera conversación: no hereda su contexto
+    conversations = list(infer.__self__._conversations.values())
+    assert [c.context for c in conversations] == [[1], [1]]
+
+
+def test_tokens_are_handed_off_without_polling(monkeypatch, fake_ollama_server):
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.load_harmony_encoding",
+        fake_load_harmony_encoding,
+    )
+    monkeypatch.setattr(_FakeOllamaHandler, "token_delay_s", 0.05)
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.CALL_MAX_WAIT_S", 1.0
+    )
+    infer = setup_model("model", endpoint_url=fake_ollama_server)
+
+    results = []
+    start = time.monotonic()
+    tok = infer([ord("p")], 0.0, new_request=True)
+    while tok != EOS_TOKEN:
+        results.append(tok)
+        tok = infer([], 0.0)
+    elapsed = time.monotonic() - start
+
+    # cada llamada bloquea hasta que llega el token: nunca se devuelve PAD_TOKEN
+    assert results == [ord(c) for c in "hola"]
+    assert elapsed < 1.0
+
+
+# BPE pequeño con la misma pre-tokenización que los encodings de OpenAI
+_TINY_PAT = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}|"""
+    r""" ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+)
+_TINY_MERGES = [
+    b"th", b"the", b" t", b" the", b"he", b"  ", b"    ", b"12", b"123",
+    b"in", b"ing", b" in", b"\n\n", b"\xc3\xa1", b"es", b" es", b"on", b" on",
+]
+
+_SAMPLE_TEXTS = [
+    "the thing is    in the  middle 1234567 of   está\n\n\nnothing   ",
+    "{\"query\": \"the weather in 12345\"}\n\n  - item\n    - nested thing\n",
+    "árbol ñandú está en el jardín: 100200300 el\t\tfin\r\n\r\n",
+]
+
+
+def _tiny_encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in _TINY_MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding("tiny", pat_str=_TINY_PAT, mergeable_ranks=ranks, special_tokens={})
+
+
+def _random_chunks(text, rng):
+    chunks, i = [], 0
+    while i < len(text):
+        n = rng.randint(1, 6)
+        chunks.append(text[i:i + n])
+        i += n
+    return chunks
+
+
+_RANDOM_ALPHABET = "0123456789" "abcXYZ" "  \t" "\n\r" "áñü漢字" ".,:'{}-/" "<|>"
+
+
+def test_incremental_encoder_matches_full_encode():
+    encoding = _tiny_encoding()
+    rng = random.Random(0)
+    texts = list(_SAMPLE_TEXTS)
+    texts += [
+        "".join(rng.choice(_RANDOM_ALPHABET) for _ in range(rng.randint(1, 40)))
+        for _ in range(3000)
+    ]
+    for text in texts:
+        expected = encoding.encode(text)
+        encoder = IncrementalEncoder(encoding)
+        tokens = []
+        for chunk in _random_chunks(text, rng):
+            tokens.extend(encoder.feed(chunk))
+        tokens.extend(encoder.flush())
+        assert tokens == expected, repr(text)
+
+
+def test_incremental_encoder_char_by_char_digits():
+    encoding = _tiny_encoding()
+    encoder = IncrementalEncoder(encoding)
+    tokens = []
+    for char in "21122":
+        tokens.extend(encoder.feed(char))
+    tokens.extend(encoder.flush())
+    assert tokens == encoding.encode("21122")
+
+
+def test_incremental_encoder_only_reencodes_the_tail():
+    encoding = _tiny_encoding()
+    encoded_lengths = []
+
+    class CountingEncoding:
+        def encode(self, text, allowed_special="all"):
+            encoded_lengths.append(len(text))
+            return encoding.encode(text, allowed_special=allowed_special)
+
+        def decode(self, tokens):
+            return encoding.decode(tokens)
+
+        _pat_str = encoding._pat_str
+
+    text = "".join(_SAMPLE_TEXTS) * 40
+    encoder = IncrementalEncoder(CountingEncoding())
+    tokens = []
+    for chunk in _random_chunks(text, random.Random(1)):
+        tokens.extend(encoder.feed(chunk))
+    tokens.extend(encoder.flush())
+
+    assert tokens == encoding.encode(text)
+    assert len(text) > 4000
+    assert max(encoded_lengths) < 200
+
+
+def test_streamer_tokens_match_full_encode(monkeypatch):
+    encoding = _tiny_encoding()
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.load_harmony_encoding",
+        lambda name: encoding,
+    )
+    text = _SAMPLE_TEXTS[0] + _SAMPLE_TEXTS[2]
+    lines = [
+        json_module.dumps({"response": chunk, "done": False})
+        for chunk in _random_chunks(text, random.Random(2))
+    ]
+    lines.append(json_module.dumps({"done": True, "context": [1]}))
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.requests.Session.post",
+        lambda self, url, json, stream, timeout: FakeResponse(lines),
+    )
+
+    infer = setup_model("model", endpoint_url="http://localhost/api/generate")
+    tokens = []
+    tok = infer(encoding.encode("prompt"), 0.0, new_request=True)
+    while tok != EOS_TOKEN:
+        if tok != PAD_TOKEN:
+            tokens.append(tok)
+        tok = infer([], 0.0)
+
+    assert tokens == encoding.encode(text)
+
+
+def _conversation_post(monkeypatch, calls):
+    """Ollama falso que responde con el último carácter del prompt repetido."""
+
+    def fake_post(self, url, json, stream, timeout):
+        calls.append(json)
+        reply = json["prompt"][-1] * 2
+        context = (json["context"] or []) + [len(calls)]
+        return FakeResponse([
+            json_module.dumps({"response": reply, "done": False}),
+            json_module.dumps({"done": True, "context": context}),
+        ])
+
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.load_harmony_encoding",
+        fake_load_harmony_encoding,
+    )
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.requests.Session.post", fake_post
+    )
+
+
+def _run_like_server(infer, tokens):
+    """Genera como el servidor: pasa siempre la lista completa, PAD incluido."""
+    tokens = list(tokens)
+    tokens.append(infer(tokens, 0.0, new_request=True))
+    while tokens[-1] != EOS_TOKEN:
+        tokens.append(infer(tokens, 0.0))
+    return tokens
+
+
+def test_interleaved_conversations_keep_their_context(monkeypatch):
+    calls = []
+    _conversation_post(monkeypatch, calls)
+    infer = setup_model("model", endpoint_url="http://localhost/api/generate")
+
+    first = _run_like_server(infer, [ord(c) for c in "hola a"])
+    second = _run_like_server(infer, [ord(c) for c in "hola b"])
+    assert [t for t in first if t != PAD_TOKEN][-3:] == [ord("a"), ord("a"), EOS_TOKEN]
+    assert [t for t in second if t != PAD_TOKEN][-3:] == [ord("b"), ord("b"), EOS_TOKEN]
+
+    # continuar la primera conversación tras la segunda: reutiliza su contexto y
+    # solo envía el texto nuevo (el EOS no forma parte del historial renderizado)
+    _run_like_server(infer, first[:-1] + [ord(c) for c in " y c"])
+    assert calls[2]["context"] == [1]
+    assert calls[2]["prompt"] == " y c"
+    assert calls[0]["context"] is None and calls[1]["context"] is None
+
+
+def test_concurrent_requests_stream_independently(monkeypatch):
+    calls = []
+    _conversation_post(monkeypatch, calls)
+    infer = setup_model("model", endpoint_url="http://localhost/api/generate")
+
+    a = [ord("a")]
+    b = [ord("b")]
+    a.append(infer(a, 0.0, new_request=True))
+    b.append(infer(b, 0.0, new_request=True))
+    while EOS_TOKEN not in (a[-1], b[-1]):
+        a.append(infer(a, 0.0))
+        b.append(infer(b, 0.0))
+
+    assert [t for t in a if t != PAD_TOKEN] == [ord("a")] * 3 + [EOS_TOKEN]
+    assert [t for t in b if t != PAD_TOKEN] == [ord("b")] * 3 + [EOS_TOKEN]
+
+
+def test_conversations_are_evicted_lru(monkeypatch):
+    calls = []
+    _conversation_post(monkeypatch, calls)
+    streamer = OllamaStreamer(
+        "model", endpoint_url="http://localhost/api/generate", max_conversations=2
+    )
+    infer = streamer.infer_next_token
+
+    first = _run_like_server(infer, [ord("a")])
+    _run_like_server(infer, [ord("b")])
+    _run_like_server(infer, first + [ord("x")])  # la primera pasa a ser la más reciente
+    _run_like_server(infer, [ord("c")])  # expulsa la de "b"
+
+    assert len(streamer._conversations) == 2
+    remaining = [c.context_tokens[0] for c in streamer._conversations.values()]
+    assert remaining == [ord("a"), ord("c")]
+
+
+def test_same_length_prompts_do_not_swap_streams(monkeypatch):
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.load_harmony_encoding",
+        fake_load_harmony_encoding,
+    )
+
+    def fake_post(self, url, json, stream, timeout):
+        # responde con el primer carácter: los dos prompts comparten sufijo
+        return FakeResponse([
+            json_module.dumps({"response": json["prompt"][0] * 3, "done": False}),
+            json_module.dumps({"done": True, "context": [1]}),
+        ])
+
+    monkeypatch.setattr(
+        "gpt_oss.responses_api.inference.ollama.requests.Session.post", fake_post
+    )
+    infer = setup_model("model", endpoint_url="http://localhost/api/generate")
+
+    a = [ord("a"), ord("z")]
+    b = [ord("b"), ord("z")]
+    a.append(infer(a, 0.0, new_request=True))
+    b.append(infer(b, 0.0, new_request=True))
+    while EOS_TOKEN not in (a[-1], b[-1]):
+        a.append(infer(a, 0.0))
+        b.append(infer(b, 0.0))
+
+    assert [t for t in a if t != PAD_TOKEN] == [ord("a"), ord("z")] + [ord("a")] * 3 + [EOS_TOKEN]
+    assert [t for t in b if t != PAD_TOKEN] == [ord("b"), ord("z")] + [ord("b")] * 3 + [EOS_TOKEN]
+
+    # un historial que no es de ningún stream abre uno nuevo en vez de tomar otro
+    streamer = infer.__self__
+    before = len(streamer._conversations)
+    c = [ord("c"), ord("z"), ord("a")]
+    c.append(infer(c, 0.0))
+    assert c[-1] == ord("c")
+    assert len(streamer._conversations) == before + 1
+
+
+def test_second_turn_reuses_context(monkeypatch):
+    calls = []
+    _conversation_post(monkeypatch, calls)
+    infer = setup_model("model", endpoint_url="http://localhost/api/generate")
+    end_token = 200007  # <|end|>
+
+    first = _run_like_server(infer, [ord(c) for c in "<|start|>user<|message|>hi"])
+    reply = [t for t in first if t != PAD_TOKEN][-3:-1]
+    assert reply == [ord("i"), ord("i")]
+
+    # el servidor renderiza el turno siguiente: el mensaje previo se cierra con
+    # <|end|> en lugar del EOS y se añaden cabeceras nuevas
+    rendered = (
+        [t for t in first[:-1] if t != PAD_TOKEN]
+        + [end_token]
+        + [ord(c) for c in "<|start|>user<|message|>ok"]
+    )
+    _run_like_server(infer, rendered)
+    assert calls[1]["context"] == [1]
+    assert calls[1]["prompt"] == chr(end_token) + "<|start|>user<|message|>ok"